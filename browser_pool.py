@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程级共享浏览器池
+常驻一个Chromium实例，向爬取任务分发已登录的上下文和页面，避免每次爬取都重新启动浏览器
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright
+
+from crawl_control import AccountBlockedError, AdaptivePacer, CircuitBreaker
+from http_scraper import HttpXianyuScraper, MtopSearchClient, MtopSigningError
+from 自动运行抓取器 import (
+    AutoXianyuScraper,
+    BROWSER_ARGS,
+    MOBILE_CONTEXT_OPTIONS,
+    STEALTH_INIT_SCRIPT,
+    ResourceFilter,
+    SelectorProfile,
+    cookie_fingerprint,
+    storage_state_path
+)
+
+
+class PageStream:
+    """跨事件循环的有界页面队列
+
+    爬虫在浏览器池的事件循环中逐页 put，调用方在自己的事件循环中通过 consume() 逐页取出；
+    队列满时 put 会等待，入库跟不上时爬虫翻页随之放慢（背压）。
+    """
+
+    def __init__(self, maxsize=2):
+        # 必须在消费方的事件循环中创建
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.result = None
+
+    async def put(self, item):
+        """供爬虫作为 page_sink 使用，可在任意事件循环中调用"""
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop))
+
+    async def consume(self, producer):
+        """运行生产者协程并逐个产出队列中的数据，结束后生产者的返回值保存在 result 中
+
+        生产者抛出的异常在取完队列后重新抛出；消费方提前退出时取消生产者。
+        """
+        task = asyncio.ensure_future(producer)
+        try:
+            while True:
+                getter = asyncio.ensure_future(self.queue.get())
+                done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    yield getter.result()
+                    continue
+                getter.cancel()
+                # 生产者已结束，它的put都已完成，取完剩余数据
+                while not self.queue.empty():
+                    yield self.queue.get_nowait()
+                break
+            self.result = task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+
+
+class PooledContext:
+    """浏览器池中的一个上下文槽位"""
+
+    def __init__(self, slot_id, cookie_key, context, page):
+        self.slot_id = slot_id
+        self.cookie_key = cookie_key
+        self.context = context
+        self.page = page
+        self.in_use = False
+        self.authenticated = False
+        self.pages_served = 0
+        self.leases = 0
+        self.created_at = time.time()
+        self.last_used_at = None
+
+
+class BrowserPool:
+    """共享浏览器池
+
+    浏览器和上下文都运行在池自己的后台事件循环线程中，调用方通过 run()/submit()
+    把协程投递到该循环执行，因此Flask请求线程和调度器线程可以共用同一个浏览器。
+    """
+
+    def __init__(self, max_contexts=3, max_pages_per_context=50, headless=True, resource_policy=None):
+        self.max_contexts = max_contexts
+        self.max_pages_per_context = max_pages_per_context
+        self.headless = headless
+        # 所有池内上下文共用一个资源拦截器，统计数据按池汇总
+        self.resource_filter = ResourceFilter(resource_policy)
+        # 所有池内爬虫共用一份选择器画像，命中统计按池汇总
+        self.selector_profile = SelectorProfile()
+        # 所有池内爬虫共用一个自适应节奏控制器，按账号区分状态
+        self.pacer = AdaptivePacer()
+        # 账号熔断器：被拦截的账号在冷却期内的爬取立即失败
+        self.breaker = CircuitBreaker()
+        # 最近各页的卡片数量指标
+        self.page_metrics = deque(maxlen=200)
+        # HTTP模式的mtop客户端，keep-alive连接池常驻在本池的事件循环中
+        self.http_client = MtopSearchClient()
+
+        self.loop = None
+        self.thread = None
+        self._start_lock = threading.Lock()
+
+        self.playwright = None
+        self.browser = None
+        self.slots = []
+        self._condition = None
+        self._next_slot_id = 1
+
+        self.stats = {
+            'browser_launches': 0,
+            'contexts_created': 0,
+            'contexts_recycled': 0,
+            'state_restores': 0,
+            'http_crawls': 0,
+            'http_fallbacks': 0,
+            'blocked_crawls': 0,
+            'pages_extracted': 0,
+            'cards_extracted': 0,
+            'leases': 0,
+            'lease_errors': 0,
+            'waits': 0
+        }
+
+    # ---------- 事件循环线程 ----------
+
+    def start(self):
+        """启动后台事件循环线程（幂等）"""
+        with self._start_lock:
+            if self.thread and self.thread.is_alive():
+                return
+
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run_loop():
+                asyncio.set_event_loop(self.loop)
+                self._condition = asyncio.Condition()
+                ready.set()
+                self.loop.run_forever()
+
+            self.thread = threading.Thread(target=run_loop, name='browser-pool', daemon=True)
+            self.thread.start()
+            ready.wait()
+            print(f"[浏览器池] 已启动 (最大上下文数={self.max_contexts}, 单上下文最大页数={self.max_pages_per_context})")
+
+    def submit(self, coro, cancel_token=None):
+        """把协程投递到浏览器池的事件循环，返回concurrent.futures.Future
+
+        传入 cancel_token 时协程登记在该取消句柄上，停止爬取会直接取消池中的任务。
+        """
+        self.start()
+        if cancel_token is not None:
+            coro = cancel_token.guard(coro)
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def run(self, coro, cancel_token=None):
+        """在任意事件循环中等待浏览器池执行协程（被取消时抛出CancelledError）"""
+        return await asyncio.wrap_future(self.submit(coro, cancel_token))
+
+    def shutdown(self):
+        """关闭所有上下文和浏览器，停止后台线程"""
+        if not self.loop or not self.thread or not self.thread.is_alive():
+            return
+
+        try:
+            self.submit(self._close_all()).result(timeout=30)
+        except Exception as e:
+            print(f"[浏览器池] 关闭浏览器失败: {str(e)}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+        print("[浏览器池] 已关闭")
+
+    # ---------- 浏览器与上下文管理（以下方法只在池事件循环中调用） ----------
+
+    @staticmethod
+    def cookie_key(cookie_string):
+        """Cookie字符串的短指纹，用于区分不同账号的上下文"""
+        return cookie_fingerprint(cookie_string)
+
+    async def _ensure_browser(self):
+        if self.browser and self.browser.is_connected():
+            return
+
+        if not self.playwright:
+            self.playwright = await async_playwright().start()
+
+        print(f"[浏览器池] 正在启动Chromium (headless={self.headless})...")
+        self.browser = await self.playwright.chromium.launch(
+            headless=self.headless,
+            args=list(BROWSER_ARGS)
+        )
+        self.stats['browser_launches'] += 1
+
+        # 浏览器重启后旧的上下文全部失效
+        self.slots = []
+
+    async def _create_slot(self, cookie_string):
+        await self._ensure_browser()
+
+        # 账号有已保存的存储状态时直接加载，上下文无需再执行Cookie引导
+        context_options = dict(MOBILE_CONTEXT_OPTIONS)
+        state_file = storage_state_path(cookie_string)
+        if os.path.exists(state_file):
+            context_options['storage_state'] = state_file
+
+        context = await self.browser.new_context(**context_options)
+        await self.resource_filter.install(context)
+        page = await context.new_page()
+        await page.add_init_script(STEALTH_INIT_SCRIPT)
+
+        slot = PooledContext(self._next_slot_id, self.cookie_key(cookie_string), context, page)
+        slot.authenticated = 'storage_state' in context_options
+        self._next_slot_id += 1
+        self.slots.append(slot)
+        self.stats['contexts_created'] += 1
+        if slot.authenticated:
+            self.stats['state_restores'] += 1
+        print(f"[浏览器池] 创建上下文 #{slot.slot_id}{' (已加载保存的登录状态)' if slot.authenticated else ''}")
+        return slot
+
+    async def _recycle_slot(self, slot, reason):
+        if slot in self.slots:
+            self.slots.remove(slot)
+        self.stats['contexts_recycled'] += 1
+        print(f"[浏览器池] 回收上下文 #{slot.slot_id}: {reason} (已服务 {slot.pages_served} 页)")
+        try:
+            await slot.context.close()
+        except Exception as e:
+            print(f"[浏览器池] 关闭上下文 #{slot.slot_id} 失败: {str(e)}")
+
+    async def _close_all(self):
+        await self.http_client.close()
+        for slot in list(self.slots):
+            await self._recycle_slot(slot, '浏览器池关闭')
+        if self.browser:
+            await self.browser.close()
+            self.browser = None
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+
+    async def acquire(self, cookie_string):
+        """获取一个可用的上下文槽位，优先复用同一账号的空闲上下文"""
+        key = self.cookie_key(cookie_string)
+
+        async with self._condition:
+            while True:
+                if self.browser and not self.browser.is_connected():
+                    print("[浏览器池] 浏览器连接已断开，重新启动")
+                    self.browser = None
+                    self.slots = []
+
+                idle = [s for s in self.slots if not s.in_use]
+                same_account = [s for s in idle if s.cookie_key == key]
+
+                if same_account:
+                    slot = same_account[0]
+                elif len(self.slots) < self.max_contexts:
+                    slot = await self._create_slot(cookie_string)
+                elif idle:
+                    # 池已满：回收最久未使用的其他账号上下文，腾出位置
+                    oldest = min(idle, key=lambda s: s.last_used_at or s.created_at)
+                    await self._recycle_slot(oldest, '为其他账号腾出位置')
+                    slot = await self._create_slot(cookie_string)
+                else:
+                    self.stats['waits'] += 1
+                    await self._condition.wait()
+                    continue
+
+                slot.in_use = True
+                slot.leases += 1
+                slot.last_used_at = time.time()
+                self.stats['leases'] += 1
+                return slot
+
+    async def release(self, slot, pages_loaded=0, broken=False):
+        """归还上下文槽位，达到页数上限或出错时回收"""
+        async with self._condition:
+            slot.in_use = False
+            slot.pages_served += pages_loaded
+
+            if broken:
+                self.stats['lease_errors'] += 1
+                await self._recycle_slot(slot, '爬取出错')
+            elif slot.pages_served >= self.max_pages_per_context:
+                await self._recycle_slot(slot, '达到页数上限')
+
+            self._condition.notify_all()
+
+    @asynccontextmanager
+    async def lease(self, cookie_string, **scraper_options):
+        """租用一个已登录的爬虫实例
+
+        用法: async with pool.lease(cookie) as scraper: await scraper.search_products(...)
+        """
+        slot = await self.acquire(cookie_string)
+        scraper_options.setdefault('resource_policy', False)  # 拦截规则已安装在池上下文上
+        scraper_options.setdefault('selector_profile', self.selector_profile)
+        scraper_options.setdefault('pacer', self.pacer)
+        scraper = AutoXianyuScraper(cookie_string=cookie_string, headless=self.headless, **scraper_options)
+        scraper.attach(slot.context, slot.page)
+        broken = False
+
+        try:
+            if not slot.authenticated:
+                if not await scraper.apply_cookies():
+                    raise RuntimeError("Cookie设置失败")
+                slot.authenticated = True
+            yield scraper
+        except BaseException:
+            broken = True
+            raise
+        finally:
+            scraper.detach()
+            await self.release(slot, scraper.pages_loaded, broken=broken)
+
+    async def crawl(self, cookie_string, keyword, max_pages=3, delay=2, sort_by_latest=True, known_ids=None,
+                    backend='browser', page_sink=None):
+        """在池中执行一次关键词爬取，返回 (是否成功, 商品列表)
+
+        backend='http' 时先直接请求搜索接口，第1页签名失败再回退到浏览器（之后的页面签名失败时保留已爬取的结果，
+        避免浏览器从第1页重新爬取导致已交给 page_sink 的商品重复入库）。
+        page_sink 为每提取完一页就调用的协程函数 page_sink(商品列表)，用于边爬边入库。
+        账号处于熔断冷却期、试探爬取进行中或本次爬取被拦截且没有拿到数据时抛出AccountBlockedError。
+        """
+        key = self.cookie_key(cookie_string)
+        self.breaker.ensure_allowed(key)
+        try:
+            return await self._crawl(key, cookie_string, keyword, max_pages, delay, sort_by_latest, known_ids,
+                                     backend, page_sink)
+        except asyncio.CancelledError:
+            # 爬取被停止：试探没有结论，释放名额
+            self.breaker.release(key)
+            raise
+        except Exception as e:
+            # 出错的试探爬取视为失败，重新熔断（正常状态下不影响熔断器）
+            self.breaker.record_failure(key, str(e))
+            raise
+
+    async def _crawl(self, key, cookie_string, keyword, max_pages, delay, sort_by_latest, known_ids, backend,
+                     page_sink):
+        if backend == 'http':
+            self.stats['http_crawls'] += 1
+            scraper = HttpXianyuScraper(cookie_string, self.http_client, pacer=self.pacer)
+            scraper.page_sink = page_sink
+            try:
+                success = await scraper.search_products(keyword, max_pages, delay, sort_by_latest=sort_by_latest,
+                                                        known_ids=known_ids)
+                return self.finish_crawl(key, scraper, success)
+            except MtopSigningError as e:
+                self.stats['http_fallbacks'] += 1
+                print(f"[HTTP爬取] 签名失败，回退到浏览器模式: {str(e)}")
+
+        async with self.lease(cookie_string) as scraper:
+            scraper.page_sink = page_sink
+            success = await scraper.search_products(keyword, max_pages, delay, sort_by_latest=sort_by_latest,
+                                                    known_ids=known_ids)
+        return self.finish_crawl(key, scraper, success)
+
+    def finish_crawl(self, key, scraper, success):
+        """汇总每页卡片数指标并根据拦截检测结果更新熔断器，返回 (是否成功, 商品列表)"""
+        results = list(scraper.results)
+        for metric in scraper.page_metrics:
+            self.stats['pages_extracted'] += 1
+            self.stats['cards_extracted'] += metric['cards']
+            self.page_metrics.append(metric)
+        if scraper.block_reason:
+            self.stats['blocked_crawls'] += 1
+            self.breaker.trip(key, scraper.block_reason)
+            if not results:
+                raise AccountBlockedError(f"账号被拦截（{scraper.block_reason}），已熔断")
+            # 翻页途中被拦截：保留已爬取的数据
+            return True, results
+        if success:
+            self.breaker.record_success(key)
+        else:
+            self.breaker.record_failure(key, '没有获取到数据')
+        return success, results
+
+    async def crawl_many(self, cookie_string, keywords, max_pages=3, delay=2,
+                         concurrency=3, keyword_delay=2, sort_by_latest=True, watermarks=None, backend='browser',
+                         page_sink=None):
+        """在同一个浏览器中并发爬取多个关键词
+
+        concurrency 控制同时运行的关键词数（实际还受 max_contexts 限制），
+        keyword_delay 为相邻两个关键词开始爬取的最小间隔（秒，带±30%随机浮动），
+        避免同一时刻集中发起大量搜索。watermarks 为 {关键词: 已知最新商品ID}，
+        backend 同 crawl()，page_sink 为 page_sink(关键词, 商品列表)。
+        返回 {关键词: (是否成功, 商品列表或错误信息)}。
+        """
+        watermarks = watermarks or {}
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        start_lock = asyncio.Lock()
+        last_start = [0.0]
+
+        async def crawl_one(keyword):
+            async with semaphore:
+                # 按关键词错峰启动
+                async with start_lock:
+                    gap = keyword_delay * random.uniform(0.7, 1.3)
+                    wait = last_start[0] + gap - time.time()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    last_start[0] = time.time()
+
+                print(f"[并发爬取] 开始关键词: {keyword}")
+                try:
+                    keyword_sink = (lambda products, kw=keyword: page_sink(kw, products)) if page_sink else None
+                    return keyword, await self.crawl(cookie_string, keyword, max_pages, delay, sort_by_latest,
+                                                     known_ids=watermarks.get(keyword), backend=backend,
+                                                     page_sink=keyword_sink)
+                except Exception as e:
+                    print(f"[并发爬取] 关键词 {keyword} 爬取失败: {str(e)}")
+                    return keyword, (False, str(e))
+
+        print(f"[并发爬取] 共 {len(keywords)} 个关键词，并发数 {concurrency}，启动间隔 {keyword_delay}秒")
+        finished = await asyncio.gather(*(crawl_one(k) for k in keywords))
+        return dict(finished)
+
+    # ---------- 状态统计 ----------
+
+    def get_stats(self):
+        """返回浏览器池占用情况，用于容量评估"""
+        slots = list(self.slots)
+        in_use = len([s for s in slots if s.in_use])
+        return {
+            'running': bool(self.thread and self.thread.is_alive()),
+            'browser_connected': bool(self.browser and self.browser.is_connected()),
+            'max_contexts': self.max_contexts,
+            'max_pages_per_context': self.max_pages_per_context,
+            'contexts': len(slots),
+            'in_use': in_use,
+            'idle': len(slots) - in_use,
+            'occupancy': round(in_use / self.max_contexts * 100, 2) if self.max_contexts else 0,
+            'resource_filter': self.resource_filter.get_stats(),
+            'selector_profile': self.selector_profile.get_stats(),
+            'http_client': self.http_client.get_stats(),
+            'pacer': self.pacer.get_stats(),
+            'circuit_breaker': self.breaker.get_stats(),
+            'avg_cards_per_page': round(self.stats['cards_extracted'] / self.stats['pages_extracted'], 2)
+            if self.stats['pages_extracted'] else 0,
+            'recent_pages': list(self.page_metrics)[-20:],
+            'slots': [
+                {
+                    'slot_id': s.slot_id,
+                    'in_use': s.in_use,
+                    'authenticated': s.authenticated,
+                    'pages_served': s.pages_served,
+                    'leases': s.leases,
+                    'age_seconds': int(time.time() - s.created_at)
+                }
+                for s in slots
+            ],
+            **self.stats
+        }
@@ -4,7 +4,7 @@
 修改超级管理员密码脚本
 """
 
-import sqlite3
+import db_tuning
 import os
 from werkzeug.security import generate_password_hash
 
@@ -18,7 +18,7 @@ def change_admin_password():
 
     try:
         # 连接数据库
-        conn = sqlite3.connect(db_path)
+        conn = db_tuning.connect(db_path)
         cursor = conn.cursor()
 
         # 检查管理员是否存在
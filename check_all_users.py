@@ -1,13 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import sqlite3
+import db_tuning
 from datetime import datetime, timedelta
 
 def check_all_users():
     """检查所有用户的详细信息"""
     try:
-        conn = sqlite3.connect('instance/xianyu_data.db')
+        conn = db_tuning.connect('instance/xianyu_data.db')
         cursor = conn.cursor()
 
         # 检查所有用户
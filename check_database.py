@@ -4,7 +4,7 @@
 检查数据库中的商品数据
 """
 
-import sqlite3
+import db_tuning
 import os
 from datetime import datetime
 
@@ -17,7 +17,7 @@ def check_database():
         return
 
     try:
-        conn = sqlite3.connect(db_path)
+        conn = db_tuning.connect(db_path)
         cursor = conn.cursor()
 
         # 检查表是否存在
@@ -1,10 +1,10 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import sqlite3
+import db_tuning
 
 def check_meizu_location():
-    conn = sqlite3.connect('instance/xianyu_data.db')
+    conn = db_tuning.connect('instance/xianyu_data.db')
     cursor = conn.cursor()
 
     cursor.execute('SELECT title, price, location FROM xianyu_products WHERE title LIKE "%魅族20%" LIMIT 1')
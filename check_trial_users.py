@@ -1,12 +1,12 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import sqlite3
+import db_tuning
 
 def check_trial_users():
     """检查体验账户数据"""
     try:
-        conn = sqlite3.connect('instance/xianyu_data.db')
+        conn = db_tuning.connect('instance/xianyu_data.db')
         cursor = conn.cursor()
 
         # 检查所有用户
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬取节奏控制、账号熔断与爬取取消
+按账号（Cookie指纹）跟踪页面响应耗时、空页、跳转登录和验证码等信号，自适应调整翻页延迟：
+网站响应正常时逐步缩短延迟，出现异常信号时大幅退避，延迟始终限制在配置的上下限之内。
+账号被拦截时由熔断器在冷却期内让该账号的爬取立即失败。
+每次爬取持有独立的取消句柄，停止时直接取消正在等待的协程，不影响其他爬取。
+"""
+
+import asyncio
+import itertools
+import random
+import threading
+import time
+from collections import deque
+
+# 默认节奏参数（秒）
+DEFAULT_PACING_CONFIG = {
+    'min_delay': 0.5,
+    'max_delay': 60,
+    'slow_latency': 8,      # 单页耗时超过该值视为网站变慢
+    'shrink_factor': 0.85,  # 正常页面后的延迟缩放
+    'healthy_streak': 3     # 连续正常多少页后才开始缩短延迟
+}
+
+# 各信号对应的延迟倍数
+SIGNAL_FACTORS = {
+    'ok': 1.0,
+    'slow': 1.3,
+    'empty': 1.5,
+    'error': 1.5,
+    'login': 4.0,
+    'captcha': 6.0
+}
+
+
+class PacingState:
+    """单个账号的节奏状态"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.streak = 0
+        self.last_signal = None
+        self.last_latency = None
+        self.signals = {}
+        self.updated_at = time.time()
+
+
+class AdaptivePacer:
+    """自适应翻页延迟控制器（同一进程内所有爬虫共用，按账号区分状态）"""
+
+    def __init__(self, config=None):
+        self.config = dict(DEFAULT_PACING_CONFIG)
+        self.configure(config)
+        self.states = {}
+        self.decisions = deque(maxlen=100)
+
+    def configure(self, config):
+        """更新节奏参数，未提供的字段保持当前值"""
+        for key in DEFAULT_PACING_CONFIG:
+            if config and config.get(key) is not None:
+                try:
+                    self.config[key] = float(config[key])
+                except (TypeError, ValueError):
+                    continue
+        if self.config['max_delay'] < self.config['min_delay']:
+            self.config['max_delay'] = self.config['min_delay']
+
+    def _clamp(self, delay):
+        return min(self.config['max_delay'], max(self.config['min_delay'], delay))
+
+    def _state(self, key, base_delay=None):
+        if key not in self.states:
+            initial = base_delay if base_delay is not None else 2
+            self.states[key] = PacingState(self._clamp(initial))
+        return self.states[key]
+
+    def current_delay(self, key, base_delay=None):
+        """账号当前的翻页延迟（未带随机浮动），首次使用时以 base_delay 为初始值"""
+        return self._state(key, base_delay).delay
+
+    def next_delay(self, key, base_delay=None):
+        """本次实际等待的延迟：当前延迟 ±30% 随机浮动"""
+        return self._clamp(self.current_delay(key, base_delay) * random.uniform(0.7, 1.3))
+
+    async def wait(self, key, base_delay=None):
+        delay = self.next_delay(key, base_delay)
+        print(f"[节奏控制] 等待 {delay:.2f}秒 (当前基准 {self.current_delay(key):.2f}秒)")
+        await asyncio.sleep(delay)
+
+    def record(self, key, signal, latency=None):
+        """记录一次页面结果信号：ok/empty/error/login/captcha，返回调整后的延迟"""
+        state = self._state(key)
+        if signal == 'ok' and latency is not None and latency > self.config['slow_latency']:
+            signal = 'slow'
+
+        before = state.delay
+        if signal == 'ok':
+            state.streak += 1
+            if state.streak >= self.config['healthy_streak']:
+                state.delay = self._clamp(state.delay * self.config['shrink_factor'])
+        else:
+            state.streak = 0
+            state.delay = self._clamp(state.delay * SIGNAL_FACTORS.get(signal, 1.5))
+
+        state.last_signal = signal
+        state.last_latency = latency
+        state.signals[signal] = state.signals.get(signal, 0) + 1
+        state.updated_at = time.time()
+
+        self.decisions.append({
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'key': key,
+            'signal': signal,
+            'latency': round(latency, 2) if latency is not None else None,
+            'delay_before': round(before, 2),
+            'delay_after': round(state.delay, 2)
+        })
+        if signal != 'ok':
+            print(f"[节奏控制] 信号 {signal}，延迟 {before:.2f}秒 -> {state.delay:.2f}秒")
+        return state.delay
+
+    def get_stats(self):
+        return {
+            'config': dict(self.config),
+            'accounts': {
+                key: {
+                    'delay': round(state.delay, 2),
+                    'healthy_streak': state.streak,
+                    'last_signal': state.last_signal,
+                    'last_latency': round(state.last_latency, 2) if state.last_latency is not None else None,
+                    'signals': dict(state.signals),
+                    'updated_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(state.updated_at))
+                }
+                for key, state in self.states.items()
+            },
+            'recent_decisions': list(self.decisions)[-20:]
+        }
+
+
+class AccountBlockedError(RuntimeError):
+    """账号处于熔断冷却期，爬取直接失败"""
+
+
+class CircuitBreaker:
+    """按账号的熔断器
+
+    检测到跳转登录、验证码或警告页时熔断该账号，冷却期内该账号的所有爬取立即失败；
+    冷却期结束后只放行一次试探爬取（试探进行中其他爬取不放行），成功则恢复，
+    再次被拦截或试探失败则冷却时间加倍（不超过上限）。
+    状态可导出/合并，便于多个worker进程通过数据库共享。
+    """
+
+    def __init__(self, cooldown=600, max_cooldown=7200, probe_timeout=900):
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        # 试探爬取的最长占用时间：执行试探的进程异常退出时，超时后允许再次试探
+        self.probe_timeout = probe_timeout
+        self.accounts = {}
+        # 放行试探爬取时调用 on_probe(账号)，用于立即把试探状态同步给其他进程
+        self.on_probe = None
+
+    def _entry(self, key):
+        return self.accounts.setdefault(key, {
+            'state': 'closed',
+            'reason': '',
+            'trips': 0,
+            'open_until': 0,
+            'probe_started': 0,
+            'updated_at': 0
+        })
+
+    def check(self, key, claim=False):
+        """返回 (是否放行, 剩余等待秒数, 熔断原因)
+
+        claim=True 表示调用方将立即开始爬取：半开状态下由它占用唯一的试探名额。
+        只查询状态（如挑选可用账号）时不占用名额；试探进行中的账号对所有调用方都不放行。
+        """
+        entry = self.accounts.get(key)
+        if not entry or entry['state'] == 'closed':
+            return True, 0, ''
+        now = time.time()
+        remaining = entry['open_until'] - now
+        if remaining > 0:
+            return False, int(remaining), entry['reason']
+        if entry['state'] == 'open':
+            # 冷却结束：进入半开状态，等待一次试探爬取
+            entry['state'] = 'half_open'
+            entry['updated_at'] = now
+
+        probe_started = entry.get('probe_started') or 0
+        if probe_started and now - probe_started < self.probe_timeout:
+            return False, int(probe_started + self.probe_timeout - now), f"{entry['reason']}，试探爬取进行中"
+        if claim:
+            entry['probe_started'] = now
+            entry['updated_at'] = now
+            print(f"[熔断器] 账号 {key} 冷却结束，放行一次试探爬取")
+            if self.on_probe:
+                self.on_probe(key)
+        return True, 0, entry['reason']
+
+    def ensure_allowed(self, key):
+        """放行本次爬取（半开状态下占用试探名额），冷却期内或试探进行中抛出AccountBlockedError"""
+        allowed, remaining, reason = self.check(key, claim=True)
+        if not allowed:
+            raise AccountBlockedError(f"账号已熔断（{reason}），{remaining // 60 + 1} 分钟后重试")
+
+    def trip(self, key, reason):
+        """检测到拦截信号，熔断账号"""
+        entry = self._entry(key)
+        entry['trips'] += 1
+        cooldown = min(self.max_cooldown, self.cooldown * (2 ** (entry['trips'] - 1)))
+        entry.update({
+            'state': 'open',
+            'reason': reason,
+            'open_until': time.time() + cooldown,
+            'probe_started': 0,
+            'updated_at': time.time()
+        })
+        print(f"[熔断器] 账号 {key} 被拦截（{reason}），熔断 {int(cooldown)}秒")
+
+    def record_failure(self, key, reason):
+        """爬取失败但没有检测到拦截（如出错或没有数据）：试探爬取失败时重新熔断，正常状态下不处理"""
+        entry = self.accounts.get(key)
+        if entry and entry['state'] == 'half_open':
+            self.trip(key, f"试探失败: {reason}")
+
+    def release(self, key):
+        """试探爬取被取消（没有结果）：释放试探名额，下次爬取可重新试探"""
+        entry = self.accounts.get(key)
+        if entry and entry.get('probe_started'):
+            entry['probe_started'] = 0
+            entry['updated_at'] = time.time()
+
+    def record_success(self, key):
+        """爬取正常完成，恢复账号"""
+        entry = self.accounts.get(key)
+        if entry and entry['state'] != 'closed':
+            print(f"[熔断器] 账号 {key} 已恢复")
+            entry.update({'state': 'closed', 'reason': '', 'trips': 0, 'open_until': 0, 'probe_started': 0,
+                          'updated_at': time.time()})
+
+    def export(self):
+        return {key: dict(entry) for key, entry in self.accounts.items()}
+
+    def merge(self, accounts):
+        """合并其他进程保存的状态，按 updated_at 取较新的记录"""
+        for key, entry in (accounts or {}).items():
+            current = self.accounts.get(key)
+            if not current or entry.get('updated_at', 0) > current['updated_at']:
+                self.accounts[key] = dict(entry)
+
+    def get_stats(self):
+        now = time.time()
+        return {
+            'cooldown': self.cooldown,
+            'max_cooldown': self.max_cooldown,
+            'accounts': {
+                key: {
+                    'state': entry['state'],
+                    'reason': entry['reason'],
+                    'trips': entry['trips'],
+                    'probing': bool(entry.get('probe_started')) and now - entry['probe_started'] < self.probe_timeout,
+                    'remaining_seconds': max(0, int(entry['open_until'] - now))
+                }
+                for key, entry in self.accounts.items()
+            }
+        }
+
+
+class CancelToken:
+    """单次爬取的取消句柄
+
+    guard() 包装的协程在所属事件循环中登记为任务；cancel() 可在任意线程调用，
+    立即取消这些任务，使其中正在等待的Playwright操作抛出CancelledError。
+    任务吞掉了取消异常时每隔 retry_interval 秒再次取消，直到任务结束。
+    """
+
+    def __init__(self, crawl_id, description='', source='manual', retry_interval=0.5):
+        self.crawl_id = crawl_id
+        self.description = description
+        self.source = source
+        self.retry_interval = retry_interval
+        self.cancelled = False
+        self.reason = ''
+        self.created_at = time.time()
+        self.cancelled_at = None
+        self._tasks = set()
+        self._lock = threading.Lock()
+
+    async def guard(self, coro):
+        """在当前事件循环中运行协程，并登记为可取消的任务"""
+        loop = asyncio.get_running_loop()
+        task = loop.create_task(coro)
+        entry = (loop, task)
+        with self._lock:
+            self._tasks.add(entry)
+        if self.cancelled:
+            self._cancel_task(loop, task)
+        try:
+            return await task
+        finally:
+            with self._lock:
+                self._tasks.discard(entry)
+
+    def _cancel_task(self, loop, task):
+        def cancel():
+            if not task.done():
+                task.cancel()
+                loop.call_later(self.retry_interval, cancel)
+        loop.call_soon_threadsafe(cancel)
+
+    def cancel(self, reason='用户停止'):
+        if self.cancelled:
+            return
+        self.cancelled = True
+        self.reason = reason
+        self.cancelled_at = time.time()
+        with self._lock:
+            tasks = list(self._tasks)
+        print(f"[爬取取消] {self.crawl_id} ({self.description}) 已请求停止，取消 {len(tasks)} 个运行中的任务")
+        for loop, task in tasks:
+            try:
+                self._cancel_task(loop, task)
+            except RuntimeError:
+                # 事件循环已关闭，任务已随之结束
+                pass
+
+    def to_dict(self):
+        return {
+            'crawl_id': self.crawl_id,
+            'description': self.description,
+            'source': self.source,
+            'cancelled': self.cancelled,
+            'reason': self.reason,
+            'running_tasks': len(self._tasks),
+            'started_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.created_at)),
+            'elapsed_seconds': int(time.time() - self.created_at)
+        }
+
+
+class CrawlRegistry:
+    """进程内运行中爬取的登记表，按ID停止单个爬取"""
+
+    def __init__(self):
+        self.crawls = {}
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+
+    def start(self, description='', source='manual', crawl_id=None):
+        """登记一次新爬取，返回其CancelToken；指定的ID已被占用时自动生成新ID"""
+        with self._lock:
+            if not crawl_id or crawl_id in self.crawls:
+                crawl_id = f"crawl-{int(time.time())}-{next(self._counter)}"
+            token = CancelToken(crawl_id, description, source)
+            self.crawls[crawl_id] = token
+        return token
+
+    def finish(self, token):
+        with self._lock:
+            if self.crawls.get(token.crawl_id) is token:
+                del self.crawls[token.crawl_id]
+
+    def get(self, crawl_id):
+        return self.crawls.get(crawl_id)
+
+    def cancel(self, crawl_id, reason='用户停止'):
+        """停止指定爬取，ID不存在时返回False"""
+        token = self.crawls.get(crawl_id)
+        if not token:
+            return False
+        token.cancel(reason)
+        return True
+
+    def cancel_source(self, source, reason='用户停止'):
+        """停止某一来源（manual/scheduled）的全部爬取，返回停止的数量"""
+        tokens = [token for token in list(self.crawls.values()) if token.source == source]
+        for token in tokens:
+            token.cancel(reason)
+        return len(tokens)
+
+    def list(self):
+        return [token.to_dict() for token in list(self.crawls.values())]
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬取录制/回放与提取基准测试
+record: 用真实Cookie打开几页搜索结果，把每页渲染后的HTML快照和搜索接口响应保存到fixture目录
+replay: 通过 page.route 用fixture响应所有请求（不访问网络），完整执行一次 search_products 并与录制时的商品ID比对
+bench:  在fixture页面上反复执行 extract_products_from_page，统计每页提取耗时、每秒卡片数和选择器命中率
+
+用法:
+    python crawl_fixture.py record --keyword 手机 --pages 3 [--cookie "..."] [--out fixtures/手机]
+    python crawl_fixture.py replay fixtures/手机
+    python crawl_fixture.py bench fixtures/手机 [--mode evaluate|element] [--repeat 5] [--output bench.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from crawl_control import AdaptivePacer
+from 自动运行抓取器 import (
+    AutoXianyuScraper,
+    SEARCH_API_NAME,
+    SelectorProfile,
+    build_search_url,
+    parse_search_payload
+)
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def load_manifest(fixture_dir):
+    with open(os.path.join(fixture_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_fixture_file(fixture_dir, name):
+    with open(os.path.join(fixture_dir, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+class FixtureRouter:
+    """page.route 回调：文档请求返回对应页的HTML快照，搜索接口返回录制的响应，其余请求一律中止"""
+
+    def __init__(self, fixture_dir, manifest):
+        self.fixture_dir = fixture_dir
+        self.pages = {page['url']: page for page in manifest['pages']}
+        self.current = manifest['pages'][0] if manifest['pages'] else None
+        self.stats = {'documents': 0, 'api': 0, 'aborted': 0}
+
+    async def handle(self, route):
+        request = route.request
+        if request.resource_type == 'document':
+            page = self.pages.get(request.url, self.current)
+            self.current = page
+            self.stats['documents'] += 1
+            await route.fulfill(status=200, content_type='text/html; charset=utf-8',
+                                body=read_fixture_file(self.fixture_dir, page['html']))
+            return
+
+        if SEARCH_API_NAME in request.url and self.current and self.current.get('api'):
+            self.stats['api'] += 1
+            await route.fulfill(status=200, content_type='application/json',
+                                body=read_fixture_file(self.fixture_dir, self.current['api']))
+            return
+
+        self.stats['aborted'] += 1
+        await route.abort()
+
+
+async def open_fixture_scraper(fixture_dir, manifest, extract_mode='evaluate'):
+    """启动不访问网络的爬虫：所有请求由FixtureRouter应答"""
+    scraper = AutoXianyuScraper(
+        cookie_string='fixture=1',
+        headless=True,
+        extract_mode=extract_mode,
+        capture_api=False,  # 快照中的页面脚本已被中止，不会再发起搜索接口请求
+        resource_policy=False,
+        persist_state=False,
+        pacing_policy={'search_submit': 0, 'first_load': 0},
+        selector_profile=SelectorProfile(),
+        pacer=AdaptivePacer({'min_delay': 0, 'max_delay': 0})
+    )
+    if not await scraper.setup_browser():
+        raise RuntimeError("浏览器启动失败")
+    router = FixtureRouter(fixture_dir, manifest)
+    await scraper.context.route('**/*', router.handle)
+    return scraper, router
+
+
+async def record(keyword, pages, cookie_string, out_dir, sort_by_latest=True):
+    """录制一次真实搜索会话"""
+    os.makedirs(out_dir, exist_ok=True)
+    scraper = AutoXianyuScraper(cookie_string=cookie_string, headless=True, resource_policy=False)
+    manifest = {
+        'keyword': keyword,
+        'sort_by_latest': sort_by_latest,
+        'recorded_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'pages': []
+    }
+
+    try:
+        if not await scraper.setup_browser():
+            print("[录制] 浏览器启动失败")
+            return False
+        if not await scraper.ensure_session():
+            print("[录制] Cookie设置失败")
+            return False
+
+        for page_number in range(1, pages + 1):
+            url = build_search_url(keyword, page_number, sort_by_latest)
+            payload_count = len(scraper._api_payloads)
+            if not await scraper.goto_search_page(keyword, page_number, sort_by_latest):
+                print(f"[录制] 第 {page_number} 页打开失败，停止录制")
+                break
+            if await scraper.check_blocked():
+                print(f"[录制] 账号被拦截（{scraper.block_reason}），停止录制")
+                break
+
+            # 页面渲染完成后、滚动之前保存快照，回放时与真实首屏一致
+            entry = {'page': page_number, 'url': url, 'html': f'page_{page_number}.html'}
+            with open(os.path.join(out_dir, entry['html']), 'w', encoding='utf-8') as f:
+                f.write(await scraper.page.content())
+
+            if len(scraper._api_payloads) > payload_count:
+                entry['api'] = f'page_{page_number}_api.json'
+                with open(os.path.join(out_dir, entry['api']), 'w', encoding='utf-8') as f:
+                    json.dump(scraper._api_payloads[-1], f, ensure_ascii=False)
+
+            manifest['pages'].append(entry)
+            print(f"[录制] 第 {page_number} 页已保存，接口响应: {'有' if entry.get('api') else '无'}")
+
+            if page_number < pages:
+                await scraper.pace('next_page', 3)
+    finally:
+        await scraper.close()
+
+    if manifest['pages']:
+        await fill_expected_ids(out_dir, manifest)
+
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    print(f"[录制] 完成，共 {len(manifest['pages'])} 页，保存在 {out_dir}")
+    return bool(manifest['pages'])
+
+
+async def fill_expected_ids(fixture_dir, manifest):
+    """在保存的快照上提取商品ID作为回放的期望值
+
+    不使用录制时在真实页面上的提取结果：提取会滚动页面，懒加载/虚拟列表在滚动后才渲染的卡片不在快照中，
+    而回放时页面脚本已被中止，这些卡片永远不会出现。
+    """
+    scraper, _ = await open_fixture_scraper(fixture_dir, manifest)
+    try:
+        for entry in manifest['pages']:
+            await scraper.page.goto(entry['url'], wait_until='domcontentloaded')
+            await scraper.wait_for_card_count(1, timeout=5)
+            products = await scraper.extract_products_from_page(entry['page'], manifest['keyword'])
+            entry['expected_ids'] = [p['商品ID'] for p in products if p.get('商品ID')]
+            print(f"[录制] 第 {entry['page']} 页快照中的商品 {len(entry['expected_ids'])} 个")
+    finally:
+        await scraper.close()
+
+
+async def replay(fixture_dir, extract_mode='evaluate'):
+    """用fixture完整执行一次搜索，返回 (商品ID是否与录制时一致, 商品列表)"""
+    manifest = load_manifest(fixture_dir)
+    scraper, router = await open_fixture_scraper(fixture_dir, manifest, extract_mode)
+    try:
+        await scraper.search_products(manifest['keyword'], len(manifest['pages']), delay=0,
+                                      sort_by_latest=manifest.get('sort_by_latest', True))
+        results = list(scraper.results)
+    finally:
+        await scraper.close()
+
+    expected = [pid for page in manifest['pages'] for pid in page.get('expected_ids', [])]
+    actual = [p['商品ID'] for p in results if p.get('商品ID')]
+    missing = set(expected) - set(actual)
+    print(f"[回放] 期望 {len(expected)} 个商品，实际 {len(actual)} 个，缺失 {len(missing)} 个，请求统计: {router.stats}")
+    if missing:
+        print(f"[回放] 缺失的商品ID: {sorted(missing)[:20]}")
+    return not missing, results
+
+
+async def bench(fixture_dir, extract_mode='evaluate', repeat=5):
+    """提取基准测试：每页重复提取 repeat 次，返回统计结果"""
+    manifest = load_manifest(fixture_dir)
+    keyword = manifest['keyword']
+    scraper, _ = await open_fixture_scraper(fixture_dir, manifest, extract_mode)
+    pages = []
+    try:
+        for entry in manifest['pages']:
+            timings = []
+            cards = 0
+            for _ in range(repeat):
+                # 每次重新加载快照（不计入耗时），保证每次提取都从首屏开始完整滚动收集
+                await scraper.page.goto(entry['url'], wait_until='domcontentloaded')
+                await scraper.wait_for_card_count(1, timeout=5)
+                start = time.perf_counter()
+                products = await scraper.extract_products_from_page(entry['page'], keyword)
+                timings.append(time.perf_counter() - start)
+                cards = len(products)
+
+            median = statistics.median(timings)
+            result = {
+                'page': entry['page'],
+                'cards': cards,
+                'median_ms': round(median * 1000, 2),
+                'min_ms': round(min(timings) * 1000, 2),
+                'max_ms': round(max(timings) * 1000, 2),
+                'cards_per_second': round(cards / median, 1) if median else 0
+            }
+
+            # 接口响应解析耗时（纯Python，与浏览器无关）
+            if entry.get('api'):
+                payload = json.loads(read_fixture_file(fixture_dir, entry['api']))
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    parse_search_payload(payload, keyword)
+                result['api_parse_ms'] = round((time.perf_counter() - start) / repeat * 1000, 3)
+
+            pages.append(result)
+            print(f"[基准测试] 第 {entry['page']} 页: {cards} 个卡片, 中位数 {result['median_ms']}ms, "
+                  f"{result['cards_per_second']} 卡片/秒")
+    finally:
+        await scraper.close()
+
+    total_cards = sum(p['cards'] for p in pages)
+    total_seconds = sum(p['median_ms'] for p in pages) / 1000
+    selector_stats = scraper.selector_profile.get_stats()
+    report = {
+        'fixture': fixture_dir,
+        'keyword': keyword,
+        'extract_mode': extract_mode,
+        'repeat': repeat,
+        'pages': pages,
+        'total_cards': total_cards,
+        'cards_per_second': round(total_cards / total_seconds, 1) if total_seconds else 0,
+        'selector_hit_rates': {
+            field: value['hit_rate'] for field, value in selector_stats.items()
+            if isinstance(value, dict) and 'hit_rate' in value
+        },
+        'selector_profile': selector_stats['profile']
+    }
+    print(f"[基准测试] 合计 {total_cards} 个卡片, {report['cards_per_second']} 卡片/秒")
+    print(f"[基准测试] 选择器命中率: {report['selector_hit_rates']}")
+    return report
+
+
+def get_saved_cookie():
+    """未指定 --cookie 时使用系统设置中保存的Cookie"""
+    from web_app import app, get_current_cookie
+    with app.app_context():
+        return get_current_cookie()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='闲鱼爬取录制/回放与提取基准测试')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help='录制真实搜索会话到fixture目录')
+    record_parser.add_argument('--keyword', required=True, help='搜索关键词')
+    record_parser.add_argument('--pages', type=int, default=3, help='录制页数')
+    record_parser.add_argument('--cookie', help='Cookie字符串（默认使用系统设置中的Cookie）')
+    record_parser.add_argument('--out', help='fixture目录（默认 fixtures/<关键词>）')
+
+    replay_parser = subparsers.add_parser('replay', help='离线回放fixture并校验提取结果')
+    replay_parser.add_argument('fixture', help='fixture目录')
+    replay_parser.add_argument('--mode', default='evaluate', choices=['evaluate', 'element'], help='提取模式')
+
+    bench_parser = subparsers.add_parser('bench', help='在fixture上测试提取性能')
+    bench_parser.add_argument('fixture', help='fixture目录')
+    bench_parser.add_argument('--mode', default='evaluate', choices=['evaluate', 'element'], help='提取模式')
+    bench_parser.add_argument('--repeat', type=int, default=5, help='每页重复提取次数')
+    bench_parser.add_argument('--output', help='把结果保存为JSON文件')
+
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        cookie_string = args.cookie or get_saved_cookie()
+        if not cookie_string:
+            print("[录制] 未配置Cookie，请使用 --cookie 指定")
+            sys.exit(1)
+        out_dir = args.out or os.path.join('fixtures', args.keyword)
+        ok = asyncio.run(record(args.keyword, args.pages, cookie_string, out_dir))
+        sys.exit(0 if ok else 1)
+
+    if args.command == 'replay':
+        ok, _ = asyncio.run(replay(args.fixture, args.mode))
+        sys.exit(0 if ok else 1)
+
+    report = asyncio.run(bench(args.fixture, args.mode, max(1, args.repeat)))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[基准测试] 结果已保存到 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
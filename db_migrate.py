@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库迁移与查询计划检查（基于alembic，迁移脚本位于 migrations/versions）
+取代 add_pause_field.py / fix_database.py 等一次性修复脚本：表结构变更一律新增迁移版本。
+
+用法:
+    python db_migrate.py upgrade              # 升级到最新版本（Web应用启动时也会自动执行）
+    python db_migrate.py current              # 查看当前版本
+    python db_migrate.py history              # 查看迁移历史
+    python db_migrate.py revision -m "说明"   # 根据模型变化生成新的迁移脚本
+    python db_migrate.py explain              # 对各热点路由的查询执行 EXPLAIN QUERY PLAN
+"""
+
+import argparse
+import os
+import sys
+from datetime import date, datetime, time as dt_time, timedelta
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+import title_search
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+# 引入迁移之前的表结构对应的版本
+BASELINE_REVISION = '0001'
+
+
+def make_config(connection=None, metadata=None):
+    config = Config()
+    config.set_main_option('script_location', MIGRATIONS_DIR)
+    config.attributes['connection'] = connection
+    config.attributes['target_metadata'] = metadata
+    return config
+
+
+def upgrade_database(db):
+    """把数据库升级到最新版本（需在应用上下文中调用）
+
+    全新数据库直接按模型建表并标记为最新版本；尚未使用迁移的旧数据库先标记为基线版本再逐个升级。
+    之后新增的表（尚无对应迁移）由 create_all 补建。
+    """
+    with db.engine.begin() as connection:
+        tables = inspect(connection).get_table_names()
+        config = make_config(connection, db.metadata)
+
+        if 'alembic_version' not in tables and 'xianyu_products' not in tables:
+            db.metadata.create_all(connection)
+            command.stamp(config, 'head')
+            print("[数据库迁移] 新建数据库，已标记为最新版本")
+            return
+
+        db.metadata.create_all(connection)
+        if 'alembic_version' not in tables:
+            print(f"[数据库迁移] 旧数据库标记为基线版本 {BASELINE_REVISION}")
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, 'head')
+
+
+def hot_queries(db, XianyuProduct):
+    """各热点路由实际执行的查询（与 web_app 中的查询形状保持一致）"""
+    with_image = (XianyuProduct.product_image.isnot(None), XianyuProduct.product_image != '')
+    products = XianyuProduct.query.filter(*with_image)
+    today_start = datetime.combine(date.today(), dt_time.min)
+
+    return [
+        ('首页/商品API 默认排序（创建时间）',
+         products.order_by(XianyuProduct.created_at.desc()).limit(15)),
+        ('首页/商品API 按关键词筛选',
+         products.filter(XianyuProduct.keyword == '手机').order_by(XianyuProduct.created_at.desc()).limit(15)),
+        ('首页/商品API 按发布时间排序',
+         products.order_by(XianyuProduct.search_time.desc().nulls_last()).limit(15)),
+        ('首页/商品API 按价格排序',
+         products.order_by(XianyuProduct.price_value.desc().nulls_last(), XianyuProduct.id.desc()).limit(15)),
+        ('首页/商品API 价格区间',
+         products.filter(XianyuProduct.price_value >= 100, XianyuProduct.price_value <= 500)
+         .order_by(XianyuProduct.price_value.asc().nulls_last(), XianyuProduct.id.asc()).limit(15)),
+        ('首页 关键词列表',
+         db.session.query(XianyuProduct.keyword).distinct()),
+        ('首页/商品API 分页总数、统计API 商品总数',
+         db.session.query(db.func.count(XianyuProduct.id)).filter(*with_image)),
+        ('统计API 关键词分布',
+         db.session.query(XianyuProduct.keyword, db.func.count(XianyuProduct.id)).group_by(XianyuProduct.keyword)),
+        ('统计API 今日新增',
+         db.session.query(db.func.count(XianyuProduct.id)).filter(
+             *with_image,
+             XianyuProduct.created_at >= today_start,
+             XianyuProduct.created_at < today_start + timedelta(days=1))),
+        ('首页/商品API 标题全文检索（按相关度排序）',
+         title_search.apply_search(products, XianyuProduct, '苹果手机')[0]
+         .order_by(title_search.fts_table.c.rank, XianyuProduct.created_at.desc()).limit(15)),
+        ('爬取入库 商品去重',
+         XianyuProduct.query.filter_by(product_id='123456')),
+    ]
+
+
+def explain(db, XianyuProduct):
+    """打印各查询的执行计划，返回仍存在全表扫描或临时排序的查询名称列表"""
+    problems = []
+    for name, query in hot_queries(db, XianyuProduct):
+        sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        plan = [row[3] for row in db.session.execute(db.text('EXPLAIN QUERY PLAN ' + sql))]
+        full_scan = any(step.startswith('SCAN xianyu_products') and 'INDEX' not in step for step in plan)
+        # 全文检索按相关度排序只能对匹配到的行做临时排序，不计为问题
+        fts_search = any('VIRTUAL TABLE' in step for step in plan)
+        temp_sort = not fts_search and any('USE TEMP B-TREE' in step for step in plan)
+        status = '全表扫描' if full_scan else ('临时排序' if temp_sort else '正常')
+        print(f"[查询计划] {name}: {status}")
+        for step in plan:
+            print(f"    {step}")
+        if full_scan or temp_sort:
+            problems.append(name)
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据库迁移与查询计划检查')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('upgrade', help='升级到最新版本')
+    subparsers.add_parser('current', help='查看当前版本')
+    subparsers.add_parser('history', help='查看迁移历史')
+    stamp_parser = subparsers.add_parser('stamp', help='只标记版本，不执行迁移')
+    stamp_parser.add_argument('revision', help='版本号（如 head）')
+    downgrade_parser = subparsers.add_parser('downgrade', help='回退到指定版本')
+    downgrade_parser.add_argument('revision', help='版本号（如 -1）')
+    revision_parser = subparsers.add_parser('revision', help='根据模型变化生成迁移脚本')
+    revision_parser.add_argument('-m', '--message', required=True, help='迁移说明')
+    subparsers.add_parser('explain', help='检查热点查询的执行计划')
+    args = parser.parse_args()
+
+    from web_app import app, db, XianyuProduct, prepare_database
+
+    with app.app_context():
+        if args.command == 'upgrade':
+            prepare_database()
+            print("[数据库迁移] 已升级到最新版本")
+            return
+
+        if args.command == 'explain':
+            problems = explain(db, XianyuProduct)
+            if problems:
+                print(f"[查询计划] {len(problems)} 个查询仍需全表扫描或临时排序: {problems}")
+                sys.exit(1)
+            print("[查询计划] 所有热点查询均使用索引")
+            return
+
+        with db.engine.begin() as connection:
+            config = make_config(connection, db.metadata)
+            if args.command == 'current':
+                command.current(config, verbose=True)
+            elif args.command == 'history':
+                command.history(config, verbose=True)
+            elif args.command == 'stamp':
+                command.stamp(config, args.revision)
+            elif args.command == 'downgrade':
+                command.downgrade(config, args.revision)
+            elif args.command == 'revision':
+                command.revision(config, message=args.message, autogenerate=True)
+
+
+if __name__ == '__main__':
+    main()
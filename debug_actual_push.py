@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import sqlite3
+import db_tuning
 import sys
 import os
 
@@ -10,7 +10,7 @@ def debug_actual_push():
     print("=== 调试实际推送过程 ===")
 
     # 1. 获取最新商品数据
-    conn = sqlite3.connect('instance/xianyu_data.db')
+    conn = db_tuning.connect('instance/xianyu_data.db')
     cursor = conn.cursor()
 
     # 获取最新的5个商品
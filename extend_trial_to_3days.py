@@ -1,13 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import sqlite3
+import db_tuning
 from datetime import datetime, timedelta
 
 def extend_trial_to_3_days():
     """将体验账户延长到3天"""
     try:
-        conn = sqlite3.connect('instance/xianyu_data.db')
+        conn = db_tuning.connect('instance/xianyu_data.db')
         cursor = conn.cursor()
 
         # 将体验账户设置为3天（从现在开始）
@@ -35,7 +35,7 @@ def extend_trial_to_3_days():
         print(f"准确剩余时间: {days}天{hours}小时{minutes}分钟")
 
         # 验证更新
-        conn = sqlite3.connect('instance/xianyu_data.db')
+        conn = db_tuning.connect('instance/xianyu_data.db')
         cursor = conn.cursor()
         cursor.execute('SELECT username, role, trial_expires_at, trial_expired FROM users WHERE role = "trial"')
         user = cursor.fetchone()
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import sqlite3
+import db_tuning
 import requests
 import json
 
@@ -9,7 +9,7 @@ def final_verification():
     print("=== 最终验证测试 ===")
 
     # 1. 验证数据库数据
-    conn = sqlite3.connect('instance/xianyu_data.db')
+    conn = db_tuning.connect('instance/xianyu_data.db')
     cursor = conn.cursor()
 
     cursor.execute('SELECT COUNT(*) FROM xianyu_products')
@@ -1,13 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import sqlite3
+import db_tuning
 from datetime import datetime, timedelta
 
 def fix_trial_account():
     """修复体验账户的过期时间"""
     try:
-        conn = sqlite3.connect('instance/xianyu_data.db')
+        conn = db_tuning.connect('instance/xianyu_data.db')
         cursor = conn.cursor()
 
         # 为体验账户设置2小时的体验时间（从现在开始）
@@ -28,7 +28,7 @@ def fix_trial_account():
         print(f"体验时长: 2小时")
 
         # 验证更新
-        conn = sqlite3.connect('instance/xianyu_data.db')
+        conn = db_tuning.connect('instance/xianyu_data.db')
         cursor = conn.cursor()
         cursor.execute('SELECT username, role, trial_expires_at, trial_expired FROM users WHERE role = "trial"')
         user = cursor.fetchone()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+无浏览器HTTP爬取模式
+直接携带会话Cookie调用mtop搜索接口，用 _m_h5_tk 令牌签名请求，返回与浏览器模式一致的商品字典
+"""
+
+import hashlib
+import json
+import time
+
+import aiohttp
+
+from crawl_control import AdaptivePacer
+from 自动运行抓取器 import CAPTCHA_CODES, SEARCH_API_NAME, cookie_fingerprint, parse_search_payload
+
+# mtop网关地址（可配置为本地替身服务器 mtop_standin.py 用于测试）
+DEFAULT_BASE_URL = 'https://h5api.m.goofish.com/h5'
+MTOP_APP_KEY = '34839810'
+MTOP_API_VERSION = '1.0'
+
+# 令牌失效类返回码：服务端会通过Set-Cookie下发新令牌，可刷新后重试一次
+TOKEN_EXPIRED_CODES = ('FAIL_SYS_TOKEN_EXOIRED', 'FAIL_SYS_TOKEN_EXPIRED', 'FAIL_SYS_TOKEN_EMPTY')
+# 签名/会话无法通过校验的返回码，需回退到浏览器模式
+SIGNING_FAILED_CODES = TOKEN_EXPIRED_CODES + (
+    'FAIL_SYS_ILLEGAL_ACCESS',
+    'FAIL_SYS_SESSION_EXPIRED',
+    'FAIL_SYS_USER_VALIDATE',
+    'RGV587_ERROR'
+)
+
+HTTP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 '
+                  '(KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1',
+    'Accept': 'application/json',
+    'Content-Type': 'application/x-www-form-urlencoded',
+    'Origin': 'https://www.goofish.com',
+    'Referer': 'https://www.goofish.com/'
+}
+
+
+class MtopSigningError(Exception):
+    """请求签名失败（缺少令牌或令牌/会话被服务端拒绝）"""
+
+
+def parse_cookie_string(cookie_string):
+    """把 "a=1; b=2" 形式的Cookie字符串解析为字典"""
+    cookies = {}
+    for item in (cookie_string or '').split(';'):
+        if '=' in item:
+            key, value = item.strip().split('=', 1)
+            cookies[key.strip()] = value.strip()
+    return cookies
+
+
+def sign_request(token, timestamp, app_key, data):
+    """mtop签名：md5(token&t&appKey&data)"""
+    raw = f"{token}&{timestamp}&{app_key}&{data}"
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def build_search_data(keyword, page_number=1, sort_by_latest=True, rows_per_page=30):
+    """构造搜索接口的data参数（与网页端请求一致）"""
+    data = {
+        'pageNumber': page_number,
+        'keyword': keyword,
+        'fromFilter': False,
+        'rowsPerPage': rows_per_page,
+        'sortValue': '',
+        'sortField': '',
+        'customDistance': '',
+        'gps': '',
+        'propValueStr': {},
+        'customGps': '',
+        'searchReqFromPage': 'pcSearch',
+        'extraFilterValue': '{}',
+        'userPositionJson': '{}'
+    }
+    if sort_by_latest:
+        data['sortValue'] = 'desc'
+        data['sortField'] = 'create'
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+
+class MtopSearchClient:
+    """复用keep-alive连接池的mtop搜索客户端
+
+    aiohttp会话绑定创建它的事件循环，应在常驻事件循环（如浏览器池的循环）中使用。
+    服务端刷新的令牌Cookie按账号缓存，后续请求自动使用新令牌。
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, app_key=MTOP_APP_KEY, timeout=15, max_connections=10):
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip('/')
+        self.app_key = app_key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.session = None
+        self._refreshed_cookies = {}
+        self.stats = {
+            'requests': 0,
+            'token_refreshes': 0,
+            'signing_failures': 0,
+            'errors': 0
+        }
+
+    def configure(self, base_url=None):
+        """更新网关地址（地址变化时清除按账号缓存的刷新令牌；连接池按主机管理连接，无需重建）"""
+        base_url = (base_url or DEFAULT_BASE_URL).rstrip('/')
+        if base_url != self.base_url:
+            self.base_url = base_url
+            self._refreshed_cookies = {}
+
+    async def _get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                cookie_jar=aiohttp.DummyCookieJar(),  # Cookie按账号手动携带
+                headers=HTTP_HEADERS
+            )
+        return self.session
+
+    def _account_cookies(self, cookie_string):
+        cookies = parse_cookie_string(cookie_string)
+        cookies.update(self._refreshed_cookies.get(cookie_string, {}))
+        return cookies
+
+    async def _post(self, api, data, cookies):
+        token = (cookies.get('_m_h5_tk') or '').split('_')[0]
+        if not token:
+            raise MtopSigningError("Cookie中缺少 _m_h5_tk 令牌")
+
+        timestamp = str(int(time.time() * 1000))
+        params = {
+            'jsv': '2.7.2',
+            'appKey': self.app_key,
+            't': timestamp,
+            'sign': sign_request(token, timestamp, self.app_key, data),
+            'v': MTOP_API_VERSION,
+            'type': 'originaljson',
+            'accountSite': 'xianyu',
+            'dataType': 'json',
+            'timeout': '20000',
+            'api': api,
+            'sessionOption': 'AutoLoginOnly'
+        }
+        cookie_header = '; '.join(f'{k}={v}' for k, v in cookies.items())
+
+        session = await self._get_session()
+        self.stats['requests'] += 1
+        url = f"{self.base_url}/{api}/{MTOP_API_VERSION}/"
+        async with session.post(url, params=params, data={'data': data},
+                                headers={'Cookie': cookie_header}) as response:
+            payload = await response.json(content_type=None)
+            new_cookies = {key: morsel.value for key, morsel in response.cookies.items()
+                           if key in ('_m_h5_tk', '_m_h5_tk_enc')}
+            return payload, new_cookies
+
+    async def search(self, cookie_string, keyword, page_number=1, sort_by_latest=True):
+        """请求一页搜索结果，返回接口JSON；签名无法通过时抛出MtopSigningError"""
+        data = build_search_data(keyword, page_number, sort_by_latest)
+
+        for attempt in range(2):
+            try:
+                payload, new_cookies = await self._post(SEARCH_API_NAME, data, self._account_cookies(cookie_string))
+            except MtopSigningError:
+                self.stats['signing_failures'] += 1
+                raise
+            except Exception:
+                self.stats['errors'] += 1
+                raise
+
+            ret = [str(r) for r in (payload or {}).get('ret') or []]
+            if any(r.startswith('SUCCESS') for r in ret):
+                return payload
+
+            # 令牌过期：服务端已下发新令牌，保存后重试一次
+            if attempt == 0 and new_cookies and any(r.startswith(TOKEN_EXPIRED_CODES) for r in ret):
+                print("[HTTP爬取] 令牌已过期，使用服务端下发的新令牌重试")
+                self.stats['token_refreshes'] += 1
+                self._refreshed_cookies.setdefault(cookie_string, {}).update(new_cookies)
+                continue
+
+            if any(r.startswith(SIGNING_FAILED_CODES) for r in ret):
+                self.stats['signing_failures'] += 1
+                raise MtopSigningError(f"接口拒绝请求: {ret}")
+
+            self.stats['errors'] += 1
+            raise RuntimeError(f"搜索接口返回异常: {ret}")
+
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['base_url'] = self.base_url
+        stats['connected'] = bool(self.session and not self.session.closed)
+        return stats
+
+
+class HttpXianyuScraper:
+    """HTTP模式爬虫，接口与 AutoXianyuScraper.search_products 保持一致"""
+
+    def __init__(self, cookie_string, client, pacer=None):
+        self.cookie_string = cookie_string
+        self.client = client
+        self.pacer = pacer if pacer is not None else AdaptivePacer()
+        self.pacer_key = cookie_fingerprint(cookie_string)
+        self.results = []
+        self.pages_loaded = 0
+        self.watermark_reached = False
+        self.page_metrics = []
+        # 每提取完一页调用的协程函数 page_sink(商品列表)，用于边爬边入库
+        self.page_sink = None
+        # 接口返回验证码类错误时记录拦截原因（与浏览器模式一致）
+        self.block_reason = ''
+
+    async def search_products(self, keyword="手机", max_pages=3, delay=2, sort_by_latest=True, known_ids=None):
+        """逐页请求搜索接口；第1页签名失败时抛出MtopSigningError，由调用方回退到浏览器模式
+
+        触发验证码时不抛出异常，记录 block_reason 后结束。
+        """
+        print(f"[HTTP爬取] 关键词: {keyword}, 目标页数: {max_pages}, 网关: {self.client.base_url}")
+        known_ids = set(known_ids or []) if sort_by_latest else set()
+        seen_ids = set()
+
+        for page in range(1, max_pages + 1):
+            start_time = time.time()
+            try:
+                payload = await self.client.search(self.cookie_string, keyword, page, sort_by_latest)
+            except MtopSigningError as e:
+                if any(code in str(e) for code in CAPTCHA_CODES):
+                    # 触发验证码：换浏览器也会被拦截，直接结束并交由熔断器处理
+                    print("[拦截检测] 搜索接口要求验证，立即结束本次爬取")
+                    self.pacer.record(self.pacer_key, 'captcha')
+                    self.block_reason = 'captcha'
+                    break
+                if page > 1:
+                    # 前面的页面已交给 page_sink 入库，回退到浏览器会从第1页重新爬取并重复入库，只保留已爬取的结果
+                    print(f"[HTTP爬取] 第 {page} 页签名失败，保留前 {page - 1} 页结果: {str(e)}")
+                    self.pacer.record(self.pacer_key, 'error')
+                    break
+                raise
+            except Exception as e:
+                print(f"[HTTP爬取] 第 {page} 页请求失败: {str(e)}")
+                self.pacer.record(self.pacer_key, 'error')
+                break
+
+            self.pages_loaded += 1
+            page_products = parse_search_payload(payload, keyword, source='HTTP+搜索接口')
+            self.page_metrics.append({'page': page, 'source': 'http', 'cards': len(page_products),
+                                      'visible_max': len(page_products), 'scrolls': 0})
+            self.pacer.record(self.pacer_key, 'ok' if page_products else 'empty', latency=time.time() - start_time)
+            print(f"[HTTP爬取] 第 {page} 页获得 {len(page_products)} 个商品，耗时 {time.time() - start_time:.2f}秒")
+            if not page_products:
+                break
+
+            page_ids = {p['商品ID'] for p in page_products}
+            if page > 1 and page_ids <= seen_ids:
+                print(f"[HTTP爬取] 第 {page} 页与之前页面完全重复，结束爬取")
+                break
+            seen_ids |= page_ids
+
+            if known_ids and not (page_ids - known_ids):
+                print(f"[水位线] 第 {page} 页商品均为上次已爬取的商品，停止翻页")
+                self.watermark_reached = True
+                break
+
+            self.results.extend(page_products)
+            if self.page_sink:
+                await self.page_sink(page_products)
+
+            if (payload.get('data') or {}).get('isFinish') is True:
+                break
+            if page < max_pages:
+                # 翻页间隔由自适应节奏控制器决定，delay 仅作为初始值
+                await self.pacer.wait(self.pacer_key, delay)
+
+        print(f"[HTTP爬取] 总计获得 {len(self.results)} 个商品")
+        return len(self.results) > 0 or self.watermark_reached
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商品图片缩略图缓存
+每张商品图片只从CDN下载一次，缩放为JPEG缩略图保存在本地目录，由Web端以长缓存头直接返回。
+磁盘占用超过上限时按最近访问时间（LRU）淘汰最旧的缩略图；新商品入库后在后台线程预取缩略图。
+"""
+
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PIL import Image
+
+IMAGE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                  '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Referer': 'https://www.goofish.com/'
+}
+
+
+def normalize_image_url(url):
+    """补全协议（页面中的图片地址常以 // 开头）"""
+    url = (url or '').strip()
+    if url.startswith('//'):
+        return 'https:' + url
+    return url
+
+
+class ThumbnailCache:
+    """磁盘缩略图缓存（线程安全）
+
+    缩略图按原图URL的sha1命名；内存中按访问顺序维护 文件名 -> 字节数 的索引，
+    启动时按文件修改时间重建，命中时同步更新修改时间，重启后LRU顺序不丢失。
+    """
+
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024, size=(360, 360), quality=80,
+                 timeout=10, max_source_bytes=10 * 1024 * 1024, workers=4):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.size = size
+        self.quality = quality
+        self.timeout = timeout
+        self.max_source_bytes = max_source_bytes
+        self.workers = workers
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._executor = None
+        self._http = requests.Session()
+        self._http.headers.update(IMAGE_HEADERS)
+        self.stats = {'hits': 0, 'misses': 0, 'fetch_errors': 0, 'evictions': 0, 'prefetched': 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+        self._evict()
+
+    def _load_index(self):
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.jpg'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self.entries[name] = size
+            self.total_bytes += size
+        if files:
+            print(f"[图片缓存] 已加载 {len(files)} 张缩略图，占用 {self.total_bytes / 1024 / 1024:.1f}MB")
+
+    @staticmethod
+    def cache_name(url):
+        return hashlib.sha1(normalize_image_url(url).encode('utf-8')).hexdigest() + '.jpg'
+
+    def lookup(self, url):
+        """已缓存时返回缩略图路径并标记为最近使用，否则返回None"""
+        name = self.cache_name(url)
+        path = os.path.join(self.cache_dir, name)
+        with self._lock:
+            if name not in self.entries:
+                # 其他进程（如爬取worker）预取的缩略图：加入本进程索引
+                if not os.path.exists(path):
+                    return None
+                self.entries[name] = os.path.getsize(path)
+                self.total_bytes += self.entries[name]
+            self.entries.move_to_end(name)
+        try:
+            os.utime(path)
+        except OSError:
+            # 文件被外部删除：从索引中移除，按未缓存处理
+            with self._lock:
+                self.total_bytes -= self.entries.pop(name, 0)
+            return None
+        return path
+
+    def get(self, url):
+        """返回缩略图路径；未缓存时下载并生成，下载或解码失败返回None
+
+        同一URL并发请求时只下载一次，其余请求等待结果。
+        """
+        url = normalize_image_url(url)
+        if not url.startswith(('http://', 'https://')):
+            return None
+
+        path = self.lookup(url)
+        if path:
+            self.stats['hits'] += 1
+            return path
+
+        name = self.cache_name(url)
+        with self._lock:
+            event = self._inflight.get(name)
+            owner = event is None
+            if owner:
+                event = self._inflight[name] = threading.Event()
+
+        if not owner:
+            event.wait(self.timeout * 2)
+            return self.lookup(url)
+
+        self.stats['misses'] += 1
+        try:
+            return self._fetch(url, name)
+        finally:
+            with self._lock:
+                self._inflight.pop(name, None)
+            event.set()
+
+    def _fetch(self, url, name):
+        start_time = time.time()
+        try:
+            response = self._http.get(url, timeout=self.timeout, stream=True)
+            response.raise_for_status()
+            data = response.raw.read(self.max_source_bytes + 1, decode_content=True)
+            if len(data) > self.max_source_bytes:
+                raise ValueError(f"原图超过 {self.max_source_bytes // 1024 // 1024}MB")
+
+            image = Image.open(io.BytesIO(data))
+            image.draft('RGB', self.size)  # JPEG原图直接按缩小比例解码
+            image = image.convert('RGB')
+            image.thumbnail(self.size)
+            output = io.BytesIO()
+            image.save(output, 'JPEG', quality=self.quality, optimize=True, progressive=True)
+        except Exception as e:
+            self.stats['fetch_errors'] += 1
+            print(f"[图片缓存] 获取图片失败 {url[:80]}: {str(e)}")
+            return None
+
+        path = os.path.join(self.cache_dir, name)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(output.getvalue())
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self.total_bytes += output.tell() - self.entries.pop(name, 0)
+            self.entries[name] = output.tell()
+        self._evict()
+        print(f"[图片缓存] 已缓存缩略图 {len(data) // 1024}KB -> {output.tell() // 1024}KB，"
+              f"耗时 {time.time() - start_time:.2f}秒")
+        return path
+
+    def _evict(self):
+        """超过磁盘上限时删除最久未访问的缩略图"""
+        removed = []
+        with self._lock:
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                name, size = self.entries.popitem(last=False)
+                self.total_bytes -= size
+                removed.append(name)
+            self.stats['evictions'] += len(removed)
+        for name in removed:
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+        if removed:
+            print(f"[图片缓存] 超过上限，淘汰 {len(removed)} 张最久未访问的缩略图")
+
+    def prefetch(self, urls):
+        """后台线程预取一批图片的缩略图（已缓存的跳过），返回提交的数量"""
+        pending = []
+        for url in dict.fromkeys(normalize_image_url(u) for u in urls if u):
+            if url.startswith(('http://', 'https://')) and self.cache_name(url) not in self.entries:
+                pending.append(url)
+        if not pending:
+            return 0
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='thumb-prefetch')
+            executor = self._executor
+        for url in pending:
+            executor.submit(self._prefetch_one, url)
+        return len(pending)
+
+    def _prefetch_one(self, url):
+        if self.get(url):
+            self.stats['prefetched'] += 1
+
+    def configure(self, max_bytes=None):
+        if max_bytes:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            names = list(self.entries)
+            self.entries.clear()
+            self.total_bytes = 0
+        for name in names:
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+        return len(names)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats.update({
+            'cache_dir': self.cache_dir,
+            'count': len(self.entries),
+            'total_mb': round(self.total_bytes / 1024 / 1024, 2),
+            'max_mb': round(self.max_bytes / 1024 / 1024, 2),
+            'thumbnail_size': list(self.size)
+        })
+        return stats
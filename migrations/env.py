@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Alembic 运行环境
+由 db_migrate.py 调用时通过 config.attributes 传入已打开的数据库连接和模型元数据；
+直接使用 alembic 命令行时从 web_app 获取数据库连接。
+"""
+
+from alembic import context
+
+config = context.config
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # FTS5虚拟表及其影子表不由模型声明，自动生成迁移时忽略
+    return not (type_ == 'table' and name.startswith('xianyu_products_fts'))
+
+
+def run_migrations(connection, target_metadata):
+    # SQLite 不支持大部分 ALTER TABLE 操作，使用批量模式（重建表）生成迁移
+    context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True,
+                      include_object=include_object)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connection = config.attributes.get('connection')
+    if connection is not None:
+        run_migrations(connection, config.attributes.get('target_metadata'))
+        return
+
+    from web_app import app, db
+    with app.app_context():
+        with db.engine.connect() as connection:
+            run_migrations(connection, db.metadata)
+            connection.commit()
+
+
+if context.is_offline_mode():
+    raise SystemExit("不支持离线模式，请直接对数据库执行迁移")
+
+run_migrations_online()
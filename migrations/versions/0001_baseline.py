@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""基线：引入迁移之前由 db.create_all() 创建的表结构
+
+已有数据库在首次执行 db_migrate.py upgrade 时标记为此版本，之后逐个执行后续迁移。
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+"""
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    pass
+
+
+def downgrade():
+    pass
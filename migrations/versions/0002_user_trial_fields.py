@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""用户表补充体验账户字段（取代 fix_database.py 和 add_pause_field.py）
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    sa.Column('trial_expired', sa.Boolean(), server_default=sa.false()),
+    sa.Column('paused', sa.Integer(), server_default='0'),
+    sa.Column('paused_at', sa.DateTime()),
+    sa.Column('paused_remaining_minutes', sa.Integer(), server_default='0'),
+]
+
+
+def upgrade():
+    # 旧数据库可能已手动执行过修复脚本，只添加缺少的列
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('users')}
+    for column in COLUMNS:
+        if column.name not in existing:
+            op.add_column('users', column)
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        for column in reversed(COLUMNS):
+            batch_op.drop_column(column.name)
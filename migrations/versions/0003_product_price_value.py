@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""商品表添加价格数值列及索引（数值由应用启动时回填）
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'price_value' not in {column['name'] for column in inspector.get_columns('xianyu_products')}:
+        op.add_column('xianyu_products', sa.Column('price_value', sa.Float()))
+    if 'ix_xianyu_products_price_value' not in {index['name'] for index in inspector.get_indexes('xianyu_products')}:
+        op.create_index('ix_xianyu_products_price_value', 'xianyu_products', ['price_value'])
+
+
+def downgrade():
+    op.drop_index('ix_xianyu_products_price_value', table_name='xianyu_products')
+    with op.batch_alter_table('xianyu_products') as batch_op:
+        batch_op.drop_column('price_value')
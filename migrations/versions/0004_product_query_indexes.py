@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""商品表按列表页和统计的查询形状添加索引
+
+- (keyword, created_at): 按关键词筛选并按创建时间排序、按关键词分组统计
+- search_time: 按发布时间排序
+- 有图片的行上的 (created_at, product_image) 部分索引: 列表页默认查询、分页总数和今日新增统计
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+WITH_IMAGE = sa.text("product_image IS NOT NULL AND product_image != ''")
+
+
+def upgrade():
+    op.create_index('ix_xianyu_products_keyword_created_at', 'xianyu_products', ['keyword', 'created_at'])
+    op.create_index('ix_xianyu_products_search_time', 'xianyu_products', ['search_time'])
+    op.create_index('ix_xianyu_products_with_image_created_at', 'xianyu_products', ['created_at', 'product_image'],
+                    sqlite_where=WITH_IMAGE)
+    # 让查询规划器获得新索引的统计信息
+    op.execute('ANALYZE xianyu_products')
+
+
+def downgrade():
+    op.drop_index('ix_xianyu_products_with_image_created_at', table_name='xianyu_products')
+    op.drop_index('ix_xianyu_products_search_time', table_name='xianyu_products')
+    op.drop_index('ix_xianyu_products_keyword_created_at', table_name='xianyu_products')
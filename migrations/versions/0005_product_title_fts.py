@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""商品标题全文索引（FTS5虚拟表，rowid 对应商品id，内容为中文二元组切分后的检索词）
+
+索引内容由应用写入（见 title_search.py），升级后首次启动时由 backfill_title_index() 为已有商品补建。
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from title_search import CREATE_FTS_SQL, FTS_TABLE
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(CREATE_FTS_SQL)
+
+
+def downgrade():
+    op.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
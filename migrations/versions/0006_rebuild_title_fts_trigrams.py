@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""重建商品标题全文索引：字母数字串改为按三元组切分（按词切分时 phone 无法匹配 iPhone15）
+
+只清空索引内容，升级后首次启动时由 backfill_title_index() 按新的切分方式重新写入。
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+
+from title_search import FTS_TABLE
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(f'DELETE FROM {FTS_TABLE}')
+
+
+def downgrade():
+    # 索引内容由应用按当前代码的切分方式补建，回退时同样清空
+    op.execute(f'DELETE FROM {FTS_TABLE}')
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+mtop搜索接口本地替身服务器（用于测试HTTP爬取模式）
+按与网关相同的规则校验 _m_h5_tk 令牌签名，返回预置的搜索结果；
+可模拟令牌过期（通过Set-Cookie下发新令牌）、签名被拒绝（全部或从某页开始）和验证码拦截。
+
+用法:
+    python mtop_standin.py --port 8765 --items 90
+    然后在系统设置中把 crawl_http_base_url 设为 http://127.0.0.1:8765/h5，
+    Cookie 使用 _m_h5_tk=standin_0（或任意令牌，服务器会先按令牌过期处理并下发新令牌）
+"""
+
+import argparse
+import asyncio
+import json
+
+from aiohttp import web
+
+from http_scraper import MTOP_APP_KEY, MTOP_API_VERSION, parse_cookie_string, sign_request
+from 自动运行抓取器 import SEARCH_API_NAME
+
+DEFAULT_TOKEN = 'standin'
+
+# 服务器状态在 app 中的键
+TOKEN_KEY = web.AppKey('token', str)
+ITEMS_KEY = web.AppKey('items', list)
+MODE_KEY = web.AppKey('mode', str)
+REJECT_FROM_KEY = web.AppKey('reject_from_page', int)
+REQUESTS_KEY = web.AppKey('requests', list)
+
+
+def make_items(count, keyword='手机', start_id=700000000000):
+    """生成预置商品（接口 resultList 中的 item 结构）"""
+    items = []
+    for index in range(count):
+        item_id = str(start_id + index)
+        items.append({
+            'data': {'item': {'main': {
+                'exContent': {
+                    'itemId': item_id,
+                    'title': f'{keyword} 替身商品 {index + 1}',
+                    'price': [{'text': '¥'}, {'text': str(100 + index)}],
+                    'area': '杭州',
+                    'picUrl': f'//img.example.com/{item_id}.jpg',
+                    'userNickName': f'卖家{index + 1}'
+                },
+                'clickParam': {'args': {'item_id': item_id, 'publishTime': str(1700000000000 + index * 1000)}}
+            }}}
+        })
+    return items
+
+
+def _ret(code, message):
+    return [f'{code}::{message}']
+
+
+async def handle_mtop(request):
+    """模拟 /h5/<api>/<版本>/ 网关"""
+    app = request.app
+    params = request.query
+    form = await request.post()
+    data = form.get('data', '')
+    cookies = parse_cookie_string(request.headers.get('Cookie', ''))
+    token = (cookies.get('_m_h5_tk') or '').split('_')[0]
+    app[REQUESTS_KEY].append({'api': request.match_info['api'], 'token': token, 'data': data})
+
+    if request.match_info['api'] != SEARCH_API_NAME:
+        return web.json_response({'ret': _ret('FAIL_SYS_API_NOT_FOUNDED', '接口不存在')})
+
+    mode = app[MODE_KEY]
+    if mode == 'captcha':
+        return web.json_response({'ret': _ret('RGV587_ERROR', '哎哟喂,被挤爆啦,请稍后重试')})
+    if mode == 'reject':
+        return web.json_response({'ret': _ret('FAIL_SYS_ILLEGAL_ACCESS', '非法请求')})
+
+    if token != app[TOKEN_KEY]:
+        # 与真实网关一致：令牌过期时在Set-Cookie中下发新令牌
+        response = web.json_response({'ret': _ret('FAIL_SYS_TOKEN_EXOIRED', '令牌过期')})
+        response.set_cookie('_m_h5_tk', f"{app[TOKEN_KEY]}_{params.get('t', '0')}")
+        response.set_cookie('_m_h5_tk_enc', 'standin_enc')
+        return response
+
+    expected = sign_request(token, params.get('t', ''), params.get('appKey', ''), data)
+    if params.get('appKey') != MTOP_APP_KEY or params.get('sign') != expected:
+        return web.json_response({'ret': _ret('FAIL_SYS_ILLEGAL_ACCESS', '签名错误')})
+
+    search = json.loads(data or '{}')
+    page_number = int(search.get('pageNumber') or 1)
+    rows_per_page = int(search.get('rowsPerPage') or 30)
+    if app[REJECT_FROM_KEY] and page_number >= app[REJECT_FROM_KEY]:
+        return web.json_response({'ret': _ret('FAIL_SYS_SESSION_EXPIRED', '会话过期')})
+    items = app[ITEMS_KEY]
+    start = (page_number - 1) * rows_per_page
+    return web.json_response({
+        'api': SEARCH_API_NAME,
+        'ret': _ret('SUCCESS', '调用成功'),
+        'data': {
+            'resultList': items[start:start + rows_per_page],
+            'isFinish': start + rows_per_page >= len(items)
+        }
+    })
+
+
+def create_app(items=None, token=DEFAULT_TOKEN, mode='normal', reject_from_page=0):
+    """创建替身服务器应用
+
+    mode: normal=正常返回，reject=签名总被拒绝（用于测试回退到浏览器模式），captcha=总是要求验证码
+    reject_from_page: 大于0时从该页起返回会话过期（模拟翻页途中签名失效）
+    """
+    app = web.Application()
+    app[TOKEN_KEY] = token
+    app[ITEMS_KEY] = make_items(90) if items is None else items
+    app[MODE_KEY] = mode
+    app[REJECT_FROM_KEY] = reject_from_page
+    app[REQUESTS_KEY] = []
+    app.router.add_post(f'/h5/{{api}}/{MTOP_API_VERSION}/', handle_mtop)
+    return app
+
+
+async def start_standin(app, host='127.0.0.1', port=0):
+    """在当前事件循环中启动替身服务器，返回 (runner, 网关地址)；port=0 时使用随机空闲端口"""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f'http://{host}:{port}/h5'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='mtop搜索接口本地替身服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--items', type=int, default=90, help='预置商品数量')
+    parser.add_argument('--keyword', default='手机', help='预置商品标题中的关键词')
+    parser.add_argument('--mode', choices=('normal', 'reject', 'captcha'), default='normal')
+    args = parser.parse_args()
+
+    async def serve():
+        app = create_app(make_items(args.items, args.keyword), mode=args.mode)
+        runner, base_url = await start_standin(app, args.host, args.port)
+        print(f"[替身服务器] 已启动: {base_url}（模式: {args.mode}，商品数: {args.items}）")
+        print(f"[替身服务器] 请把 crawl_http_base_url 设置为 {base_url}，按 Ctrl+C 停止")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("[替身服务器] 已停止")
+
+
+if __name__ == '__main__':
+    main()
@@ -27,6 +27,9 @@ def create_package():
     # 需要包含的文件和目录
     include_files = [
         "web_app.py",
+        "db_migrate.py",
+        "title_search.py",
+        "alembic.ini",
         "requirements.txt",
         "deploy_start.py",
         "check_deployment.py",
@@ -45,7 +48,8 @@ def create_package():
     include_dirs = [
         "templates",
         "static",
-        "instance"
+        "instance",
+        "migrations"
     ]
 
     # 排除的文件和目录
@@ -4,7 +4,7 @@
 重置体验账户为首次登录状态（清空过期时间，让首次登录时开始3天倒计时）
 """
 
-import sqlite3
+import db_tuning
 import os
 
 def reset_trial_for_first_login():
@@ -17,7 +17,7 @@ def reset_trial_for_first_login():
 
     try:
         # 连接数据库
-        conn = sqlite3.connect(db_path)
+        conn = db_tuning.connect(db_path)
         cursor = conn.cursor()
 
         # 重置体验账户：清空过期时间，重置过期状态
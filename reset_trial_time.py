@@ -4,7 +4,7 @@
 重置体验账户时间为2分钟（用于测试）
 """
 
-import sqlite3
+import db_tuning
 import os
 from datetime import datetime, timedelta
 
@@ -18,7 +18,7 @@ def reset_trial_time():
 
     try:
         # 连接数据库
-        conn = sqlite3.connect(db_path)
+        conn = db_tuning.connect(db_path)
         cursor = conn.cursor()
 
         # 查找体验账户
@@ -4,7 +4,7 @@
 重置体验账户时间为3天（恢复正常设置）
 """
 
-import sqlite3
+import db_tuning
 import os
 from datetime import datetime, timedelta
 
@@ -18,7 +18,7 @@ def reset_trial_to_3days():
 
     try:
         # 连接数据库
-        conn = sqlite3.connect(db_path)
+        conn = db_tuning.connect(db_path)
         cursor = conn.cursor()
 
         # 查找体验账户
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬取任务队列worker
+独立进程运行，从数据库的 scrape_jobs 表领取任务并执行爬取。可在多核或多台机器上启动多个worker。
+
+用法: python scrape_worker.py [--worker-id ID] [--lease 120] [--poll 5] [--once]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import threading
+import time
+import traceback
+
+from web_app import (
+    app,
+    db,
+    claim_scrape_job,
+    heartbeat_scrape_job,
+    finish_scrape_job,
+    prepare_database,
+    scrape_xianyu_keywords,
+    split_keywords
+)
+
+
+class HeartbeatThread(threading.Thread):
+    """执行任务期间定期续租，worker进程退出后租约自然过期，任务会被其他worker重新领取"""
+
+    def __init__(self, job_id, worker_id, lease_seconds):
+        super().__init__(name=f'heartbeat-{job_id}', daemon=True)
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+        self.lease_lost = False
+
+    def run(self):
+        interval = max(1, self.lease_seconds / 3)
+        while not self.stopped.wait(interval):
+            with app.app_context():
+                try:
+                    if not heartbeat_scrape_job(self.job_id, self.worker_id, self.lease_seconds):
+                        print(f"[Worker] 任务 #{self.job_id} 租约已被其他worker接管")
+                        self.lease_lost = True
+                        return
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"[Worker] 任务 #{self.job_id} 心跳失败: {str(e)}")
+
+    def stop(self):
+        self.stopped.set()
+
+
+def run_job(job, worker_id, lease_seconds):
+    """执行一个已领取的任务"""
+    print(f"[Worker] 开始执行任务 #{job.id} (第{job.attempts}次): 关键词={job.keyword}, 页数={job.max_pages}")
+    heartbeat = HeartbeatThread(job.id, worker_id, lease_seconds)
+    heartbeat.start()
+
+    start_time = time.time()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        success, message = loop.run_until_complete(
+            scrape_xianyu_keywords(split_keywords(job.keyword), job.max_pages, job.delay)
+        )
+        retry = False
+    except Exception as e:
+        print(f"[Worker] 任务 #{job.id} 执行异常: {str(e)}")
+        traceback.print_exc()
+        success, message, retry = False, f"执行异常: {str(e)}", True
+    finally:
+        loop.close()
+        heartbeat.stop()
+        heartbeat.join(timeout=5)
+
+    print(f"[Worker] 任务 #{job.id} 执行完成，耗时 {time.time() - start_time:.2f}秒")
+    finish_scrape_job(job.id, worker_id, success, message, retry=retry)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='闲鱼爬取任务队列worker')
+    parser.add_argument('--worker-id', default=f'{socket.gethostname()}-{os.getpid()}', help='worker标识')
+    parser.add_argument('--lease', type=int, default=120, help='租约时长（秒），心跳间隔为其1/3')
+    parser.add_argument('--poll', type=float, default=5, help='队列为空时的轮询间隔（秒）')
+    parser.add_argument('--once', action='store_true', help='执行完当前队列中的任务后退出')
+    args = parser.parse_args()
+
+    print(f"[Worker] {args.worker_id} 已启动 (租约={args.lease}秒, 轮询间隔={args.poll}秒)")
+    with app.app_context():
+        # 与Web应用相同：按迁移升级表结构（先于Web应用启动时也会标记版本）
+        prepare_database()
+
+    while True:
+        with app.app_context():
+            try:
+                job = claim_scrape_job(args.worker_id, args.lease)
+                if job:
+                    run_job(job, args.worker_id, args.lease)
+                    continue
+            except Exception as e:
+                db.session.rollback()
+                print(f"[Worker] 领取任务失败: {str(e)}")
+
+        if args.once:
+            print("[Worker] 队列已空，退出")
+            break
+        time.sleep(args.poll)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,7 @@
 将体验账户时间设置为2分钟（用于测试倒计时功能）
 """
 
-import sqlite3
+import db_tuning
 import os
 from datetime import datetime, timedelta
 
@@ -18,7 +18,7 @@ def set_trial_to_2minutes():
 
     try:
         # 连接数据库
-        conn = sqlite3.connect(db_path)
+        conn = db_tuning.connect(db_path)
         cursor = conn.cursor()
 
         # 查找体验账户
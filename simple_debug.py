@@ -3,9 +3,9 @@
 
 def simple_test():
     # 测试当前数据库中的实际数据
-    import sqlite3
+    import db_tuning
 
-    conn = sqlite3.connect('instance/xianyu_data.db')
+    conn = db_tuning.connect('instance/xianyu_data.db')
     cursor = conn.cursor()
 
     # 获取最新的魅族商品
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+账号熔断器测试：冷却结束后只放行一次试探爬取，试探的结果决定恢复或重新熔断
+"""
+
+import time
+
+import pytest
+
+from crawl_control import AccountBlockedError, CircuitBreaker
+
+
+def cooled_down_breaker():
+    """返回一个已熔断且冷却期刚结束的熔断器"""
+    breaker = CircuitBreaker(cooldown=60)
+    breaker.trip('acc', 'captcha')
+    breaker.accounts['acc']['open_until'] = time.time() - 1
+    return breaker
+
+
+def test_only_one_probe_after_cooldown():
+    breaker = cooled_down_breaker()
+    probes = []
+    breaker.on_probe = probes.append
+
+    # 只查询状态不占用试探名额
+    assert breaker.check('acc')[0]
+    breaker.ensure_allowed('acc')
+    assert probes == ['acc']
+
+    # 试探进行中：其他爬取和账号挑选都不放行
+    assert not breaker.check('acc')[0]
+    with pytest.raises(AccountBlockedError):
+        breaker.ensure_allowed('acc')
+
+    breaker.record_success('acc')
+    assert breaker.accounts['acc']['state'] == 'closed'
+    breaker.ensure_allowed('acc')
+    breaker.ensure_allowed('acc')
+
+
+def test_failed_probe_trips_again_with_longer_cooldown():
+    breaker = cooled_down_breaker()
+    breaker.ensure_allowed('acc')
+
+    breaker.record_failure('acc', '页面加载超时')
+
+    entry = breaker.accounts['acc']
+    assert entry['state'] == 'open'
+    assert entry['trips'] == 2
+    assert entry['open_until'] - time.time() > 100
+    assert not breaker.check('acc')[0]
+
+
+def test_failure_outside_probe_does_not_trip():
+    breaker = CircuitBreaker()
+    breaker.ensure_allowed('acc')
+    breaker.record_failure('acc', '没有获取到数据')
+    assert breaker.check('acc')[0]
+
+
+def test_released_or_stale_probe_allows_a_new_probe():
+    breaker = cooled_down_breaker()
+    breaker.ensure_allowed('acc')
+    breaker.release('acc')
+    breaker.ensure_allowed('acc')
+
+    # 执行试探的进程异常退出：超时后允许再次试探
+    breaker.accounts['acc']['probe_started'] = time.time() - breaker.probe_timeout - 1
+    breaker.ensure_allowed('acc')
+
+
+def test_probe_is_shared_through_merge():
+    worker_a = cooled_down_breaker()
+    worker_b = CircuitBreaker(cooldown=60)
+    worker_b.merge(worker_a.export())
+
+    worker_a.ensure_allowed('acc')
+    worker_b.merge(worker_a.export())
+    with pytest.raises(AccountBlockedError):
+        worker_b.ensure_allowed('acc')
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP爬取模式测试：在本地替身服务器（mtop_standin.py）上验证签名、令牌过期重试、验证码拦截和回退到浏览器模式
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from browser_pool import BrowserPool
+from crawl_control import AdaptivePacer
+from http_scraper import HttpXianyuScraper, MtopSearchClient, MtopSigningError
+from mtop_standin import REQUESTS_KEY, create_app, make_items, start_standin
+
+COOKIE = '_m_h5_tk=standin_1700000000000; _m_h5_tk_enc=abc; cookie2=session'
+
+
+def no_delay_pacer():
+    return AdaptivePacer({'min_delay': 0, 'max_delay': 0})
+
+
+async def crawl_standin(cookie_string, max_pages=5, **app_options):
+    """在替身服务器上执行一次HTTP爬取，返回 (是否成功, 爬虫, 客户端统计, 服务器收到的请求)"""
+    app = create_app(**app_options)
+    runner, base_url = await start_standin(app)
+    client = MtopSearchClient(base_url=base_url)
+    scraper = HttpXianyuScraper(cookie_string, client, pacer=no_delay_pacer())
+    try:
+        success = await scraper.search_products('手机', max_pages=max_pages, delay=0)
+        return success, scraper, client.get_stats(), app[REQUESTS_KEY]
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+def test_signed_search_pages():
+    success, scraper, stats, requests = asyncio.run(crawl_standin(COOKIE, items=make_items(75)))
+
+    assert success
+    # 每页30个，第3页 isFinish 后停止翻页
+    assert len(scraper.results) == 75
+    assert scraper.pages_loaded == 3
+    assert scraper.results[0]['商品ID'] == '700000000000'
+    assert scraper.results[0]['价格'] == '¥100'
+    assert scraper.results[0]['数据来源'] == 'HTTP+搜索接口'
+    assert stats['requests'] == 3
+    assert stats['signing_failures'] == 0
+    assert [r['token'] for r in requests] == ['standin'] * 3
+
+
+def test_expired_token_is_refreshed_and_retried():
+    success, scraper, stats, requests = asyncio.run(
+        crawl_standin('_m_h5_tk=stale_1; cookie2=session', items=make_items(45)))
+
+    assert success
+    assert len(scraper.results) == 45
+    assert stats['token_refreshes'] == 1
+    # 第一次请求令牌过期，之后所有请求都使用服务端下发的新令牌
+    assert [r['token'] for r in requests] == ['stale', 'standin', 'standin']
+
+
+def test_rejected_signature_raises_signing_error():
+    with pytest.raises(MtopSigningError):
+        asyncio.run(crawl_standin(COOKIE, mode='reject'))
+
+    with pytest.raises(MtopSigningError):
+        asyncio.run(crawl_standin('cookie2=session'))
+
+
+def test_captcha_records_block_reason():
+    success, scraper, stats, requests = asyncio.run(crawl_standin(COOKIE, mode='captcha'))
+
+    assert not success
+    assert scraper.block_reason == 'captcha'
+    assert len(requests) == 1
+
+
+class FakeBrowserScraper:
+    """代替浏览器爬虫记录回退调用（不启动Playwright）"""
+
+    def __init__(self):
+        self.results = []
+        self.page_metrics = []
+        self.block_reason = ''
+        self.page_sink = None
+
+    async def search_products(self, keyword, max_pages, delay, sort_by_latest=True, known_ids=None):
+        self.results = [{'商品ID': 'browser-1', '商品标题': f'{keyword} 浏览器结果'}]
+        return True
+
+
+def test_signing_error_after_first_page_keeps_sunk_pages():
+    async def run():
+        app = create_app(items=make_items(90), reject_from_page=2)
+        runner, base_url = await start_standin(app)
+        pool = BrowserPool()
+        pool.pacer = no_delay_pacer()
+        pool.http_client.configure(base_url)
+        sunk = []
+
+        async def page_sink(products):
+            sunk.extend(products)
+
+        @asynccontextmanager
+        async def lease(cookie_string, **options):
+            raise AssertionError('第1页之后签名失败不应回退到浏览器')
+            yield
+
+        pool.lease = lease
+        try:
+            result = await pool.crawl(COOKIE, '手机', max_pages=3, delay=0, backend='http', page_sink=page_sink)
+            return result, sunk, pool.stats
+        finally:
+            await pool.http_client.close()
+            await runner.cleanup()
+
+    (success, results), sunk, stats = asyncio.run(run())
+
+    assert success
+    assert len(results) == 30
+    # 已入库的第1页不会因回退而重复入库
+    assert [p['商品ID'] for p in sunk] == [p['商品ID'] for p in results]
+    assert stats['http_fallbacks'] == 0
+
+
+def test_pool_falls_back_to_browser_when_signing_fails():
+    async def run():
+        app = create_app(mode='reject')
+        runner, base_url = await start_standin(app)
+        pool = BrowserPool()
+        pool.pacer = no_delay_pacer()
+        pool.http_client.configure(base_url)
+
+        @asynccontextmanager
+        async def lease(cookie_string, **options):
+            yield FakeBrowserScraper()
+
+        pool.lease = lease
+        try:
+            result = await pool.crawl(COOKIE, '手机', max_pages=2, delay=0, backend='http')
+            return result, pool.stats, app[REQUESTS_KEY]
+        finally:
+            await pool.http_client.close()
+            await runner.cleanup()
+
+    (success, results), stats, requests = asyncio.run(run())
+
+    assert success
+    assert [p['商品ID'] for p in results] == ['browser-1']
+    assert stats['http_crawls'] == 1
+    assert stats['http_fallbacks'] == 1
+    assert len(requests) == 1
@@ -4,7 +4,7 @@
 测试推送数据的问题
 """
 
-import sqlite3
+import db_tuning
 import sys
 import os
 
@@ -17,7 +17,7 @@ def test_push_data():
         return
 
     try:
-        conn = sqlite3.connect(db_path)
+        conn = db_tuning.connect(db_path)
         cursor = conn.cursor()
 
         # 获取一条最新记录
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商品标题全文检索（SQLite FTS5）
+FTS5自带的分词器不能切分中文，这里在写入和查询时先把标题切成检索词：
+连续的中文按二元组（bigram）切分，字母数字串转为小写后按三元组（trigram）切分（iphone15 -> iph pho hon one ne1 e15），
+检索词以空格分隔写入FTS5表，由unicode61分词器按空格拆分。
+查询同样切分后组成短语查询，相邻的n元组必须连续出现，因此每个查询片段的匹配效果等同于子串匹配（phone 可以找到 iPhone15），并可按bm25排序。
+索引无法表示的短片段（单个汉字、一两个字母或数字）对该片段退回 LIKE 子串匹配。
+与原来整串 LIKE 不同的是：查询按空格、标点及中文/字母的交界切成多个片段，各片段分别匹配（AND），不要求在标题中相邻。
+FTS5表的rowid即商品表的id：ORM增删改通过 install() 注册的映射事件同步，批量INSERT入库时调用 index_titles()，
+其他脚本直接用sqlite3删除商品留下的索引行由启动时的 backfill() 清理。
+"""
+
+import html
+import re
+
+import sqlalchemy as sa
+from sqlalchemy import event
+
+FTS_TABLE = 'xianyu_products_fts'
+
+CREATE_FTS_SQL = (f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                  f"USING fts5(terms, tokenize='unicode61 remove_diacritics 2')")
+
+# 中文（含日文假名）连续字符串 / 字母数字串
+_CJK_RUN = re.compile(r'[぀-ヿ㐀-䶿一-鿿豈-﫿]+')
+_TOKEN_RUN = re.compile(r'[぀-ヿ㐀-䶿一-鿿豈-﫿]+|[0-9A-Za-z]+')
+
+# 字母数字串按三元组切分：少于3个字符的片段无法在索引中做子串匹配
+LATIN_NGRAM = 3
+
+
+def _segments(text):
+    """按出现顺序返回 (是否中文, 片段)"""
+    for match in _TOKEN_RUN.finditer(text or ''):
+        segment = match.group()
+        yield bool(_CJK_RUN.fullmatch(segment)), segment
+
+
+def _ngrams(segment, n):
+    """按n元组切分，不足n个字符时整体作为一个检索词"""
+    if len(segment) <= n:
+        return [segment]
+    return [segment[i:i + n] for i in range(len(segment) - n + 1)]
+
+
+def _segment_terms(is_cjk, segment):
+    return _ngrams(segment, 2) if is_cjk else _ngrams(segment.lower(), LATIN_NGRAM)
+
+
+def title_terms(title):
+    """把标题切分为写入FTS5表的检索词串"""
+    terms = []
+    for is_cjk, segment in _segments(title):
+        terms.extend(_segment_terms(is_cjk, segment))
+    return ' '.join(terms)
+
+
+def split_query(query):
+    """把用户输入切分为 (FTS5短语列表, 需用LIKE匹配的短片段列表)"""
+    phrases = []
+    short_segments = []
+    for is_cjk, segment in _segments(query):
+        if len(segment) < (2 if is_cjk else LATIN_NGRAM):
+            # 单个汉字、一两个字母数字在索引中只能整词匹配，不能做子串匹配
+            short_segments.append(segment)
+        else:
+            phrases.append('"' + ' '.join(_segment_terms(is_cjk, segment)) + '"')
+    return phrases, short_segments
+
+
+def build_match_query(query):
+    """把用户输入转换为FTS5 MATCH表达式（各片段短语之间为AND关系），没有可走索引的片段时返回None"""
+    phrases, _ = split_query(query)
+    return ' AND '.join(phrases) or None
+
+
+def highlight(title, query, before='<mark>', after='</mark>'):
+    """对标题中匹配查询片段的部分加上高亮标记（标题先做HTML转义）"""
+    title = title or ''
+    segments = sorted({segment for _, segment in _segments(query)}, key=len, reverse=True)
+    if not segments:
+        return html.escape(title)
+
+    pattern = re.compile('|'.join(re.escape(segment) for segment in segments), re.IGNORECASE)
+    parts = []
+    position = 0
+    for match in pattern.finditer(title):
+        parts.append(html.escape(title[position:match.start()]))
+        parts.append(before + html.escape(match.group()) + after)
+        position = match.end()
+    parts.append(html.escape(title[position:]))
+    return ''.join(parts)
+
+
+# 供查询使用的轻量表对象（rank 为FTS5内置的bm25相关度，值越小越相关）
+fts_table = sa.table(FTS_TABLE, sa.column('rowid', sa.Integer), sa.column('terms'), sa.column('rank', sa.Float))
+
+
+def index_titles(connection, rows):
+    """写入或更新 (商品id, 标题) 的索引行"""
+    rows = [{'rowid': product_id, 'terms': title_terms(title)} for product_id, title in rows]
+    if rows:
+        connection.execute(sa.text(f"INSERT OR REPLACE INTO {FTS_TABLE}(rowid, terms) VALUES (:rowid, :terms)"), rows)
+
+
+def remove_titles(connection, product_ids):
+    product_ids = list(product_ids)
+    if product_ids:
+        connection.execute(sa.text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :rowid"),
+                           [{'rowid': product_id} for product_id in product_ids])
+
+
+def install(model):
+    """为商品模型注册同步事件；create_all 新建商品表时一并创建FTS5表"""
+    event.listen(model.__table__, 'after_create', sa.DDL(CREATE_FTS_SQL).execute_if(dialect='sqlite'))
+
+    @event.listens_for(model, 'after_insert')
+    def _index_inserted(mapper, connection, target):
+        index_titles(connection, [(target.id, target.title)])
+
+    @event.listens_for(model, 'after_update')
+    def _index_updated(mapper, connection, target):
+        if sa.inspect(target).attrs.title.history.has_changes():
+            index_titles(connection, [(target.id, target.title)])
+
+    @event.listens_for(model, 'after_delete')
+    def _unindex_deleted(mapper, connection, target):
+        remove_titles(connection, [target.id])
+
+
+def backfill(connection, table_name='xianyu_products', batch_size=2000):
+    """补建缺失的索引行并删除已不存在商品的索引行，返回 (补建数, 删除数)"""
+    added = 0
+    while True:
+        rows = connection.execute(sa.text(
+            f"SELECT p.id, p.title FROM {table_name} p "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {FTS_TABLE} f WHERE f.rowid = p.id) "
+            f"ORDER BY p.id LIMIT :limit"), {'limit': batch_size}).all()
+        if not rows:
+            break
+        index_titles(connection, rows)
+        added += len(rows)
+
+    removed = connection.execute(sa.text(
+        f"DELETE FROM {FTS_TABLE} WHERE rowid NOT IN (SELECT id FROM {table_name})")).rowcount
+    return added, removed
+
+
+def apply_search(query, model, search_query):
+    """按标题检索过滤查询，返回 (查询, 是否可按相关度排序)
+
+    可走索引的片段用FTS5匹配，短片段逐个用 LIKE 子串匹配；没有可切分的片段（如只有标点）时整串 LIKE 匹配。
+    """
+    phrases, short_segments = split_query(search_query)
+    if not phrases and not short_segments:
+        return query.filter(model.title.contains(search_query)), False
+
+    for segment in short_segments:
+        query = query.filter(model.title.contains(segment))
+    if not phrases:
+        return query, False
+    query = query.join(fts_table, fts_table.c.rowid == model.id).filter(
+        fts_table.c.terms.op('MATCH')(' AND '.join(phrases)))
+    return query, True
@@ -5,9 +5,10 @@
 Web后台应用 + 爬虫功能集成
 """
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash, send_file
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -38,6 +39,11 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 db = SQLAlchemy(app)
 
+# SQLite连接调优：每个连接启用WAL、忙等待超时等（爬取写入时页面读取不再被阻塞）
+import db_tuning
+with app.app_context():
+    db_tuning.install(db.engine)
+
 # 初始化APScheduler调度器
 scheduler = BackgroundScheduler()
 scheduler.start()
@@ -48,8 +54,19 @@ notification_manager = EnhancedNotificationManager(db_path="xianyu_data.db")
 notification_manager.start_background_processor()
 atexit.register(lambda: notification_manager.stop_background_processor())
 
-# 全局停止标志
-scraping_should_stop = False
+# 共享浏览器池（无头模式爬取复用常驻浏览器，首次使用时才启动）
+from browser_pool import BrowserPool, PageStream
+from crawl_control import AccountBlockedError, CancelToken, CrawlRegistry
+browser_pool = BrowserPool(max_contexts=3, max_pages_per_context=50)
+atexit.register(lambda: browser_pool.shutdown())
+
+# 运行中爬取的登记表：每次爬取持有独立的取消句柄，可按ID单独停止
+crawl_registry = CrawlRegistry()
+
+# 商品图片缩略图缓存（instance/thumbnails，按LRU限制磁盘占用）
+from image_cache import ThumbnailCache
+image_cache = ThumbnailCache(os.path.join(app.instance_path, 'thumbnails'))
+atexit.register(lambda: image_cache.shutdown())
 
 # ==================== 增强通知功能集成 ====================
 def send_enhanced_notification(event_type, title, content, data=None, priority='normal'):
@@ -100,6 +117,9 @@ class User(db.Model):
     last_login = db.Column(db.DateTime, comment='最后登录时间')
     trial_expires_at = db.Column(db.DateTime, comment='体验账户过期时间')
     trial_expired = db.Column(db.Boolean, default=False, comment='体验账户是否已过期')
+    paused = db.Column(db.Integer, default=0, comment='体验倒计时是否暂停（0=正常，1=暂停）')
+    paused_at = db.Column(db.DateTime, comment='暂停时间')
+    paused_remaining_minutes = db.Column(db.Integer, default=0, comment='暂停时剩余分钟数')
 
     def set_password(self, password):
         """设置密码"""
@@ -227,11 +247,20 @@ class User(db.Model):
 class XianyuProduct(db.Model):
     """闲鱼商品模型"""
     __tablename__ = 'xianyu_products'
+    # 索引与列表页/统计的查询形状对应，变更时需在 migrations/versions 中新增迁移
+    __table_args__ = (
+        db.Index('ix_xianyu_products_keyword_created_at', 'keyword', 'created_at'),
+        db.Index('ix_xianyu_products_search_time', 'search_time'),
+        # 列表页只显示有图片的商品：部分索引只包含有图片的行，带上 product_image 使分页总数可只扫描索引
+        db.Index('ix_xianyu_products_with_image_created_at', 'created_at', 'product_image',
+                 sqlite_where=db.text("product_image IS NOT NULL AND product_image != ''")),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.String(100), unique=True, nullable=False, comment='商品ID')
     title = db.Column(db.Text, comment='商品标题')
     price = db.Column(db.String(50), comment='价格')
+    price_value = db.Column(db.Float, index=True, comment='价格数值（入库时由价格文本解析，用于排序和筛选）')
     location = db.Column(db.String(100), comment='地区')
     seller_credit = db.Column(db.String(100), comment='卖家信用')
     product_link = db.Column(db.Text, comment='商品链接')
@@ -244,6 +273,10 @@ class XianyuProduct(db.Model):
     def __repr__(self):
         return f'<Product {self.product_id}>'
 
+# 商品标题全文索引（FTS5表 xianyu_products_fts，由迁移 0005 创建），ORM增删改时自动同步
+import title_search
+title_search.install(XianyuProduct)
+
 class SystemConfig(db.Model):
     """系统配置模型"""
     __tablename__ = 'system_config'
@@ -325,7 +358,7 @@ class ScheduledTask(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     task_name = db.Column(db.String(100), nullable=False, comment='任务名称')
-    keyword = db.Column(db.String(100), nullable=False, comment='搜索关键词')
+    keyword = db.Column(db.String(100), nullable=False, comment='搜索关键词（多个关键词用逗号分隔）')
     max_pages = db.Column(db.Integer, default=3, comment='爬取页数')
     delay = db.Column(db.Integer, default=3, comment='延迟时间（秒）')
 
@@ -418,6 +451,130 @@ class ScheduledTask(db.Model):
             self.is_active = False
             self.next_run_time = None
 
+class ScrapeJob(db.Model):
+    """爬取任务队列模型：Web端只负责入队，由独立的 scrape_worker.py 进程领取执行"""
+    __tablename__ = 'scrape_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    keyword = db.Column(db.String(255), nullable=False, comment='搜索关键词（多个关键词用逗号分隔）')
+    max_pages = db.Column(db.Integer, default=3, comment='爬取页数')
+    delay = db.Column(db.Integer, default=2, comment='延迟时间（秒）')
+    source = db.Column(db.String(20), default='manual', comment='来源：manual/scheduled')
+    task_id = db.Column(db.Integer, comment='来源定时任务ID')
+
+    # 状态：pending/running/succeeded/failed
+    status = db.Column(db.String(20), default='pending', index=True, comment='任务状态')
+    attempts = db.Column(db.Integer, default=0, comment='已领取次数')
+    max_attempts = db.Column(db.Integer, default=3, comment='最大尝试次数')
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, comment='可被领取的时间')
+
+    # 租约：worker领取后定期心跳续租，租约过期视为worker已退出，任务可被重新领取
+    worker_id = db.Column(db.String(100), comment='执行worker')
+    lease_expires_at = db.Column(db.DateTime, comment='租约到期时间')
+    heartbeat_at = db.Column(db.DateTime, comment='最后心跳时间')
+
+    result_message = db.Column(db.Text, comment='执行结果')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
+    started_at = db.Column(db.DateTime, comment='开始时间')
+    finished_at = db.Column(db.DateTime, comment='结束时间')
+
+    def __repr__(self):
+        return f'<ScrapeJob {self.id} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'keyword': self.keyword,
+            'max_pages': self.max_pages,
+            'delay': self.delay,
+            'source': self.source,
+            'task_id': self.task_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'worker_id': self.worker_id,
+            'lease_expires_at': self.lease_expires_at.strftime('%Y-%m-%d %H:%M:%S') if self.lease_expires_at else None,
+            'heartbeat_at': self.heartbeat_at.strftime('%Y-%m-%d %H:%M:%S') if self.heartbeat_at else None,
+            'result_message': self.result_message,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S') if self.started_at else None,
+            'finished_at': self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else None
+        }
+
+class XianyuAccount(db.Model):
+    """闲鱼账号池模型：每个账号独立的Cookie、登录状态文件、健康分和请求预算"""
+    __tablename__ = 'xianyu_accounts'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, comment='账号名称')
+    cookie_string = db.Column(db.Text, nullable=False, comment='Cookie字符串')
+    is_active = db.Column(db.Boolean, default=True, comment='是否启用')
+
+    # 健康分（0-100）：按爬取结果指数平滑，被拦截时减半
+    health_score = db.Column(db.Float, default=100.0, comment='健康分')
+
+    # 每小时爬取次数预算（每个关键词计一次），0表示不限制
+    hourly_budget = db.Column(db.Integer, default=0, comment='每小时爬取次数预算')
+    budget_window_start = db.Column(db.DateTime, comment='预算计数窗口开始时间')
+    budget_used = db.Column(db.Integer, default=0, comment='当前窗口已用次数')
+
+    # 运行统计
+    total_crawls = db.Column(db.Integer, default=0, comment='总爬取次数')
+    successful_crawls = db.Column(db.Integer, default=0, comment='成功次数')
+    failed_crawls = db.Column(db.Integer, default=0, comment='失败次数')
+    blocked_crawls = db.Column(db.Integer, default=0, comment='被拦截次数')
+    last_used_at = db.Column(db.DateTime, comment='最后使用时间')
+    last_success_at = db.Column(db.DateTime, comment='最后成功时间')
+    last_error = db.Column(db.Text, comment='最近一次错误')
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
+
+    def __repr__(self):
+        return f'<XianyuAccount {self.name}>'
+
+    def get_success_rate(self):
+        """获取成功率"""
+        if not self.total_crawls:
+            return 0.0
+        return round(self.successful_crawls / self.total_crawls * 100, 2)
+
+    def get_budget_remaining(self):
+        """本小时剩余预算，不限制时返回None"""
+        if not self.hourly_budget:
+            return None
+        if not self.budget_window_start or datetime.utcnow() - self.budget_window_start >= timedelta(hours=1):
+            return self.hourly_budget
+        return max(0, self.hourly_budget - (self.budget_used or 0))
+
+    def to_dict(self):
+        from 自动运行抓取器 import storage_state_path
+        fingerprint = browser_pool.cookie_key(self.cookie_string)
+        allowed, remaining, reason = browser_pool.breaker.check(fingerprint)
+        return {
+            'id': self.id,
+            'name': self.name,
+            'fingerprint': fingerprint,
+            'cookie_preview': (self.cookie_string or '')[:40] + '...',
+            'is_active': self.is_active,
+            'health_score': round(self.health_score or 0, 1),
+            'hourly_budget': self.hourly_budget,
+            'budget_remaining': self.get_budget_remaining(),
+            'total_crawls': self.total_crawls,
+            'successful_crawls': self.successful_crawls,
+            'failed_crawls': self.failed_crawls,
+            'blocked_crawls': self.blocked_crawls,
+            'success_rate': self.get_success_rate(),
+            'has_storage_state': os.path.exists(storage_state_path(self.cookie_string)),
+            'blocked': not allowed,
+            'blocked_reason': reason if not allowed else '',
+            'blocked_remaining_seconds': remaining,
+            'last_used_at': self.last_used_at.strftime('%Y-%m-%d %H:%M:%S') if self.last_used_at else None,
+            'last_success_at': self.last_success_at.strftime('%Y-%m-%d %H:%M:%S') if self.last_success_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
+        }
+
 class QuickPushConfig:
     """快速推送配置类 - 使用SystemConfig存储配置"""
 
@@ -587,6 +744,88 @@ def update_cookie(cookie_string):
         print(f"更新Cookie失败: {str(e)}")
         return False
 
+# ==================== 账号池 ====================
+ACCOUNT_HEALTH_SMOOTHING = 0.8  # 健康分平滑系数：新分数 = 旧分数*0.8 + 本次结果*0.2
+
+def select_crawl_accounts():
+    """按健康度挑选可用账号，返回 [(账号, Cookie)]，最优账号在前
+
+    跳过已停用、熔断冷却中和本小时预算已用完的账号；健康分高者优先，同分时最久未使用者优先。
+    账号池为空时回退到系统设置中的单个Cookie（账号为None，不记录账号统计）。
+    """
+    accounts = XianyuAccount.query.filter_by(is_active=True).all()
+    if not accounts:
+        current_cookie = get_current_cookie()
+        return [(None, current_cookie)] if current_cookie else []
+
+    available = []
+    for account in accounts:
+        if not browser_pool.breaker.check(browser_pool.cookie_key(account.cookie_string))[0]:
+            continue
+        if account.get_budget_remaining() == 0:
+            continue
+        available.append(account)
+
+    available.sort(key=lambda a: (-(a.health_score or 0), a.last_used_at or datetime.min))
+    return [(account, account.cookie_string) for account in available]
+
+def plan_keyword_accounts(keywords, accounts):
+    """把关键词轮流分配给各账号（最优账号先分），不超过各账号剩余预算
+
+    返回 [(账号, Cookie, 关键词列表)]，预算不足时多出的关键词不分配。
+    """
+    plans = [[account, cookie, [], account.get_budget_remaining() if account else None]
+             for account, cookie in accounts]
+    index = 0
+    for keyword in keywords:
+        for _ in range(len(plans)):
+            plan = plans[index % len(plans)]
+            index += 1
+            if plan[3] is None or plan[3] > 0:
+                plan[2].append(keyword)
+                if plan[3] is not None:
+                    plan[3] -= 1
+                break
+        else:
+            print(f"[账号池] 所有账号本小时预算已用完，关键词 {keyword} 未分配")
+    return [(account, cookie, kws) for account, cookie, kws, _ in plans if kws]
+
+def record_account_result(account, success, blocked=False, message='', crawls=1):
+    """记录账号的爬取结果，更新健康分、成功率和预算用量"""
+    if account is None:
+        return
+    try:
+        now = datetime.utcnow()
+        if not account.budget_window_start or now - account.budget_window_start >= timedelta(hours=1):
+            account.budget_window_start = now
+            account.budget_used = 0
+        account.budget_used = (account.budget_used or 0) + crawls
+        account.total_crawls = (account.total_crawls or 0) + crawls
+        account.last_used_at = now
+
+        health = account.health_score if account.health_score is not None else 100.0
+        health = health * ACCOUNT_HEALTH_SMOOTHING + (100.0 if success else 0.0) * (1 - ACCOUNT_HEALTH_SMOOTHING)
+        if success:
+            account.successful_crawls = (account.successful_crawls or 0) + crawls
+            account.last_success_at = now
+        else:
+            account.failed_crawls = (account.failed_crawls or 0) + crawls
+            account.last_error = message[:500] if message else None
+        if blocked:
+            account.blocked_crawls = (account.blocked_crawls or 0) + crawls
+            health /= 2
+        account.health_score = round(health, 2)
+        db.session.commit()
+        print(f"[账号池] 账号 {account.name}: {'成功' if success else '失败'}{'（被拦截）' if blocked else ''}，"
+              f"健康分 {account.health_score}")
+    except Exception as e:
+        db.session.rollback()
+        print(f"[账号池] 记录账号结果失败: {str(e)}")
+
+def is_account_blocked(cookie_string):
+    """账号当前是否处于熔断状态（爬取后判断本次是否被拦截）"""
+    return not browser_pool.breaker.check(browser_pool.cookie_key(cookie_string))[0]
+
 def parse_cookie_info(cookie_string):
     """解析Cookie信息"""
     if not cookie_string:
@@ -635,12 +874,207 @@ def test_cookie_validity(cookie_string):
     except Exception as e:
         return {'valid': False, 'error': f'测试失败: {str(e)}'}
 
+def split_keywords(keyword_text):
+    """把逗号/顿号/换行分隔的关键词文本拆分为去重后的关键词列表"""
+    keywords = []
+    for kw in re.split(r'[,，、\n]', keyword_text or ''):
+        kw = kw.strip()
+        if kw and kw not in keywords:
+            keywords.append(kw)
+    return keywords
+
+def get_crawl_settings():
+    """获取爬取配置：多关键词并发参数，以及爬取后端（browser/http）和HTTP模式的网关地址"""
+    settings = {'concurrency': 3, 'keyword_delay': 2, 'backend': 'browser', 'http_base_url': ''}
+    try:
+        for key, config_key in (('concurrency', 'crawl_concurrency'), ('keyword_delay', 'crawl_keyword_delay')):
+            config = SystemConfig.query.filter_by(config_key=config_key).first()
+            if config and config.config_value:
+                settings[key] = max(0, int(config.config_value))
+        for key, config_key in (('backend', 'crawl_backend'), ('http_base_url', 'crawl_http_base_url')):
+            config = SystemConfig.query.filter_by(config_key=config_key).first()
+            if config and config.config_value:
+                settings[key] = config.config_value.strip()
+    except Exception as e:
+        print(f"读取并发爬取配置失败: {str(e)}")
+    settings['concurrency'] = max(1, settings['concurrency'])
+    if settings['backend'] not in ('browser', 'http'):
+        settings['backend'] = 'browser'
+    browser_pool.http_client.configure(settings['http_base_url'])
+    return settings
+
+def get_resource_policy():
+    """获取爬取时的资源拦截策略（SystemConfig中的JSON，未配置时使用默认策略）"""
+    try:
+        config = SystemConfig.query.filter_by(config_key='crawl_resource_policy').first()
+        if config and config.config_value:
+            return json.loads(config.config_value)
+    except Exception as e:
+        print(f"读取资源拦截策略失败: {str(e)}")
+    return None
+
+def get_pacing_config():
+    """获取自适应节奏参数（SystemConfig中的JSON，未配置时使用默认值）"""
+    try:
+        config = SystemConfig.query.filter_by(config_key='crawl_pacing').first()
+        if config and config.config_value:
+            return json.loads(config.config_value)
+    except Exception as e:
+        print(f"读取节奏参数失败: {str(e)}")
+    return None
+
+def prepare_crawl_controls():
+    """爬取前同步共享浏览器池的资源拦截策略、选择器画像、节奏参数和账号熔断状态"""
+    browser_pool.resource_filter.update_policy(get_resource_policy())
+    browser_pool.pacer.configure(get_pacing_config())
+    load_selector_profile(browser_pool.selector_profile)
+    try:
+        # 熔断状态保存在数据库中，多个worker进程共享
+        config = SystemConfig.query.filter_by(config_key='crawl_circuit_breakers').first()
+        if config and config.config_value:
+            browser_pool.breaker.merge(json.loads(config.config_value))
+    except Exception as e:
+        print(f"读取账号熔断状态失败: {str(e)}")
+
+def save_crawl_controls():
+    """爬取后保存选择器画像和账号熔断状态"""
+    save_selector_profile(browser_pool.selector_profile)
+    save_breaker_state()
+
+def save_breaker_state():
+    """保存账号熔断状态（先合并其他进程写入的较新状态）"""
+    try:
+        config = SystemConfig.query.filter_by(config_key='crawl_circuit_breakers').first()
+        if not config:
+            config = SystemConfig(config_key='crawl_circuit_breakers', description='账号熔断状态')
+            db.session.add(config)
+        else:
+            # 先合并其他进程写入的较新状态，避免覆盖
+            browser_pool.breaker.merge(json.loads(config.config_value or '{}'))
+        config.config_value = json.dumps(browser_pool.breaker.export(), ensure_ascii=False)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"保存账号熔断状态失败: {str(e)}")
+
+def persist_breaker_probe(account_key):
+    """放行试探爬取后立即保存熔断状态，其他worker进程读取后不会同时试探同一账号（可在浏览器池线程中调用）"""
+    with app.app_context():
+        save_breaker_state()
+
+browser_pool.breaker.on_probe = persist_breaker_probe
+
+def load_selector_profile(profile):
+    """首次使用时从SystemConfig加载持久化的选择器画像"""
+    if profile.loaded:
+        return
+    try:
+        config = SystemConfig.query.filter_by(config_key='crawl_selector_profile').first()
+        profile.load(json.loads(config.config_value) if config and config.config_value else {})
+    except Exception as e:
+        print(f"读取选择器画像失败: {str(e)}")
+
+def save_selector_profile(profile):
+    """选择器画像有变化时写回SystemConfig"""
+    if not profile.dirty:
+        return
+    try:
+        config = SystemConfig.query.filter_by(config_key='crawl_selector_profile').first()
+        if not config:
+            config = SystemConfig(config_key='crawl_selector_profile', description='提取选择器画像')
+            db.session.add(config)
+        config.config_value = json.dumps(profile.to_dict(), ensure_ascii=False)
+        db.session.commit()
+        profile.dirty = False
+    except Exception as e:
+        db.session.rollback()
+        print(f"保存选择器画像失败: {str(e)}")
+
+# 每个关键词水位线保留的最新商品ID数量
+WATERMARK_SIZE = 100
+
+def get_keyword_watermark(keyword):
+    """获取关键词的水位线（上次爬取到的最新商品ID集合），未启用或不存在时返回空集合"""
+    try:
+        enabled = SystemConfig.query.filter_by(config_key='crawl_watermark_enabled').first()
+        if enabled and enabled.config_value and enabled.config_value.lower() == 'false':
+            return set()
+        config = SystemConfig.query.filter_by(config_key=f'crawl_watermark:{keyword}').first()
+        if config and config.config_value:
+            return set(json.loads(config.config_value))
+    except Exception as e:
+        print(f"读取关键词水位线失败: {str(e)}")
+    return set()
+
+def update_keyword_watermark(keyword, results):
+    """用本次爬取结果（按最新发布排序）更新关键词水位线"""
+    try:
+        config_key = f'crawl_watermark:{keyword}'
+        config = SystemConfig.query.filter_by(config_key=config_key).first()
+        old_ids = json.loads(config.config_value) if config and config.config_value else []
+
+        ids = []
+        for product_id in [item.get('商品ID') for item in results] + old_ids:
+            if product_id and product_id not in ids:
+                ids.append(product_id)
+        ids = ids[:WATERMARK_SIZE]
+
+        if not config:
+            config = SystemConfig(config_key=config_key, description=f'关键词水位线: {keyword}')
+            db.session.add(config)
+        config.config_value = json.dumps(ids)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"更新关键词水位线失败: {str(e)}")
+
+def backfill_price_values(batch_size=1000):
+    """把尚未解析的价格文本回填为数值（price_value 列由迁移 0003 添加）"""
+    # 按ID分批回填（无法解析的价格保持NULL，不会重复扫描同一批）
+    last_id = 0
+    filled = 0
+    while True:
+        rows = db.session.execute(
+            db.select(XianyuProduct.id, XianyuProduct.price)
+            .where(XianyuProduct.price_value.is_(None), XianyuProduct.price.isnot(None),
+                   XianyuProduct.id > last_id)
+            .order_by(XianyuProduct.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        updates = [{'id': row.id, 'price_value': normalize_price(row.price)} for row in rows]
+        updates = [u for u in updates if u['price_value'] is not None]
+        if updates:
+            db.session.execute(db.update(XianyuProduct), updates)
+            filled += len(updates)
+        db.session.commit()
+    if filled:
+        print(f"[数据库] 已回填 {filled} 个商品的价格数值")
+
+def backfill_title_index():
+    """补建商品标题全文索引（迁移 0005 之前的商品、其他脚本直接增删的商品）"""
+    with db.engine.begin() as connection:
+        added, removed = title_search.backfill(connection)
+    if added or removed:
+        print(f"[数据库] 标题全文索引已补建 {added} 条，清理 {removed} 条")
+
+def prepare_database():
+    """创建/升级表结构（migrations/versions 中的迁移）并回填派生数据（需在应用上下文中调用）
+
+    Web应用、worker进程和 db_migrate upgrade 共用，无论哪个进程先启动，数据库都会被标记版本并升级到最新。
+    """
+    from db_migrate import upgrade_database
+    upgrade_database(db)
+    backfill_price_values()
+    backfill_title_index()
+
 # 数据库初始化函数
 def init_db():
     """初始化数据库"""
     with app.app_context():
-        # 创建所有表
-        db.create_all()
+        prepare_database()
 
         # 创建默认用户（如果不存在）
         create_default_users()
@@ -724,6 +1158,20 @@ def execute_scheduled_task(task_id):
                 print(f"           - 执行周期: 每{hours}小时{minutes}分钟")
             print(f"           - 历史运行: {task.total_runs}次 (成功{task.successful_runs}次，失败{task.failed_runs}次)")
 
+            # 队列模式：只写入任务队列，由worker进程执行并回写成功/失败次数
+            if get_dispatch_mode() == 'queue':
+                job, created = enqueue_scrape_job(task.keyword, task.max_pages, task.delay,
+                                                  source='scheduled', task_id=task.id)
+                if created:
+                    task.last_run_time = datetime.now()
+                    task.total_runs += 1
+                    print(f"[定时任务] 已加入爬取队列: 任务 #{job.id}")
+                else:
+                    print(f"[定时任务] 队列中已有未完成的任务 #{job.id}，本次跳过")
+                task.calculate_next_run_time()
+                db.session.commit()
+                return
+
             # 更新任务状态
             print(f"[定时任务] 正在更新任务状态...")
             task.is_running = True
@@ -735,13 +1183,15 @@ def execute_scheduled_task(task_id):
             print(f"\n[定时任务] 开始执行爬取任务...")
             start_time = time.time()
 
-            # 执行爬取任务
+            # 执行爬取任务（登记取消句柄，可通过 /api/crawls/task-<ID>/stop 单独停止）
+            cancel_token = crawl_registry.start(task.task_name, 'scheduled', crawl_id=f'task-{task.id}')
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             try:
                 print(f"[定时任务] 正在初始化异步事件循环...")
                 success, message = loop.run_until_complete(
-                    scrape_xianyu_data(task.keyword, task.max_pages, task.delay)
+                    scrape_xianyu_keywords(split_keywords(task.keyword), task.max_pages, task.delay,
+                                           cancel_token=cancel_token)
                 )
 
                 execution_time = time.time() - start_time
@@ -773,6 +1223,7 @@ def execute_scheduled_task(task_id):
                         print(f"             {line}")
                 success = False
             finally:
+                crawl_registry.finish(cancel_token)
                 loop.close()
                 print(f"[定时任务] 异步事件循环已关闭")
 
@@ -973,9 +1424,337 @@ def refresh_scheduler():
         if len(jobs) > 5:
             print(f"           - ... 还有 {len(jobs) - 5} 个任务")
 
-async def scrape_xianyu_data(keyword, max_pages=3, delay=2):
-    """爬取闲鱼数据并保存到数据库"""
-    global scraping_should_stop
+def save_scraped_products(keyword, items, chunk_size=500):
+    """保存一批爬取结果到数据库并立即执行产品匹配，返回 (新保存的商品列表, 重复数)
+
+    每批商品用一条 INSERT ... ON CONFLICT(product_id) DO NOTHING RETURNING 语句在一个事务中写入，
+    RETURNING 只返回新插入的行，产品匹配和推送只针对这些新商品。
+    """
+    rows = {}
+    valid_count = 0
+    for item in items:
+        product_id = item.get('商品ID', '')
+        title = item.get('商品标题', '')
+        if not (product_id and title):
+            continue
+        valid_count += 1
+        if product_id not in rows:
+            rows[product_id] = {
+                'product_id': product_id,
+                'title': title,
+                'price': item.get('价格', ''),
+                'price_value': normalize_price(item.get('价格', '')),
+                'location': item.get('地区', ''),
+                'seller_credit': item.get('卖家信用', ''),
+                'product_link': item.get('商品链接', ''),
+                'product_image': item.get('商品图片', ''),
+                'keyword': keyword,  # 直接使用搜索的关键词
+                'search_time': datetime.now()
+            }
+    if not rows:
+        return [], 0
+
+    new_ids = {}
+    values = list(rows.values())
+    try:
+        for start in range(0, len(values), chunk_size):
+            stmt = (sqlite_insert(XianyuProduct)
+                    .values(values[start:start + chunk_size])
+                    .on_conflict_do_nothing(index_elements=['product_id'])
+                    .returning(XianyuProduct.product_id, XianyuProduct.id))
+            new_ids.update(db.session.execute(stmt).tuples().all())
+        # 核心层批量INSERT不触发ORM事件，新商品的标题索引在同一事务中写入
+        title_search.index_titles(db.session.connection(),
+                                  [(product_id, rows[key]['title']) for key, product_id in new_ids.items()])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"保存商品失败: {str(e)}")
+        return [], 0
+
+    # 一次查询取回新商品，并按页面中的顺序排列（RETURNING 的顺序不保证与插入顺序一致）
+    saved_products = []
+    if new_ids:
+        loaded = {product.product_id: product for product in
+                  XianyuProduct.query.filter(XianyuProduct.id.in_(list(new_ids.values()))).all()}
+        saved_products = [loaded[product_id] for product_id in rows if product_id in loaded]
+    duplicate_count = valid_count - len(new_ids)
+
+    # 立即检查产品匹配规则（只针对新商品，配置和规则每批只加载一次）
+    if saved_products:
+        quick_config = QuickPushConfig.get_config()
+        rules = ProductMatchRule.query.filter_by(enabled=True).all()
+    for product in saved_products:
+        try:
+            product_data = {
+                'title': product.title,
+                'price': product.price,
+                'location': product.location,
+                'seller_credit': product.seller_credit,
+                'keyword': keyword,
+                'product_link': product.product_link,
+                'product_id': product.product_id
+            }
+
+            matched = NotificationService.process_product_matching(product_data, quick_config, rules)
+            if matched:
+                print(f"[产品匹配] 发现匹配产品: {product.title[:30]}...")
+
+        except Exception as e:
+            print(f"[产品匹配] 处理匹配时出错: {str(e)}")
+
+    # 后台预取新商品的缩略图，列表页首次打开时无需再等待CDN原图
+    image_cache.prefetch(product.product_image for product in saved_products)
+
+    return saved_products, duplicate_count
+
+def push_latest_products(keyword, products):
+    """把新保存的商品推送到启用了最新商品推送的通知配置"""
+    if products:
+        try:
+            print(f"[最新推送] 开始推送最新商品，新增 {len(products)} 个商品")
+
+            # 获取启用了最新商品推送的通知配置
+            latest_product_configs = NotificationService.get_latest_product_configs()
+
+            if latest_product_configs:
+                sent_count = 0
+                # 本批新保存的商品
+                latest_products = products
+                # 获取当前本地时间
+                current_time = datetime.now()
+                # 格式化输出为「时分」格式（24小时制）
+                send_time_str = current_time.strftime("%H时%M分")
+                for config in latest_product_configs:
+                    try:
+                        # 为每个商品单独发送推送
+                        for product in latest_products:
+                            # 计算时间差
+                            time_diff = datetime.now() - product.search_time
+                            if time_diff.total_seconds() < 3600:  # 1小时内
+                                time_str = f"{int(time_diff.total_seconds() / 60)}分钟前"
+                            elif time_diff.total_seconds() < 86400:  # 1天内
+                                time_str = f"{int(time_diff.total_seconds() / 3600)}小时前"
+                            else:
+                                time_str = f"{time_diff.days}天前"
+
+
+                            # 构建推送内容 - 修复编码问题
+                            title = f"{send_time_str}发现新商品，关键词：{keyword}"
+                            product_title = product.title or '无标题'
+                            product_id = product.product_id
+
+                            # 生成移动端链接
+                            def generate_mobile_xianyu_links(product_id):
+                                """生成官方Goofish H5链接格式"""
+                                links = {}
+                                links['goofish_h5'] = f"fleamarket://item?id={product_id}"
+                                return links
+
+                            mobile_links = generate_mobile_xianyu_links(product_id)
+
+                            # 构建链接文本
+                            link_text = f"[跳转闲鱼APP]({mobile_links['goofish_h5']})"
+
+                            # 构建完整内容 - 添加图片信息
+                            content_parts = [
+                                f"- {product_title}",
+                                "----------------------------------------"
+                            ]
+
+                            # 添加图片信息（如果有图片）
+                            if product.product_image and product.product_image.strip():
+                                jpg_url = ".jpg".join(product.product_image.split(".jpg", 1)[:1]) + ".jpg"
+                                content_parts.append(f"- 📷 商品图片：![]({jpg_url})")
+                                content_parts.append("----------------------------------------")
+
+                            content_parts.extend([
+                                f"-💰价格:{product.price or '面议'}  ",
+                                "",
+                                f"-⏰时间:{product.seller_credit}  ",
+                                "",
+                                f"-🌏地区:{product.location or '未知'}  ",
+                                ""
+                            ])
+                            content = "\n".join(content_parts)
+
+                            # 发送通知 - 增加延迟和重试机制
+                            max_retries = 3
+                            for retry in range(max_retries):
+                                try:
+                                    if NotificationService.send_notification(config, title, content, mobile_links['goofish_h5']):
+                                        sent_count += 1
+                                        print(f"[最新推送] 成功推送商品: {product_title[:30]}...")
+                                        # 企业微信需要更长延迟避免频率限制
+                                        if config.platform == 'wechat_work':
+                                            time.sleep(2)  # 企业微信延迟2秒
+                                        else:
+                                            time.sleep(1)  # 其他平台延迟1秒
+                                        break
+                                    else:
+                                        if retry < max_retries - 1:
+                                            print(f"[最新推送] 推送失败，重试 {retry + 1}/{max_retries}: {product_title[:30]}...")
+                                            time.sleep(3)  # 重试前等待3秒
+                                        else:
+                                            print(f"[最新推送] 推送失败，已达最大重试次数: {product_title[:30]}...")
+                                except Exception as retry_e:
+                                    print(f"[最新推送] 推送异常 (重试 {retry + 1}/{max_retries}): {str(retry_e)}")
+                                    if retry < max_retries - 1:
+                                        time.sleep(5)  # 异常时等待更长时间
+
+                        print(f"[最新推送] 配置 '{config.config_name}' 推送完成，共推送 {sent_count} 个商品")
+
+                    except Exception as e:
+                        print(f"[最新推送] 配置 '{config.config_name}' 推送失败: {str(e)}")
+
+                print(f"[最新推送] 所有配置推送完成，总计推送 {sent_count} 个商品")
+            else:
+                print("[最新推送] 没有找到启用最新商品推送的配置")
+
+        except Exception as e:
+            print(f"[最新推送] 自动推送失败: {str(e)}")
+
+class ProductIngestor:
+    """边爬边入库：每收到一页商品立即保存、匹配并推送新商品，不必等整次爬取结束"""
+
+    def __init__(self, keyword):
+        self.keyword = keyword
+        self.results = []
+        self.saved_count = 0
+        self.duplicate_count = 0
+        self.pages = 0
+        self.started_at = time.time()
+
+    def ingest_page(self, products):
+        self.pages += 1
+        self.results.extend(products)
+        saved_products, duplicate_count = save_scraped_products(self.keyword, products)
+        self.saved_count += len(saved_products)
+        self.duplicate_count += duplicate_count
+        print(f"[流式入库] 关键词 {self.keyword} 第 {self.pages} 批: {len(products)} 个商品，"
+              f"新增 {len(saved_products)} 个（爬取开始后 {time.time() - self.started_at:.1f}秒）")
+        push_latest_products(self.keyword, saved_products)
+
+    def _ingest_in_app_context(self, products):
+        with app.app_context():
+            self.ingest_page(products)
+
+    async def sink(self, products):
+        """作为爬虫的 page_sink：在线程中入库并推送，不阻塞事件循环
+
+        推送新商品时每条消息之间会等待数秒，放在事件循环中执行会冻结有头浏览器，并使停止爬取要等整页推送完才生效。
+        """
+        await asyncio.to_thread(self._ingest_in_app_context, products)
+
+def process_scraped_results(keyword, success, results, ingestor=None):
+    """汇总爬取结果，返回 (是否成功, 消息)
+
+    ingestor 为已在爬取过程中逐页入库的 ProductIngestor；未提供时在此一次性保存、匹配并推送。
+    """
+    if success and not results:
+        # 第一页就到达水位线，没有新商品
+        print(f"[水位线] 关键词 {keyword} 没有新商品")
+        return True, "没有新商品（已到达上次爬取位置）"
+
+    if success and results:
+        update_keyword_watermark(keyword, results)
+
+        if ingestor is None:
+            ingestor = ProductIngestor(keyword)
+            ingestor.ingest_page(results)
+        saved_count = ingestor.saved_count
+        duplicate_count = ingestor.duplicate_count
+
+        # 修复字符编码问题 - 使用ASCII安全的消息
+        message = f"成功爬取 {len(results)} 个商品"
+        if saved_count > 0:
+            message += f"，保存 {saved_count} 个新商品"
+        if duplicate_count > 0:
+            message += f"，跳过 {duplicate_count} 个重复商品"
+
+        # 确保消息可以正确编码
+        try:
+            message.encode('utf-8')
+        except UnicodeEncodeError:
+            message = "爬取完成，请查看详细日志"
+
+        # 触发成功通知 - 使用增强通知系统
+        try:
+            send_enhanced_notification(
+                'scraping_complete',
+                '爬取任务完成',
+                f"{message}\n\n统计详情:\n• 爬取商品: {len(results)} 个\n• 新增商品: {saved_count} 个\n• 重复商品: {duplicate_count} 个",
+                data={
+                    'keyword': keyword,
+                    'total_scraped': len(results),
+                    'saved_count': saved_count,
+                    'duplicate_count': duplicate_count,
+                    'status': 'completed'
+                }
+            )
+        except Exception as e:
+            print(f"[通知] 发送成功通知失败: {str(e)}")
+
+        return True, message
+    else:
+        error_message = "爬取失败或没有获取到数据"
+        # 触发错误通知 - 使用增强通知系统
+        try:
+            send_enhanced_notification(
+                'scraping_error',
+                '爬取任务失败',
+                f"错误信息: {error_message}\n关键词: {keyword}\n请检查网络连接和Cookie配置",
+                data={'keyword': keyword, 'error_message': error_message},
+                priority='high'
+            )
+        except Exception as e:
+            print(f"[通知] 发送错误通知失败: {str(e)}")
+        return False, error_message
+
+def finish_stopped_crawl(keywords, ingestors):
+    """爬取被用户停止：已逐页入库的商品保留（不更新水位线），返回 (False, 消息)"""
+    keyword = ','.join(keywords)
+    saved_count = sum(ingestor.saved_count for ingestor in ingestors)
+    received_count = sum(len(ingestor.results) for ingestor in ingestors)
+    duplicate_count = sum(ingestor.duplicate_count for ingestor in ingestors)
+    message = f"用户主动停止爬取，已保存 {saved_count} 个新商品（共收到 {received_count} 个）"
+    print(f"[停止爬取] 关键词 {keyword}: {message}")
+    # 触发停止通知 - 使用增强通知系统
+    try:
+        send_enhanced_notification(
+            'scraping_complete',
+            '爬取任务已停止',
+            f"用户主动停止了爬取任务\n关键词: {keyword}\n已保存 {saved_count} 个新商品",
+            data={'keyword': keyword, 'total_scraped': received_count, 'saved_count': saved_count,
+                  'duplicate_count': duplicate_count, 'status': 'stopped_by_user'},
+            priority='high'
+        )
+    except Exception as e:
+        print(f"[通知] 发送停止通知失败: {str(e)}")
+    return False, message
+
+def get_requested_headless():
+    """读取本次请求的显示模式参数，默认为True（无头模式）；定时任务和worker中没有请求时同样返回True"""
+    headless = True
+    try:
+        if hasattr(request, 'form') and 'headless' in request.form:
+            # 从FormData获取参数
+            headless = request.form['headless'].lower() == 'true'
+        elif hasattr(request, 'is_json') and request.is_json:
+            # 从JSON获取参数
+            headless = request.json.get('headless', True)
+    except:
+        # 如果获取失败（如不在请求上下文中），使用默认值
+        pass
+    return headless
+
+async def scrape_xianyu_data(keyword, max_pages=3, delay=2, cancel_token=None):
+    """爬取闲鱼数据并保存到数据库
+
+    cancel_token 为本次爬取的取消句柄（由 crawl_registry 登记），停止时立即取消正在进行的页面操作，
+    已逐页入库的商品保留。
+    """
+    cancel_token = cancel_token or CancelToken('local', keyword)
     print(f"[开始爬取] 关键词={keyword}, 页数={max_pages}, 延迟策略={delay}秒")
     print(f"[延迟范围] 预期翻页延迟: {delay*0.7:.1f}-{delay*1.3+2:.1f}秒")
 
@@ -994,283 +1773,112 @@ async def scrape_xianyu_data(keyword, max_pages=3, delay=2):
         # 导入爬虫模块
         from 自动运行抓取器 import AutoXianyuScraper
 
-        # 获取当前配置的Cookie
-        current_cookie = get_current_cookie()
-        print(f"当前Cookie内容: {current_cookie}")
-
-        if not current_cookie:
+        # 从账号池按健康度挑选账号（账号池为空时使用系统设置中的Cookie）
+        prepare_crawl_controls()
+        accounts = select_crawl_accounts()
+        if not accounts:
+            if XianyuAccount.query.filter_by(is_active=True).count():
+                return False, "账号池中没有可用账号（均已熔断或本小时预算已用完）"
             return False, "未配置Cookie，请先在系统设置中添加Cookie"
+        print(f"[账号池] 可用账号: {[account.name if account else '默认Cookie' for account, _ in accounts]}")
 
-        # 获取显示模式参数，默认为True（无头模式）
-        from flask import request
-        headless = True
-        try:
-            if hasattr(request, 'form') and 'headless' in request.form:
-                # 从FormData获取参数
-                headless = request.form['headless'].lower() == 'true'
-            elif hasattr(request, 'is_json') and request.is_json:
-                # 从JSON获取参数
-                headless = request.json.get('headless', True)
-        except:
-            # 如果获取失败，使用默认值
-            pass
-
-        scraper = AutoXianyuScraper(cookie_string=current_cookie, headless=headless)
-
+        headless = get_requested_headless()
         print(f"[显示模式] 使用{'无头模式' if headless else '有头模式'}进行爬取")
 
-        # 设置浏览器
-        if not await scraper.setup_browser():
-            return False, "浏览器设置失败"
-
-        # 检查是否需要停止
-        if scraping_should_stop:
-            print("[停止爬取] 用户请求停止任务")
-            # 触发停止通知 - 使用增强通知系统
-            try:
-                send_enhanced_notification(
-                    'scraping_complete',
-                    '爬取任务已停止',
-                    f"用户主动停止了爬取任务\n关键词: {keyword}\n已处理的数据将被保存",
-                    data={'keyword': keyword, 'status': 'stopped_by_user'},
-                    priority='high'
-                )
-            except Exception as e:
-                print(f"[通知] 发送停止通知失败: {str(e)}")
-            return False, "用户主动停止爬取"
-
-        # 应用Cookie
-        if not await scraper.apply_cookies():
-            return False, "Cookie设置失败"
+        # 上次爬取记录的水位线，遇到整页已知商品时提前停止翻页
+        known_ids = get_keyword_watermark(keyword)
+        ingestor = ProductIngestor(keyword)
 
         # 检查是否需要停止
-        if scraping_should_stop:
-            print("[停止爬取] 用户请求停止任务")
-            return False, "用户主动停止爬取"
+        if cancel_token.cancelled:
+            return finish_stopped_crawl([keyword], [ingestor])
 
-        # 执行搜索（启用最新发布排序）
-        success = await scraper.search_products(keyword, max_pages, delay, sort_by_latest=True)
+        try:
+            if headless:
+                # 无头模式：从共享浏览器池租用已登录的上下文（HTTP模式下优先直接请求搜索接口）
+                # 每页商品经有界队列交给当前事件循环逐页入库，新商品无需等整次爬取结束即可推送
+                crawl_backend = get_crawl_settings()['backend']
+                blocked_message = ''
+                try:
+                    for account, current_cookie in accounts:
+                        stream = PageStream()
+                        try:
+                            async for page_products in stream.consume(browser_pool.run(
+                                browser_pool.crawl(current_cookie, keyword, max_pages, delay, sort_by_latest=True,
+                                                   known_ids=known_ids, backend=crawl_backend, page_sink=stream.put),
+                                cancel_token=cancel_token
+                            )):
+                                await ingestor.sink(page_products)
+                            success, results = stream.result
+                        except AccountBlockedError as e:
+                            # 当前账号被拦截：记录后换下一个账号重试
+                            record_account_result(account, False, blocked=True, message=str(e))
+                            blocked_message = str(e)
+                            continue
+                        except RuntimeError as e:
+                            record_account_result(account, False, message=str(e))
+                            return False, str(e)
+                        record_account_result(account, success, blocked=is_account_blocked(current_cookie))
+                        break
+                    else:
+                        return False, blocked_message
+                finally:
+                    save_crawl_controls()
+            else:
+                # 有头模式：单独启动可见浏览器，便于观察（不拦截图片等资源），使用最优账号
+                account, current_cookie = accounts[0]
+                account_key = browser_pool.cookie_key(current_cookie)
+                try:
+                    browser_pool.breaker.ensure_allowed(account_key)
+                except AccountBlockedError as e:
+                    return False, str(e)
 
-        # 检查是否需要停止
-        if scraping_should_stop:
-            print("[停止爬取] 用户请求停止任务")
-            return False, "用户主动停止爬取"
-
-        if success and scraper.results:
-            # 保存到数据库
-            saved_count = 0
-            duplicate_count = 0
-            for item in scraper.results:
-                # 检查是否需要停止
-                if scraping_should_stop:
-                    print("[停止爬取] 用户请求停止任务，正在保存已爬取的数据...")
-                    break
+                scraper = AutoXianyuScraper(cookie_string=current_cookie, headless=headless, resource_policy=False,
+                                            selector_profile=browser_pool.selector_profile, pacer=browser_pool.pacer)
+                scraper.page_sink = ingestor.sink
                 try:
-                    product_id = item.get('商品ID', '')
-                    title = item.get('商品标题', '')
-
-                    if product_id and title:
-                        # 检查是否已存在
-                        existing = XianyuProduct.query.filter_by(product_id=product_id).first()
-                        if not existing:
-                            product = XianyuProduct(
-                                product_id=product_id,
-                                title=title,
-                                price=item.get('价格', ''),
-                                location=item.get('地区', ''),
-                                seller_credit=item.get('卖家信用', ''),
-                                product_link=item.get('商品链接', ''),
-                                product_image=item.get('商品图片', ''),
-                                keyword=keyword,  # 直接使用搜索的关键词
-                                search_time=datetime.now()
-                            )
-                            db.session.add(product)
-                            db.session.commit()  # 立即提交以便获取ID
-
-                            # 立即检查产品匹配规则
-                            try:
-                                product_data = {
-                                    'title': title,
-                                    'price': item.get('价格', ''),
-                                    'location': item.get('地区', ''),
-                                    'seller_credit': item.get('卖家信用', ''),
-                                    'keyword': keyword,
-                                    'product_link': item.get('商品链接', ''),
-                                    'product_id': product_id
-                                }
-
-                                matched = NotificationService.process_product_matching(product_data)
-                                if matched:
-                                    print(f"[产品匹配] 发现匹配产品: {title[:30]}...")
-
-                            except Exception as e:
-                                print(f"[产品匹配] 处理匹配时出错: {str(e)}")
-
-                            saved_count += 1
-                        else:
-                            duplicate_count += 1
+                    # 设置浏览器（本地问题，与账号无关：释放试探名额）
+                    if not await scraper.setup_browser():
+                        browser_pool.breaker.release(account_key)
+                        return False, "浏览器设置失败"
+
+                    # 应用Cookie（已保存登录状态时跳过引导）
+                    if not await scraper.ensure_session():
+                        browser_pool.breaker.record_failure(account_key, "Cookie设置失败")
+                        return False, "Cookie设置失败"
+
+                    # 检查是否需要停止
+                    if cancel_token.cancelled:
+                        browser_pool.breaker.release(account_key)
+                        return finish_stopped_crawl([keyword], [ingestor])
+
+                    # 执行搜索（启用最新发布排序），停止时直接取消正在进行的页面操作
+                    success = await cancel_token.guard(scraper.search_products(
+                        keyword, max_pages, delay, sort_by_latest=True, known_ids=known_ids))
+                    success, results = browser_pool.finish_crawl(account_key, scraper, success)
+                    record_account_result(account, success, blocked=bool(scraper.block_reason))
+                except AccountBlockedError as e:
+                    record_account_result(account, False, blocked=True, message=str(e))
+                    return False, str(e)
+                except asyncio.CancelledError:
+                    browser_pool.breaker.release(account_key)
+                    raise
                 except Exception as e:
-                    print(f"保存商品失败: {str(e)}")
-                    continue
-
-            # 最后再提交一次（以防有未提交的数据）
-            try:
-                db.session.commit()
-            except:
-                pass  # 如果已经提交过，忽略错误
-            await scraper.close()
+                    # 出错的试探爬取视为失败（与浏览器池中的爬取一致）
+                    browser_pool.breaker.record_failure(account_key, str(e))
+                    raise
+                finally:
+                    await scraper.close()
+                    save_crawl_controls()
 
-            # 修复字符编码问题 - 使用ASCII安全的消息
-            message = f"成功爬取 {len(scraper.results)} 个商品"
-            if saved_count > 0:
-                message += f"，保存 {saved_count} 个新商品"
-            if duplicate_count > 0:
-                message += f"，跳过 {duplicate_count} 个重复商品"
+        except asyncio.CancelledError:
+            # 爬取被停止：已逐页入库的商品保留
+            return finish_stopped_crawl([keyword], [ingestor])
 
-            # 确保消息可以正确编码
-            try:
-                message.encode('utf-8')
-            except UnicodeEncodeError:
-                message = "爬取完成，请查看详细日志"
+        if cancel_token.cancelled:
+            return finish_stopped_crawl([keyword], [ingestor])
 
-            # 触发成功通知 - 使用增强通知系统
-            try:
-                send_enhanced_notification(
-                    'scraping_complete',
-                    '爬取任务完成',
-                    f"{message}\n\n统计详情:\n• 爬取商品: {len(scraper.results)} 个\n• 新增商品: {saved_count} 个\n• 重复商品: {duplicate_count} 个",
-                    data={
-                        'keyword': keyword,
-                        'total_scraped': len(scraper.results),
-                        'saved_count': saved_count,
-                        'duplicate_count': duplicate_count,
-                        'status': 'completed'
-                    }
-                )
-            except Exception as e:
-                print(f"[通知] 发送成功通知失败: {str(e)}")
-
-            # 自动触发最新发布商品推送
-            if saved_count > 0:
-                try:
-                    print(f"[最新推送] 开始推送最新商品，新增 {saved_count} 个商品")
-  
-                    # 获取启用了最新商品推送的通知配置
-                    latest_product_configs = NotificationService.get_latest_product_configs()
-
-                    if latest_product_configs:
-                        sent_count = 0
-                        # 获取最新的商品（根据保存数量获取）
-                        latest_products = XianyuProduct.query.order_by(XianyuProduct.search_time.desc()).limit(saved_count).all()
-                        # 获取当前本地时间
-                        current_time = datetime.now()
-                        # 格式化输出为「时分」格式（24小时制）
-                        send_time_str = current_time.strftime("%H时%M分")
-                        for config in latest_product_configs:
-                            try:
-                                # 为每个商品单独发送推送
-                                for product in latest_products:
-                                    # 计算时间差
-                                    time_diff = datetime.now() - product.search_time
-                                    if time_diff.total_seconds() < 3600:  # 1小时内
-                                        time_str = f"{int(time_diff.total_seconds() / 60)}分钟前"
-                                    elif time_diff.total_seconds() < 86400:  # 1天内
-                                        time_str = f"{int(time_diff.total_seconds() / 3600)}小时前"
-                                    else:
-                                        time_str = f"{time_diff.days}天前"
-
-
-                                    # 构建推送内容 - 修复编码问题
-                                    title = f"{send_time_str}发现新商品，关键词：{keyword}"
-                                    product_title = product.title or '无标题'
-                                    product_id = product.product_id
-
-                                    # 生成移动端链接
-                                    def generate_mobile_xianyu_links(product_id):
-                                        """生成官方Goofish H5链接格式"""
-                                        links = {}
-                                        links['goofish_h5'] = f"fleamarket://item?id={product_id}"
-                                        return links
-
-                                    mobile_links = generate_mobile_xianyu_links(product_id)
-
-                                    # 构建链接文本
-                                    link_text = f"[跳转闲鱼APP]({mobile_links['goofish_h5']})"
-
-                                    # 构建完整内容 - 添加图片信息
-                                    content_parts = [
-                                        f"- {product_title}",
-                                        "----------------------------------------"
-                                    ]
-
-                                    # 添加图片信息（如果有图片）
-                                    if product.product_image and product.product_image.strip():
-                                        jpg_url = ".jpg".join(product.product_image.split(".jpg", 1)[:1]) + ".jpg"
-                                        content_parts.append(f"- 📷 商品图片：![]({jpg_url})")
-                                        content_parts.append("----------------------------------------")
-
-                                    content_parts.extend([
-                                        f"-💰价格:{product.price or '面议'}  ",
-                                        "",
-                                        f"-⏰时间:{product.seller_credit}  ",
-                                        "",
-                                        f"-🌏地区:{product.location or '未知'}  ",
-                                        ""
-                                    ])
-                                    content = "\n".join(content_parts)
-
-                                    # 发送通知 - 增加延迟和重试机制
-                                    max_retries = 3
-                                    for retry in range(max_retries):
-                                        try:
-                                            if NotificationService.send_notification(config, title, content, mobile_links['goofish_h5']):
-                                                sent_count += 1
-                                                print(f"[最新推送] 成功推送商品: {product_title[:30]}...")
-                                                # 企业微信需要更长延迟避免频率限制
-                                                if config.platform == 'wechat_work':
-                                                    time.sleep(2)  # 企业微信延迟2秒
-                                                else:
-                                                    time.sleep(1)  # 其他平台延迟1秒
-                                                break
-                                            else:
-                                                if retry < max_retries - 1:
-                                                    print(f"[最新推送] 推送失败，重试 {retry + 1}/{max_retries}: {product_title[:30]}...")
-                                                    time.sleep(3)  # 重试前等待3秒
-                                                else:
-                                                    print(f"[最新推送] 推送失败，已达最大重试次数: {product_title[:30]}...")
-                                        except Exception as retry_e:
-                                            print(f"[最新推送] 推送异常 (重试 {retry + 1}/{max_retries}): {str(retry_e)}")
-                                            if retry < max_retries - 1:
-                                                time.sleep(5)  # 异常时等待更长时间
-
-                                print(f"[最新推送] 配置 '{config.config_name}' 推送完成，共推送 {sent_count} 个商品")
-
-                            except Exception as e:
-                                print(f"[最新推送] 配置 '{config.config_name}' 推送失败: {str(e)}")
-
-                        print(f"[最新推送] 所有配置推送完成，总计推送 {sent_count} 个商品")
-                    else:
-                        print("[最新推送] 没有找到启用最新商品推送的配置")
-
-                except Exception as e:
-                    print(f"[最新推送] 自动推送失败: {str(e)}")
-
-            return True, message
-        else:
-            await scraper.close()
-            error_message = "爬取失败或没有获取到数据"
-            # 触发错误通知 - 使用增强通知系统
-            try:
-                send_enhanced_notification(
-                    'scraping_error',
-                    '爬取任务失败',
-                    f"错误信息: {error_message}\n关键词: {keyword}\n请检查网络连接和Cookie配置",
-                    data={'keyword': keyword, 'error_message': error_message},
-                    priority='high'
-                )
-            except Exception as e:
-                print(f"[通知] 发送错误通知失败: {str(e)}")
-            return False, error_message
+        return process_scraped_results(keyword, success, results, ingestor)
 
     except Exception as e:
         error_message = f"爬取过程出错: {str(e)}"
@@ -1287,18 +1895,269 @@ async def scrape_xianyu_data(keyword, max_pages=3, delay=2):
             print(f"[通知] 发送异常通知失败: {str(e)}")
         return False, error_message
 
+async def scrape_xianyu_keywords(keywords, max_pages=3, delay=2, concurrency=None, keyword_delay=None,
+                                 cancel_token=None):
+    """在共享浏览器中并发爬取多个关键词并分别保存，关键词分散到账号池中的多个账号，返回 (是否全部成功, 汇总消息)
+
+    用户选择有头模式时不使用共享的无头浏览器池，改为在可见浏览器中逐个关键词爬取。
+    """
+    if not keywords:
+        return False, "未设置搜索关键词"
+    if len(keywords) == 1:
+        return await scrape_xianyu_data(keywords[0], max_pages, delay, cancel_token=cancel_token)
+    cancel_token = cancel_token or CancelToken('local', ','.join(keywords))
+
+    if not get_requested_headless():
+        print(f"[显示模式] 有头模式下逐个爬取关键词: {keywords}")
+        messages = []
+        success_count = 0
+        for keyword in keywords:
+            if cancel_token.cancelled:
+                messages.append(f"{keyword}: 用户主动停止爬取，未开始")
+                continue
+            ok, message = await scrape_xianyu_data(keyword, max_pages, delay, cancel_token=cancel_token)
+            if ok:
+                success_count += 1
+            messages.append(f"{keyword}: {message}")
+        summary = f"有头模式逐个爬取 {len(keywords)} 个关键词，成功 {success_count} 个\n" + "\n".join(messages)
+        return success_count == len(keywords), summary
+
+    settings = get_crawl_settings()
+    concurrency = concurrency or settings['concurrency']
+    keyword_delay = settings['keyword_delay'] if keyword_delay is None else keyword_delay
+    print(f"[并发爬取] 关键词={keywords}, 页数={max_pages}, 并发数={concurrency}, 启动间隔={keyword_delay}秒")
+
+    prepare_crawl_controls()
+    accounts = select_crawl_accounts()
+    if not accounts:
+        if XianyuAccount.query.filter_by(is_active=True).count():
+            return False, "账号池中没有可用账号（均已熔断或本小时预算已用完）"
+        return False, "未配置Cookie，请先在系统设置中添加Cookie"
+
+    watermarks = {kw: get_keyword_watermark(kw) for kw in keywords}
+
+    # 各关键词的页面经同一个有界队列逐页入库
+    ingestors = {kw: ProductIngestor(kw) for kw in keywords}
+
+    async def crawl_with_account(cookie_string, account_keywords):
+        stream = PageStream()
+        async for keyword, page_products in stream.consume(browser_pool.run(
+            browser_pool.crawl_many(cookie_string, account_keywords, max_pages, delay,
+                                    concurrency=concurrency, keyword_delay=keyword_delay,
+                                    watermarks=watermarks, backend=settings['backend'],
+                                    page_sink=lambda kw, products: stream.put((kw, products))),
+            cancel_token=cancel_token
+        )):
+            await ingestors[keyword].sink(page_products)
+        return stream.result
+
+    crawl_results = {}
+
+    async def run_plans(plans):
+        """按分配方案并行爬取并记录各账号结果，返回因账号被拦截而失败的关键词"""
+        for account, _, account_keywords in plans:
+            print(f"[账号池] 账号 {account.name if account else '默认Cookie'} 负责: {account_keywords}")
+        finished = await asyncio.gather(*(crawl_with_account(cookie, kws) for _, cookie, kws in plans))
+
+        blocked_keywords = []
+        for (account, cookie, account_keywords), results in zip(plans, finished):
+            crawl_results.update(results)
+            blocked = is_account_blocked(cookie)
+            for kw in account_keywords:
+                success, data = results.get(kw, (False, []))
+                error = data if isinstance(data, str) else ''
+                record_account_result(account, success, blocked=blocked, message=error)
+                if blocked and error:
+                    blocked_keywords.append(kw)
+        return blocked_keywords
+
+    try:
+        # 关键词分散到多个账号并行爬取（concurrency 为每个账号的并发数）
+        rerouted = await run_plans(plan_keyword_accounts(keywords, accounts))
+
+        # 被拦截账号上失败的关键词，换到仍可用的账号上重试一次
+        spare = [(account, cookie) for account, cookie in accounts
+                 if account is not None and not is_account_blocked(cookie)]
+        if rerouted and spare:
+            print(f"[账号池] 关键词 {rerouted} 所在账号被拦截，改用其他账号重试")
+            await run_plans(plan_keyword_accounts(rerouted, spare))
+    except asyncio.CancelledError:
+        # 爬取被停止：各关键词已逐页入库的商品保留
+        return finish_stopped_crawl(keywords, [ingestors[kw] for kw in keywords])
+    except Exception as e:
+        return False, f"爬取过程出错: {str(e)}"
+    finally:
+        save_crawl_controls()
+
+    messages = []
+    success_count = 0
+    for keyword in keywords:
+        success, results = crawl_results.get(keyword, (False, []))
+        if isinstance(results, str):
+            messages.append(f"{keyword}: 爬取过程出错: {results}")
+            continue
+
+        ok, message = process_scraped_results(keyword, success, results, ingestors[keyword])
+        if ok:
+            success_count += 1
+        messages.append(f"{keyword}: {message}")
+
+    summary = f"并发爬取 {len(keywords)} 个关键词，成功 {success_count} 个\n" + "\n".join(messages)
+    return success_count == len(keywords), summary
+
+# ==================== 爬取任务队列 ====================
+def get_dispatch_mode():
+    """爬取调度方式：inline=在Web进程内直接爬取（默认），queue=写入任务队列由worker进程执行"""
+    try:
+        config = SystemConfig.query.filter_by(config_key='scrape_dispatch_mode').first()
+        if config and config.config_value in ('inline', 'queue'):
+            return config.config_value
+    except Exception as e:
+        print(f"读取爬取调度方式失败: {str(e)}")
+    return 'inline'
+
+def enqueue_scrape_job(keyword, max_pages=3, delay=2, source='manual', task_id=None):
+    """写入一个爬取任务，返回 (任务, 是否新建)；同一定时任务已有未完成的任务时不重复入队"""
+    if task_id:
+        existing = ScrapeJob.query.filter(
+            ScrapeJob.task_id == task_id,
+            ScrapeJob.status.in_(['pending', 'running'])
+        ).first()
+        if existing:
+            return existing, False
+
+    job = ScrapeJob(keyword=keyword, max_pages=max_pages, delay=delay, source=source, task_id=task_id)
+    db.session.add(job)
+    db.session.commit()
+    print(f"[任务队列] 新任务 #{job.id}: 关键词={keyword}, 页数={max_pages}, 来源={source}")
+    return job, True
+
+def claim_scrape_job(worker_id, lease_seconds=120):
+    """领取一个待执行或租约已过期的任务，没有可领取的任务时返回None
+
+    领取使用带 status/attempts 条件的UPDATE，多个worker同时领取同一任务时只有一个能更新成功。
+    """
+    now = datetime.utcnow()
+    candidates = ScrapeJob.query.filter(
+        db.or_(
+            db.and_(ScrapeJob.status == 'pending', ScrapeJob.available_at <= now),
+            db.and_(ScrapeJob.status == 'running', ScrapeJob.lease_expires_at < now)
+        )
+    ).order_by(ScrapeJob.id).limit(10).all()
+
+    for job in candidates:
+        status, attempts = job.status, job.attempts
+        if status == 'running':
+            print(f"[任务队列] 任务 #{job.id} 租约已过期（worker {job.worker_id} 可能已退出）")
+            if attempts >= job.max_attempts:
+                updated = ScrapeJob.query.filter_by(id=job.id, status=status, attempts=attempts).update({
+                    'status': 'failed',
+                    'finished_at': now,
+                    'result_message': f'worker多次异常退出，已达最大尝试次数 {job.max_attempts}'
+                }, synchronize_session=False)
+                db.session.commit()
+                if updated:
+                    record_task_result(job.task_id, False)
+                continue
+
+        updated = ScrapeJob.query.filter_by(id=job.id, status=status, attempts=attempts).update({
+            'status': 'running',
+            'worker_id': worker_id,
+            'attempts': attempts + 1,
+            'lease_expires_at': now + timedelta(seconds=lease_seconds),
+            'heartbeat_at': now,
+            'started_at': now
+        }, synchronize_session=False)
+        db.session.commit()
+        if updated:
+            db.session.refresh(job)
+            return job
+
+    return None
+
+def heartbeat_scrape_job(job_id, worker_id, lease_seconds=120):
+    """续租，返回False表示租约已被其他worker接管"""
+    now = datetime.utcnow()
+    updated = ScrapeJob.query.filter_by(id=job_id, worker_id=worker_id, status='running').update({
+        'heartbeat_at': now,
+        'lease_expires_at': now + timedelta(seconds=lease_seconds)
+    }, synchronize_session=False)
+    db.session.commit()
+    return bool(updated)
+
+def finish_scrape_job(job_id, worker_id, success, message, retry=False):
+    """结束任务；retry=True 且未超过最大尝试次数时延迟后重新入队"""
+    job = ScrapeJob.query.get(job_id)
+    if not job:
+        return
+
+    now = datetime.utcnow()
+    if retry and job.attempts < job.max_attempts:
+        values = {
+            'status': 'pending',
+            'worker_id': None,
+            'lease_expires_at': None,
+            'available_at': now + timedelta(seconds=30 * job.attempts),
+            'result_message': message
+        }
+    else:
+        values = {
+            'status': 'succeeded' if success else 'failed',
+            'finished_at': now,
+            'lease_expires_at': None,
+            'result_message': message
+        }
+
+    updated = ScrapeJob.query.filter_by(id=job_id, worker_id=worker_id, status='running').update(
+        values, synchronize_session=False
+    )
+    db.session.commit()
+    if not updated:
+        print(f"[任务队列] 任务 #{job_id} 租约已被其他worker接管，结果未写入")
+        return
+
+    print(f"[任务队列] 任务 #{job_id} {'将重试' if values['status'] == 'pending' else values['status']}: {message}")
+    if values['status'] != 'pending':
+        record_task_result(job.task_id, success)
+
+def record_task_result(task_id, success):
+    """把队列任务的最终结果回写到来源定时任务的运行统计"""
+    if not task_id:
+        return
+    task = ScheduledTask.query.get(task_id)
+    if not task:
+        return
+    if success:
+        task.successful_runs += 1
+    else:
+        task.failed_runs += 1
+    db.session.commit()
+
 # Web路由
-def parse_price(price_str):
-    """解析价格字符串为数字"""
+def normalize_price(price_str):
+    """把 "¥1,299"、"1.2万" 这类价格文本解析为数值，无法解析时返回None"""
     if not price_str:
-        return 0
-    try:
-        # 移除常见的货币符号和非数字字符
-        import re
-        cleaned = re.sub(r'[^\d.]', '', str(price_str))
-        return float(cleaned) if cleaned else 0
-    except:
-        return 0
+        return None
+    text = str(price_str).replace(',', '').replace('，', '')
+    match = re.search(r'\d+(?:\.\d+)?', text)
+    if not match:
+        return None
+    value = float(match.group())
+    if text[match.end():match.end() + 2].strip().startswith('万'):
+        value *= 10000
+    return value
+
+def parse_price(price_str):
+    """解析价格字符串为数字（无法解析时为0）"""
+    return normalize_price(price_str) or 0
+
+def apply_price_range(query, min_price=None, max_price=None):
+    """按 price_value 过滤价格区间（走索引）"""
+    if min_price is not None:
+        query = query.filter(XianyuProduct.price_value >= min_price)
+    if max_price is not None:
+        query = query.filter(XianyuProduct.price_value <= max_price)
+    return query
 
 
 # 登录验证装饰器
@@ -1399,8 +2258,10 @@ def index():
     page = request.args.get('page', 1, type=int)
     search_query = request.args.get('search', '')
     keyword_filter = request.args.get('keyword', '')
-    sort_by = request.args.get('sort_by', 'created_at')  # 默认按创建时间排序
+    sort_by = request.args.get('sort_by') or ('relevance' if search_query else 'created_at')  # 搜索时默认按相关度排序，否则按创建时间
     sort_order = request.args.get('sort_order', 'desc')   # 默认降序
+    min_price = request.args.get('min_price', type=float)
+    max_price = request.args.get('max_price', type=float)
 
     # 构建查询 - 只显示有图片的产品
     query = XianyuProduct.query.filter(
@@ -1408,65 +2269,31 @@ def index():
         XianyuProduct.product_image != ''
     )
 
+    ranked = False
     if search_query:
-        query = query.filter(XianyuProduct.title.contains(search_query))
+        # 标题全文检索（FTS5 n元组索引），单个汉字、一两个字母数字等短片段退回子串匹配
+        query, ranked = title_search.apply_search(query, XianyuProduct, search_query)
 
     if keyword_filter:
-        query = query.filter(XianyuProduct.keyword.contains(keyword_filter))
+        query = query.filter(XianyuProduct.keyword == keyword_filter)
+
+    query = apply_price_range(query, min_price, max_price)
 
     
     # 排序逻辑
-    if sort_by == 'price':
-        # 价格排序需要在Python层面处理，先获取所有数据
-        all_products = query.all()
-
-        # 解析价格并排序
-        def get_price_for_sort(product):
-            return parse_price(product.price)
-
-        # 排序
-        all_products.sort(key=get_price_for_sort, reverse=(sort_order == 'desc'))
-
-        # 手动分页
-        per_page = 15
-        start = (page - 1) * per_page
-        end = start + per_page
-        page_products = all_products[start:end]
-
-        # 创建简单的分页对象
-        class SimplePagination:
-            def __init__(self, items, total, page, per_page):
-                self.items = items
-                self.total = total
-                self.page = page
-                self.per_page = per_page
-                self.pages = (total + per_page - 1) // per_page
-                self.has_prev = page > 1
-                self.has_next = page < self.pages
-                self.prev_num = page - 1 if self.has_prev else None
-                self.next_num = page + 1 if self.has_next else None
-
-            def iter_pages(self):
-                """生成页码范围，用于模板渲染"""
-                left_edge = 2
-                right_edge = 2
-                left_current = max(1, self.page - left_edge)
-                right_current = min(self.pages, self.page + right_edge)
-
-                if left_current > 1:
-                    yield 1
-                    if left_current > 2:
-                        yield None
-
-                for page_num in range(left_current, right_current + 1):
-                    yield page_num
-
-                if right_current < self.pages:
-                    if right_current < self.pages - 1:
-                        yield None
-                    yield self.pages
-
-        products = SimplePagination(page_products, len(all_products), page, per_page)
+    if sort_by == 'relevance' and ranked:
+        # 按bm25相关度排序（rank 越小越相关），相关度相同时新商品在前
+        query = query.order_by(title_search.fts_table.c.rank, XianyuProduct.created_at.desc())
+
+        products = query.paginate(page=page, per_page=15, error_out=False)
+    elif sort_by == 'price':
+        # 按价格数值排序（price_value 有索引，未能解析价格的商品排在最后）
+        if sort_order == 'asc':
+            query = query.order_by(XianyuProduct.price_value.asc().nulls_last(), XianyuProduct.id.asc())
+        else:
+            query = query.order_by(XianyuProduct.price_value.desc().nulls_last(), XianyuProduct.id.desc())
+
+        products = query.paginate(page=page, per_page=15, error_out=False)
     elif sort_by == 'search_time':
         # 按搜索时间排序
         if sort_order == 'asc':
@@ -1495,7 +2322,10 @@ def index():
                          keywords=keywords,
                          sort_by=sort_by,
                          sort_order=sort_order,
-                         parse_price=parse_price)
+                         min_price=min_price,
+                         max_price=max_price,
+                         parse_price=parse_price,
+                         highlight_title=title_search.highlight)
 
 @app.route('/product/<int:id>')
 @login_required
@@ -1517,24 +2347,42 @@ def scrape():
     delay = int(request.form.get('delay', 2))  # 接收延迟参数，默认2秒
 
     try:
-        # 重置全局停止标志
-        global scraping_should_stop
-        scraping_should_stop = False
+        keywords = split_keywords(keyword) or ['手机']
+
+        # 队列模式：只写入任务队列，由worker进程执行
+        if get_dispatch_mode() == 'queue':
+            job, _ = enqueue_scrape_job(','.join(keywords), max_pages, delay)
+            return jsonify({
+                'success': True,
+                'message': f'已加入爬取队列（任务 #{job.id}），等待worker执行',
+                'job_id': job.id,
+                'redirect': url_for('index')
+            })
 
-        # 在新的事件循环中运行异步爬虫
+        # 登记本次爬取的取消句柄（页面提交的 crawl_id 用于单独停止这次爬取）
+        cancel_token = crawl_registry.start(','.join(keywords), 'manual', request.form.get('crawl_id'))
+
+        # 在新的事件循环中运行异步爬虫（多个关键词时并发爬取）
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
-        success, message = loop.run_until_complete(scrape_xianyu_data(keyword, max_pages, delay))
-        loop.close()
+        try:
+            success, message = loop.run_until_complete(
+                scrape_xianyu_keywords(keywords, max_pages, delay, cancel_token=cancel_token)
+            )
+        finally:
+            crawl_registry.finish(cancel_token)
+            loop.close()
 
         if success:
             return jsonify({
                 'success': True,
                 'message': message,
+                'crawl_id': cancel_token.crawl_id,
                 'redirect': url_for('index')
             })
         else:
-            return jsonify({'success': False, 'message': message})
+            return jsonify({'success': False, 'message': message, 'crawl_id': cancel_token.crawl_id,
+                            'stopped': cancel_token.cancelled})
 
     except Exception as e:
         # 修复字符编码问题
@@ -1552,8 +2400,11 @@ def api_products():
     search_query = request.args.get('search', '')
     keyword_filter = request.args.get('keyword', '')
     page = request.args.get('page', 1, type=int)
-    sort_by = request.args.get('sort_by', 'created_at')  # 默认按创建时间排序
+    sort_by = request.args.get('sort_by') or ('relevance' if search_query else 'created_at')  # 搜索时默认按相关度排序，否则按创建时间
     sort_order = request.args.get('sort_order', 'desc')   # 默认降序
+    min_price = request.args.get('min_price', type=float)
+    max_price = request.args.get('max_price', type=float)
+    highlight = request.args.get('highlight', '').lower() in ('1', 'true', 'yes')
 
     # 构建查询 - 只显示有图片的产品
     query = XianyuProduct.query.filter(
@@ -1561,64 +2412,30 @@ def api_products():
         XianyuProduct.product_image != ''
     )
 
+    ranked = False
     if search_query:
-        query = query.filter(XianyuProduct.title.contains(search_query))
+        # 标题全文检索（FTS5 n元组索引），单个汉字、一两个字母数字等短片段退回子串匹配
+        query, ranked = title_search.apply_search(query, XianyuProduct, search_query)
 
     if keyword_filter:
-        query = query.filter(XianyuProduct.keyword.contains(keyword_filter))
+        query = query.filter(XianyuProduct.keyword == keyword_filter)
+
+    query = apply_price_range(query, min_price, max_price)
 
     # 排序逻辑
-    if sort_by == 'price':
-        # 价格排序需要在Python层面处理，先获取所有数据
-        all_products = query.all()
-
-        # 解析价格并排序
-        def get_price_for_sort(product):
-            return parse_price(product.price)
-
-        # 排序
-        all_products.sort(key=get_price_for_sort, reverse=(sort_order == 'desc'))
-
-        # 手动分页
-        per_page = 15
-        start = (page - 1) * per_page
-        end = start + per_page
-        page_products = all_products[start:end]
-
-        # 创建简单的分页对象
-        class SimplePagination:
-            def __init__(self, items, total, page, per_page):
-                self.items = items
-                self.total = total
-                self.page = page
-                self.per_page = per_page
-                self.pages = (total + per_page - 1) // per_page
-                self.has_prev = page > 1
-                self.has_next = page < self.pages
-                self.prev_num = page - 1 if self.has_prev else None
-                self.next_num = page + 1 if self.has_next else None
-
-            def iter_pages(self):
-                """生成页码范围，用于模板渲染"""
-                left_edge = 2
-                right_edge = 2
-                left_current = max(1, self.page - left_edge)
-                right_current = min(self.pages, self.page + right_edge)
-
-                if left_current > 1:
-                    yield 1
-                    if left_current > 2:
-                        yield None
-
-                for page_num in range(left_current, right_current + 1):
-                    yield page_num
-
-                if right_current < self.pages:
-                    if right_current < self.pages - 1:
-                        yield None
-                    yield self.pages
-
-        products = SimplePagination(page_products, len(all_products), page, per_page)
+    if sort_by == 'relevance' and ranked:
+        # 按bm25相关度排序（rank 越小越相关），相关度相同时新商品在前
+        query = query.order_by(title_search.fts_table.c.rank, XianyuProduct.created_at.desc())
+
+        products = query.paginate(page=page, per_page=15, error_out=False)
+    elif sort_by == 'price':
+        # 按价格数值排序（price_value 有索引，未能解析价格的商品排在最后）
+        if sort_order == 'asc':
+            query = query.order_by(XianyuProduct.price_value.asc().nulls_last(), XianyuProduct.id.asc())
+        else:
+            query = query.order_by(XianyuProduct.price_value.desc().nulls_last(), XianyuProduct.id.desc())
+
+        products = query.paginate(page=page, per_page=15, error_out=False)
     else:
         # 默认按创建时间排序
         if sort_order == 'asc':
@@ -1636,12 +2453,15 @@ def api_products():
                 'product_id': p.product_id,
                 'title': p.title,
                 'price': p.price,
+                'price_value': p.price_value,
                 'location': p.location,
                 'seller_credit': p.seller_credit,
                 'keyword': p.keyword,
                 'search_time': p.search_time.strftime('%Y-%m-%d %H:%M:%S') if p.search_time else '',
                 'data_source': p.data_source,
-                'created_at': p.created_at.strftime('%Y-%m-%d %H:%M:%S') if p.created_at else ''
+                'thumbnail_url': url_for('product_thumbnail', product_id=p.id),
+                'created_at': p.created_at.strftime('%Y-%m-%d %H:%M:%S') if p.created_at else '',
+                **({'title_highlight': title_search.highlight(p.title, search_query)} if highlight and search_query else {})
             }
             for p in products.items
         ],
@@ -1656,6 +2476,10 @@ def api_products():
         'sort_info': {
             'sort_by': sort_by,
             'sort_order': sort_order
+        },
+        'price_range': {
+            'min_price': min_price,
+            'max_price': max_price
         }
     }
 
@@ -1860,20 +2684,17 @@ def api_stats():
         XianyuProduct.product_image != ''
     ).count()
 
-    # 价格统计 - 只统计有图片的产品
-    products_with_prices = XianyuProduct.query.filter(
+    # 价格统计 - 只统计有图片的产品（在SQL中聚合 price_value）
+    price_count, min_price, max_price, avg_price = db.session.query(
+        db.func.count(XianyuProduct.price_value),
+        db.func.min(XianyuProduct.price_value),
+        db.func.max(XianyuProduct.price_value),
+        db.func.avg(XianyuProduct.price_value)
+    ).filter(
         XianyuProduct.product_image.isnot(None),
         XianyuProduct.product_image != '',
-        XianyuProduct.price.isnot(None)
-    ).all()
-    prices = []
-    for p in products_with_prices:
-        price_str = p.price.replace('¥', '').replace(',', '').strip()
-        if price_str and price_str.replace('.', '').isdigit():
-            try:
-                prices.append(float(price_str))
-            except:
-                continue
+        XianyuProduct.price_value.isnot(None)
+    ).one()
 
     # 关键词统计
     keyword_stats = db.session.query(
@@ -1881,23 +2702,24 @@ def api_stats():
         db.func.count(XianyuProduct.id)
     ).group_by(XianyuProduct.keyword).all()
 
-    # 今日新增统计 - 只统计有图片的产品
+    # 今日新增统计 - 只统计有图片的产品（按时间区间比较，可使用created_at索引）
     from datetime import date
-    today = date.today()
+    today_start = datetime.combine(date.today(), datetime.min.time())
     today_products = XianyuProduct.query.filter(
         XianyuProduct.product_image.isnot(None),
         XianyuProduct.product_image != '',
-        db.func.date(XianyuProduct.created_at) == today
+        XianyuProduct.created_at >= today_start,
+        XianyuProduct.created_at < today_start + timedelta(days=1)
     ).count()
 
     stats = {
         'total_products': total_products,
         'today_new': today_products,  # 添加今日新增数据
         'price_stats': {
-            'count': len(prices),
-            'min_price': min(prices) if prices else 0,
-            'max_price': max(prices) if prices else 0,
-            'avg_price': sum(prices)/len(prices) if prices else 0
+            'count': price_count,
+            'min_price': min_price or 0,
+            'max_price': max_price or 0,
+            'avg_price': avg_price or 0
         },
         'keyword_distribution': [
             {'keyword': k[0], 'count': k[1]}
@@ -2013,15 +2835,18 @@ def api_update_cookie():
 
 @app.route('/api/stop-scraping', methods=['POST'])
 def api_stop_scraping():
-    """停止爬虫任务"""
-    global scraping_should_stop
+    """停止爬虫任务：指定 crawl_id 时只停止该次爬取，否则停止所有手动发起的爬取"""
     try:
-        # 设置全局停止标志
-        scraping_should_stop = True
+        data = request.get_json(silent=True) or request.form
+        crawl_id = data.get('crawl_id')
+        if crawl_id:
+            return api_stop_crawl(crawl_id)
 
+        count = crawl_registry.cancel_source('manual')
         return jsonify({
             'success': True,
-            'message': '正在停止爬虫任务...'
+            'message': f'正在停止 {count} 个爬虫任务...' if count else '当前没有运行中的爬虫任务',
+            'stopped': count
         })
     except Exception as e:
         return jsonify({
@@ -2029,6 +2854,20 @@ def api_stop_scraping():
             'message': f'停止爬虫失败: {str(e)}'
         })
 
+@app.route('/api/crawls', methods=['GET'])
+@login_required
+def api_list_crawls():
+    """列出本进程中运行中的爬取（含取消状态）"""
+    return jsonify({'success': True, 'crawls': crawl_registry.list()})
+
+@app.route('/api/crawls/<crawl_id>/stop', methods=['POST'])
+@login_required
+def api_stop_crawl(crawl_id):
+    """按ID停止单个爬取：立即取消正在进行的页面操作，已入库的商品保留"""
+    if not crawl_registry.cancel(crawl_id):
+        return jsonify({'success': False, 'message': f'爬取 {crawl_id} 不存在或已结束'})
+    return jsonify({'success': True, 'message': f'正在停止爬取 {crawl_id}...', 'crawl_id': crawl_id})
+
 # 定时任务相关API
 @app.route('/api/scheduled-tasks', methods=['GET'])
 def api_get_scheduled_tasks():
@@ -2325,12 +3164,372 @@ def api_get_task_status():
             'message': f'获取任务状态失败: {str(e)}'
         })
 
+@app.route('/api/browser-pool')
+def api_browser_pool():
+    """获取共享浏览器池占用情况"""
+    try:
+        return jsonify({
+            'success': True,
+            'pool': browser_pool.get_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取浏览器池状态失败: {str(e)}'
+        })
+
+@app.route('/api/scrape-jobs')
+def api_scrape_jobs():
+    """获取爬取任务队列状态"""
+    try:
+        status = request.args.get('status', '')
+        limit = min(request.args.get('limit', 50, type=int), 200)
+
+        query = ScrapeJob.query
+        if status:
+            query = query.filter_by(status=status)
+        jobs = query.order_by(ScrapeJob.id.desc()).limit(limit).all()
+
+        counts = dict(db.session.query(ScrapeJob.status, func.count(ScrapeJob.id)).group_by(ScrapeJob.status).all())
+        return jsonify({
+            'success': True,
+            'dispatch_mode': get_dispatch_mode(),
+            'counts': counts,
+            'jobs': [job.to_dict() for job in jobs]
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取任务队列失败: {str(e)}'
+        })
+
+@app.route('/api/scrape-jobs/<int:job_id>')
+def api_scrape_job(job_id):
+    """获取单个爬取任务状态"""
+    job = ScrapeJob.query.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': '任务不存在'})
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@app.route('/api/scrape-jobs/dispatch-mode', methods=['POST'])
+@login_required
+def api_update_dispatch_mode():
+    """设置爬取调度方式：inline / queue"""
+    try:
+        mode = (request.get_json() or {}).get('mode', '')
+        if mode not in ('inline', 'queue'):
+            return jsonify({'success': False, 'message': 'mode 必须是 inline 或 queue'})
+
+        config = SystemConfig.query.filter_by(config_key='scrape_dispatch_mode').first()
+        if not config:
+            config = SystemConfig(config_key='scrape_dispatch_mode', description='爬取调度方式')
+            db.session.add(config)
+        config.config_value = mode
+        db.session.commit()
+        return jsonify({'success': True, 'message': f'爬取调度方式已设置为 {mode}'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'设置爬取调度方式失败: {str(e)}'
+        })
+
+@app.route('/api/circuit-breaker', methods=['GET'])
+def api_circuit_breaker():
+    """获取各账号熔断状态"""
+    try:
+        prepare_crawl_controls()
+        return jsonify({
+            'success': True,
+            'breaker': browser_pool.breaker.get_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取熔断状态失败: {str(e)}'
+        })
+
+@app.route('/api/circuit-breaker/reset', methods=['POST'])
+@login_required
+def api_reset_circuit_breaker():
+    """手动恢复账号（不传account时恢复当前Cookie对应的账号）"""
+    try:
+        prepare_crawl_controls()
+        account = (request.get_json() or {}).get('account') or browser_pool.cookie_key(get_current_cookie())
+        browser_pool.breaker.record_success(account)
+        save_crawl_controls()
+        return jsonify({'success': True, 'message': f'账号 {account} 已恢复'})
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'恢复账号失败: {str(e)}'
+        })
+
+@app.route('/api/accounts', methods=['GET'])
+@login_required
+def api_get_accounts():
+    """获取账号池及各账号健康状况"""
+    # 账号池保存各账号的登录Cookie，只有管理员可以查看和修改
+    current_user = User.query.get(session['user_id'])
+    if not current_user or current_user.role != 'admin':
+        return jsonify({'success': False, 'message': '权限不足'}), 403
+
+    try:
+        prepare_crawl_controls()
+        accounts = XianyuAccount.query.order_by(XianyuAccount.health_score.desc(), XianyuAccount.id).all()
+        return jsonify({
+            'success': True,
+            'accounts': [account.to_dict() for account in accounts]
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取账号池失败: {str(e)}'
+        })
+
+@app.route('/api/accounts', methods=['POST'])
+@login_required
+def api_create_account():
+    """添加账号"""
+    current_user = User.query.get(session['user_id'])
+    if not current_user or current_user.role != 'admin':
+        return jsonify({'success': False, 'message': '权限不足'}), 403
+
+    try:
+        data = request.get_json() or {}
+        cookie_string = (data.get('cookie') or '').strip()
+        if not cookie_string:
+            return jsonify({'success': False, 'message': 'Cookie不能为空'})
+
+        account = XianyuAccount(
+            name=(data.get('name') or '').strip() or f'账号{XianyuAccount.query.count() + 1}',
+            cookie_string=cookie_string,
+            hourly_budget=int(data.get('hourly_budget') or 0),
+            is_active=bool(data.get('is_active', True))
+        )
+        db.session.add(account)
+        db.session.commit()
+        return jsonify({'success': True, 'message': f'账号 {account.name} 添加成功', 'account': account.to_dict()})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'添加账号失败: {str(e)}'})
+
+@app.route('/api/accounts/<int:account_id>', methods=['PUT'])
+@login_required
+def api_update_account(account_id):
+    """更新账号（名称、Cookie、预算、启用状态）；传 reset_health 可重置健康分"""
+    current_user = User.query.get(session['user_id'])
+    if not current_user or current_user.role != 'admin':
+        return jsonify({'success': False, 'message': '权限不足'}), 403
+
+    try:
+        account = XianyuAccount.query.get(account_id)
+        if not account:
+            return jsonify({'success': False, 'message': '账号不存在'})
+
+        data = request.get_json() or {}
+        if data.get('name'):
+            account.name = data['name'].strip()
+        if data.get('cookie'):
+            account.cookie_string = data['cookie'].strip()
+        if 'hourly_budget' in data:
+            account.hourly_budget = int(data['hourly_budget'] or 0)
+        if 'is_active' in data:
+            account.is_active = bool(data['is_active'])
+        if data.get('reset_health'):
+            account.health_score = 100.0
+        db.session.commit()
+        return jsonify({'success': True, 'message': '账号更新成功', 'account': account.to_dict()})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'更新账号失败: {str(e)}'})
+
+@app.route('/api/accounts/<int:account_id>', methods=['DELETE'])
+@login_required
+def api_delete_account(account_id):
+    """删除账号及其保存的登录状态文件"""
+    current_user = User.query.get(session['user_id'])
+    if not current_user or current_user.role != 'admin':
+        return jsonify({'success': False, 'message': '权限不足'}), 403
+
+    try:
+        from 自动运行抓取器 import storage_state_path
+
+        account = XianyuAccount.query.get(account_id)
+        if not account:
+            return jsonify({'success': False, 'message': '账号不存在'})
+
+        state_file = storage_state_path(account.cookie_string)
+        if os.path.exists(state_file):
+            os.remove(state_file)
+        db.session.delete(account)
+        db.session.commit()
+        return jsonify({'success': True, 'message': '账号已删除'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'删除账号失败: {str(e)}'})
+
+@app.route('/api/pacing', methods=['GET'])
+def api_get_pacing():
+    """获取自适应节奏控制器的当前延迟和最近的调整记录"""
+    try:
+        browser_pool.pacer.configure(get_pacing_config())
+        return jsonify({
+            'success': True,
+            'pacing': browser_pool.pacer.get_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取节奏状态失败: {str(e)}'
+        })
+
+@app.route('/api/pacing', methods=['POST'])
+@login_required
+def api_update_pacing():
+    """更新节奏参数：min_delay / max_delay / slow_latency / shrink_factor / healthy_streak"""
+    try:
+        from crawl_control import DEFAULT_PACING_CONFIG
+        data = request.get_json() or {}
+        pacing = {}
+        for key in DEFAULT_PACING_CONFIG:
+            if key in data:
+                try:
+                    pacing[key] = float(data[key])
+                except (TypeError, ValueError):
+                    return jsonify({'success': False, 'message': f'{key} 必须是数字'})
+                if pacing[key] < 0:
+                    return jsonify({'success': False, 'message': f'{key} 不能为负数'})
+
+        config = SystemConfig.query.filter_by(config_key='crawl_pacing').first()
+        if config:
+            merged = json.loads(config.config_value or '{}')
+            merged.update(pacing)
+            config.config_value = json.dumps(merged)
+        else:
+            config = SystemConfig(
+                config_key='crawl_pacing',
+                config_value=json.dumps(pacing),
+                description='爬取自适应节奏参数'
+            )
+            db.session.add(config)
+        db.session.commit()
+
+        browser_pool.pacer.configure(json.loads(config.config_value))
+        return jsonify({
+            'success': True,
+            'message': '节奏参数已更新',
+            'config': browser_pool.pacer.config
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'更新节奏参数失败: {str(e)}'
+        })
+
+@app.route('/api/selector-profile', methods=['GET'])
+def api_selector_profile():
+    """获取选择器画像及各字段命中统计"""
+    try:
+        load_selector_profile(browser_pool.selector_profile)
+        return jsonify({
+            'success': True,
+            'stats': browser_pool.selector_profile.get_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取选择器画像失败: {str(e)}'
+        })
+
+@app.route('/api/resource-policy', methods=['GET'])
+def api_get_resource_policy():
+    """获取资源拦截策略及拦截统计"""
+    try:
+        browser_pool.resource_filter.update_policy(get_resource_policy())
+        return jsonify({
+            'success': True,
+            'policy': browser_pool.resource_filter.policy,
+            'stats': browser_pool.resource_filter.get_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取资源拦截策略失败: {str(e)}'
+        })
+
+@app.route('/api/resource-policy', methods=['POST'])
+@login_required
+def api_update_resource_policy():
+    """更新资源拦截策略：block_types / block_domains / allow_domains"""
+    try:
+        data = request.get_json() or {}
+        policy = {}
+        for key in ('block_types', 'block_domains', 'allow_domains'):
+            if key in data:
+                if not isinstance(data[key], list):
+                    return jsonify({'success': False, 'message': f'{key} 必须是列表'})
+                policy[key] = [str(v).strip() for v in data[key] if str(v).strip()]
+
+        config = SystemConfig.query.filter_by(config_key='crawl_resource_policy').first()
+        if config:
+            merged = json.loads(config.config_value or '{}')
+            merged.update(policy)
+            config.config_value = json.dumps(merged, ensure_ascii=False)
+        else:
+            config = SystemConfig(
+                config_key='crawl_resource_policy',
+                config_value=json.dumps(policy, ensure_ascii=False),
+                description='爬取资源拦截策略'
+            )
+            db.session.add(config)
+        db.session.commit()
+
+        browser_pool.resource_filter.update_policy(json.loads(config.config_value))
+        return jsonify({
+            'success': True,
+            'message': '资源拦截策略已更新',
+            'policy': browser_pool.resource_filter.policy
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'更新资源拦截策略失败: {str(e)}'
+        })
+
+@app.route('/thumb/<int:product_id>')
+def product_thumbnail(product_id):
+    """商品缩略图：首次请求时下载原图并缓存缩略图，之后直接从本地返回（长期缓存）"""
+    product = XianyuProduct.query.get_or_404(product_id)
+    if not product.product_image:
+        return '', 404
+
+    path = image_cache.get(product.product_image)
+    if not path:
+        # 下载失败时退回原图地址，由浏览器直接加载
+        return redirect(product.product_image)
+    return send_file(path, mimetype='image/jpeg', max_age=30 * 86400, conditional=True)
+
+@app.route('/api/image-cache', methods=['GET'])
+def api_image_cache():
+    """获取缩略图缓存统计"""
+    return jsonify({'success': True, 'stats': image_cache.get_stats()})
+
+@app.route('/api/image-cache/clear', methods=['POST'])
+@login_required
+def api_clear_image_cache():
+    """清空缩略图缓存"""
+    count = image_cache.clear()
+    return jsonify({'success': True, 'message': f'已清除 {count} 张缩略图'})
+
 @app.route('/api/system-info')
 def api_system_info():
     """获取系统信息"""
+    import platform
     try:
         import psutil
-        import platform
 
         # 系统基本信息
         info = {
@@ -2351,6 +3550,9 @@ def api_system_info():
         minutes = int((uptime_seconds % 3600) // 60)
         info['uptime'] = f"{days}天 {hours}小时 {minutes}分钟"
 
+        # 数据库连接调优状态（WAL、忙等待超时等实际生效的值）
+        info['database'] = db_tuning.get_status(db.engine)
+
         return jsonify(info)
     except ImportError:
         # 如果没有安装psutil，返回基本信息
@@ -2358,7 +3560,8 @@ def api_system_info():
             'system': platform.system(),
             'python_version': platform.python_version(),
             'platform': platform.platform(),
-            'uptime': '未知'
+            'uptime': '未知',
+            'database': db_tuning.get_status(db.engine)
         })
     except Exception as e:
         return jsonify({'error': str(e)})
@@ -3792,13 +4995,17 @@ class NotificationService:
             return False
 
     @staticmethod
-    def process_product_matching(product_data):
-        """处理产品匹配和通知"""
+    def process_product_matching(product_data, quick_config=None, rules=None):
+        """处理产品匹配和通知
+
+        批量处理时可传入预先加载的快速推送配置和启用的匹配规则，避免每个商品重复查询。
+        """
         try:
             matched = False
 
             # 1. 检查快速推送配置
-            quick_config = QuickPushConfig.get_config()
+            if quick_config is None:
+                quick_config = QuickPushConfig.get_config()
             if quick_config['enabled']:
                 if NotificationService.check_quick_push_match(product_data, quick_config):
                     print(f"[快速推送] 产品 '{product_data.get('title', '')[:30]}...' 匹配快速推送规则")
@@ -3816,7 +5023,8 @@ class NotificationService:
                         matched = True
 
             # 2. 检查详细的匹配规则
-            rules = ProductMatchRule.query.filter_by(enabled=True).all()
+            if rules is None:
+                rules = ProductMatchRule.query.filter_by(enabled=True).all()
             for rule in rules:
                 # 检查产品是否匹配规则
                 if NotificationService.check_product_match(product_data, rule):
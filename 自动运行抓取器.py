@@ -6,26 +6,708 @@
 """
 
 import asyncio
+import hashlib
+import os
 import pandas as pd
 from datetime import datetime
 from playwright.async_api import async_playwright
 import re
 import random
 import time
+from urllib.parse import urlencode
+
+from crawl_control import AdaptivePacer
 
 # 配置日志 - 使用简化版避免编码问题
 import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Chromium启动参数
+BROWSER_ARGS = [
+    '--no-sandbox',
+    '--disable-blink-features=AutomationControlled',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--disable-web-security',
+    '--allow-running-insecure-content',
+    '--disable-features=VizDisplayCompositor',
+    '--proxy-server="direct://"',
+    '--proxy-bypass-list=*',
+    '--disable-extensions',
+    '--no-first-run',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding'
+]
+
+# 浏览器上下文配置（移动端模拟）
+MOBILE_CONTEXT_OPTIONS = {
+    'user_agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Mobile/15E148 Safari/604.1',
+    'viewport': {'width': 375, 'height': 667},
+    'device_scale_factor': 2,
+    'is_mobile': True,
+    'has_touch': True
+}
+
+# 反检测脚本
+STEALTH_INIT_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
+    window.chrome = {runtime: {}, loadTimes: function() {}, csi: function() {}};
+    Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]});
+    Object.defineProperty(navigator, 'languages', {get: () => ['zh-CN', 'zh', 'en']});
+    Object.defineProperty(navigator, 'automation', {get: () => undefined});
+"""
+
+# 默认资源拦截策略：只需要图片链接字符串，不需要下载图片、字体、音视频和统计埋点
+DEFAULT_RESOURCE_POLICY = {
+    # 按资源类型拦截（Playwright的resource_type）
+    'block_types': ['image', 'font', 'media'],
+    # 按域名/URL片段拦截（统计、埋点、监控上报）
+    'block_domains': [
+        'mmstat.com',
+        'arms-retcode.aliyuncs.com',
+        'retcode.taobao.com',
+        'fourier.taobao.com',
+        'g.alicdn.com/alilog',
+        'hm.baidu.com',
+        'google-analytics.com'
+    ],
+    # 白名单：命中后始终放行，优先级高于以上规则
+    'allow_domains': []
+}
+
+# 被拦截资源的估算体积（字节），拦截后无法得知真实大小，按常见体积估算
+BLOCKED_BYTES_ESTIMATE = {
+    'image': 60 * 1024,
+    'font': 40 * 1024,
+    'media': 500 * 1024,
+    'stylesheet': 20 * 1024,
+    'script': 30 * 1024
+}
+
+
+class ResourceFilter:
+    """基于page.route的资源拦截器，按资源类型和域名决定放行或拦截，并统计拦截数量"""
+
+    def __init__(self, policy=None):
+        self.policy = dict(DEFAULT_RESOURCE_POLICY)
+        self.update_policy(policy)
+        self.stats = {
+            'allowed_requests': 0,
+            'blocked_requests': 0,
+            'blocked_bytes_estimate': 0,
+            'blocked_by_type': {},
+            'blocked_by_domain': {}
+        }
+
+    def update_policy(self, policy):
+        """更新拦截策略，未提供的字段保持默认值"""
+        for key in ('block_types', 'block_domains', 'allow_domains'):
+            if policy and isinstance(policy.get(key), list):
+                self.policy[key] = policy[key]
+
+    def match_reason(self, resource_type, url):
+        """返回拦截原因（类型或域名），放行时返回None"""
+        for domain in self.policy['allow_domains']:
+            if domain in url:
+                return None
+        for domain in self.policy['block_domains']:
+            if domain in url:
+                return domain
+        if resource_type in self.policy['block_types']:
+            return resource_type
+        return None
+
+    async def handle(self, route):
+        """route回调：拦截或放行请求"""
+        request = route.request
+        reason = self.match_reason(request.resource_type, request.url)
+        if reason is None:
+            self.stats['allowed_requests'] += 1
+            await route.continue_()
+            return
+
+        self.stats['blocked_requests'] += 1
+        self.stats['blocked_bytes_estimate'] += BLOCKED_BYTES_ESTIMATE.get(request.resource_type, 5 * 1024)
+        self.stats['blocked_by_type'][request.resource_type] = self.stats['blocked_by_type'].get(request.resource_type, 0) + 1
+        if reason != request.resource_type:
+            self.stats['blocked_by_domain'][reason] = self.stats['blocked_by_domain'].get(reason, 0) + 1
+        await route.abort()
+
+    async def install(self, context):
+        """在浏览器上下文上安装拦截规则（对上下文内所有页面生效）"""
+        await context.route('**/*', self.handle)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['policy'] = self.policy
+        return stats
+
+
+# 商品卡片选择器（按优先级排列）
+PRODUCT_SELECTORS = [
+    '.feeds-item-wrap--rGdH_KoF',  # 主要商品包装元素
+    '[class*="feeds-item"]',
+    '[class*="item-wrap"]',
+    'a[href*="item?id"]',
+    '.search-item'
+]
+
+TITLE_SELECTORS = [
+    '.main-title--sMrtWSJa',
+    '[class*="title"]',
+    '.row1-wrap-title--qIlOySTh',
+    'h1', 'h2', 'h3'
+]
+
+PRICE_SELECTORS = [
+    '.number--NKh1vXWM',
+    '[class*="price"]',
+    '.price-wrap',
+    '.row3-wrap-price--IZmX7M0K'
+]
+
+LOCATION_SELECTORS = [
+    '.seller-text--Rr2Y3EbB',
+    '[class*="location"]',
+    '.seller-left--OBwJil87 p'
+]
+
+CREDIT_SELECTORS = [
+    '.gradient-image-text--YUZj27iZ',
+    '[class*="credit"]',
+    '[class*="seller"] span'
+]
+
+# 更精确的图片选择器，优先获取商品主图
+IMAGE_SELECTORS = [
+    # 闲鱼/咸鱼商品图选择器 - 优先级最高
+    '.feeds-image--TDRC4fV1 img',
+    '.mainPic img',
+    '.picR img',
+    '.pic img',
+    '.goods-pic img',
+    '.item-pic img',
+    '.cover img',
+    # 通用商品图选择器 - 中等优先级
+    '[class*="pic"] img:not([class*="avatar"]):not([class*="logo"])',
+    '[class*="image"] img:not([class*="avatar"]):not([class*="logo"])',
+    '[class*="photo"] img:not([class*="avatar"]):not([class*="logo"])',
+    '.product-image img',
+    '.product-pic img',
+    '.thumbnail img',
+    '.gallery img',
+    # 备用选择器（最后使用，但要更严格过滤）
+    'img[src*="alicdn.com"]:not([src*="avatar"]):not([src*="logo"]):not([src*="icon"])',
+    'img[src*="taobao.com"]:not([src*="avatar"]):not([src*="logo"]):not([src*="icon"])',
+    'img[src*="tbcdn.cn"]:not([src*="avatar"]):not([src*="logo"]):not([src*="icon"])'
+]
+
+# 各提取字段对应的选择器级联
+FIELD_SELECTORS = {
+    'card': PRODUCT_SELECTORS,
+    'title': TITLE_SELECTORS,
+    'price': PRICE_SELECTORS,
+    'location': LOCATION_SELECTORS,
+    'credit': CREDIT_SELECTORS,
+    'image': IMAGE_SELECTORS
+}
+
+
+class SelectorProfile:
+    """选择器画像：记住当前页面布局下每个字段命中的选择器
+
+    提取时把上次命中的选择器排在级联最前面，命中即停止；只有它不再匹配时才依次尝试其余选择器。
+    每页结束时按本页各选择器的命中次数更新画像，dirty 表示画像有变化、需要持久化。
+    """
+
+    def __init__(self, profile=None):
+        self.profile = {}
+        self.loaded = False
+        self.dirty = False
+        self._page_wins = {}
+        self.stats = {field: {'hits': 0, 'fallbacks': 0, 'empty': 0} for field in FIELD_SELECTORS}
+        self.stats['profile_updates'] = 0
+        self.load(profile)
+
+    def load(self, profile):
+        """加载持久化的画像，忽略已不在级联中的选择器"""
+        if profile is None:
+            return
+        self.loaded = True
+        for field, selector in (profile or {}).items():
+            if field in FIELD_SELECTORS and selector in FIELD_SELECTORS[field]:
+                self.profile[field] = selector
+
+    def ordered(self, field):
+        """返回上次命中的选择器在前的级联列表"""
+        winner = self.profile.get(field)
+        selectors = FIELD_SELECTORS[field]
+        if not winner:
+            return list(selectors)
+        return [winner] + [selector for selector in selectors if selector != winner]
+
+    def record(self, field, selector):
+        """记录一次字段提取命中的选择器（selector为空表示级联全部未命中）"""
+        if not selector:
+            self.stats[field]['empty'] += 1
+            return
+        if selector == self.profile.get(field):
+            self.stats[field]['hits'] += 1
+        else:
+            self.stats[field]['fallbacks'] += 1
+        wins = self._page_wins.setdefault(field, {})
+        wins[selector] = wins.get(selector, 0) + 1
+
+    def end_page(self):
+        """一页提取结束：把本页命中次数最多的选择器设为各字段的新画像"""
+        for field, wins in self._page_wins.items():
+            best = max(wins, key=wins.get)
+            if best != self.profile.get(field):
+                print(f"[选择器画像] {field} 字段命中选择器变为: {best}")
+                self.profile[field] = best
+                self.stats['profile_updates'] += 1
+                self.dirty = True
+        self._page_wins = {}
+
+    def to_dict(self):
+        return dict(self.profile)
+
+    def get_stats(self):
+        stats = {}
+        for key, value in self.stats.items():
+            if isinstance(value, dict):
+                value = dict(value)
+                lookups = value['hits'] + value['fallbacks'] + value['empty']
+                value['hit_rate'] = round(value['hits'] / lookups * 100, 2) if lookups else 0
+            stats[key] = value
+        stats['profile'] = self.to_dict()
+        return stats
+
+
+# 单次往返提取脚本：在浏览器内解析整页所有商品卡片，一次性返回JSON数组
+# 各字段同时返回命中的选择器，供选择器画像统计
+EXTRACT_PAGE_SCRIPT = """
+(args) => {
+    const firstText = (root, selectors) => {
+        for (const selector of selectors) {
+            try {
+                const node = root.querySelector(selector);
+                if (node) {
+                    const text = (node.textContent || '').trim();
+                    if (text) return {text: text, selector: selector};
+                }
+            } catch (e) {}
+        }
+        return {text: '', selector: ''};
+    };
+
+    // 卖家信用：与 pick_seller_credit 规则一致，遇到不在标题中的短文本即停止
+    const creditTexts = (root, selectors, title) => {
+        const candidates = [];
+        for (const selector of selectors) {
+            try {
+                const node = root.querySelector(selector);
+                if (node) {
+                    const text = (node.textContent || '').trim();
+                    if (text) {
+                        candidates.push({text: text, selector: selector});
+                        if (!title.includes(text) && text.length < 20) break;
+                    }
+                }
+            } catch (e) {}
+        }
+        return candidates;
+    };
+
+    let cards = [];
+    let cardSelector = '';
+    for (const selector of args.productSelectors) {
+        try {
+            const found = document.querySelectorAll(selector);
+            if (found.length) {
+                cards = Array.from(found);
+                cardSelector = selector;
+                break;
+            }
+        } catch (e) {}
+    }
+    if (!cards.length) {
+        cards = Array.from(document.querySelectorAll('a[href*="item?id"]'));
+        cardSelector = 'a[href*="item?id"]';
+    }
+
+    const total = cards.length;
+    const items = cards.map((card) => {
+        let link = '';
+        const linkNode = card.querySelector('a[href*="item?id"]');
+        if (linkNode) {
+            link = linkNode.getAttribute('href') || '';
+        } else if (card.getAttribute) {
+            link = card.getAttribute('href') || '';
+        }
+
+        const images = [];
+        for (const selector of args.imageSelectors) {
+            try {
+                const img = card.querySelector(selector);
+                if (img) {
+                    const src = img.getAttribute('src');
+                    if (src) images.push({src: src, selector: selector});
+                }
+            } catch (e) {}
+        }
+
+        const title = firstText(card, args.titleSelectors);
+        return {
+            link: link,
+            title: title,
+            price: firstText(card, args.priceSelectors),
+            location: firstText(card, args.locationSelectors),
+            credits: creditTexts(card, args.creditSelectors, title.text),
+            images: images
+        };
+    });
+
+    return {cardSelector: cardSelector, total: total, items: items};
+}
+"""
+
+
+# 结果列表签名：命中的卡片选择器 + 卡片数量 + 第一张卡片链接，用于判断列表是否已刷新
+RESULTS_SIGNATURE_FUNCTION = """
+(selectors) => {
+    for (const selector of selectors) {
+        try {
+            const cards = document.querySelectorAll(selector);
+            if (cards.length) {
+                const first = cards[0];
+                const linkNode = first.matches('a[href*="item?id"]') ? first : first.querySelector('a[href*="item?id"]');
+                const link = linkNode ? (linkNode.getAttribute('href') || '') : '';
+                return selector + '|' + cards.length + '|' + link;
+            }
+        } catch (e) {}
+    }
+    return '';
+}
+"""
+
+# 等待条件：结果列表签名与之前不同
+RESULTS_CHANGED_SCRIPT = f"""
+(args) => {{
+    const signature = ({RESULTS_SIGNATURE_FUNCTION})(args.selectors);
+    return signature !== '' && signature !== args.previous;
+}}
+"""
+
+# 等待条件：商品卡片数量达到指定值
+CARD_COUNT_SCRIPT = """
+(args) => {
+    for (const selector of args.selectors) {
+        try {
+            if (document.querySelectorAll(selector).length >= args.minCount) return true;
+        } catch (e) {}
+    }
+    return false;
+}
+"""
+
+# 滚动结果列表：找到商品卡片所在的可滚动容器（找不到时滚动整个页面），向下滚动约一屏
+# 返回 {moved, atBottom}，moved为false说明已经滚到底
+SCROLL_RESULTS_SCRIPT = """
+(args) => {
+    let card = null;
+    for (const selector of args.productSelectors) {
+        try {
+            card = document.querySelector(selector);
+            if (card) break;
+        } catch (e) {}
+    }
+
+    let container = null;
+    for (let node = card ? card.parentElement : null; node && node !== document.body; node = node.parentElement) {
+        const style = window.getComputedStyle(node);
+        if (/(auto|scroll)/.test(style.overflowY) && node.scrollHeight > node.clientHeight) {
+            container = node;
+            break;
+        }
+    }
+    container = container || document.scrollingElement || document.documentElement;
+
+    const before = container.scrollTop;
+    container.scrollTop = before + Math.max(200, container.clientHeight * 0.9);
+    const after = container.scrollTop;
+    return {
+        moved: after > before,
+        atBottom: after + container.clientHeight >= container.scrollHeight - 2
+    };
+}
+"""
+
+# 拦截检测：滑块/验证码元素，以及无商品时页面上的限流警告文字
+CAPTCHA_SELECTORS = [
+    'iframe[src*="captcha"]',
+    'iframe[src*="punish"]',
+    'iframe[src*="_____tmd_____"]',
+    '#nc_1_wrapper',
+    '.nc-container',
+    '#baxia-dialog-content',
+    '[id*="baxia"]'
+]
+
+BLOCK_WARNING_TEXTS = [
+    '访问受限', '访问被拒绝', '系统繁忙', '请稍后再试', '操作太频繁', '访问过于频繁',
+    '异常流量', '滑动验证', '请拖动滑块', '安全验证'
+]
+
+# 返回 {captcha, warning, cards}，cards为商品卡片数量
+BLOCK_DETECT_SCRIPT = """
+(args) => {
+    let captcha = '';
+    for (const selector of args.captchaSelectors) {
+        try {
+            if (document.querySelector(selector)) { captcha = selector; break; }
+        } catch (e) {}
+    }
+
+    let cards = 0;
+    for (const selector of args.productSelectors) {
+        try {
+            cards = document.querySelectorAll(selector).length;
+            if (cards) break;
+        } catch (e) {}
+    }
+
+    let warning = '';
+    if (!cards) {
+        const text = document.body ? (document.body.innerText || '') : '';
+        warning = args.warningTexts.find((w) => text.includes(w)) || '';
+    }
+    return {captcha: captcha, warning: warning, cards: cards};
+}
+"""
+
+# 等待条件：出现商品卡片或出现验证码元素
+RESULTS_OR_BLOCK_SCRIPT = """
+(args) => {
+    for (const selector of args.productSelectors.concat(args.captchaSelectors)) {
+        try {
+            if (document.querySelector(selector)) return true;
+        } catch (e) {}
+    }
+    return false;
+}
+"""
+
+# 刻意的反爬节奏延迟（秒），与页面加载等待分开配置
+DEFAULT_PACING_POLICY = {
+    'search_submit': 2,   # 输入关键词后到提交搜索前
+    'first_load': 3,      # 搜索框模式下首次结果加载后（与翻页延迟取较大值）
+    'next_page': None     # 翻页前后，None表示使用 search_products 的 delay 参数
+}
+
+
+def normalize_image_url(src):
+    """规范化并校验商品图片链接，无效时返回空字符串"""
+    if not src:
+        return ''
+
+    # 添加https前缀（如果是//开头）
+    if src.startswith('//'):
+        src = 'https:' + src
+
+    # 严格的图片验证条件
+    if ('alicdn.com' in src or
+        'taobao.com' in src or
+        'tbcdn.cn' in src) and \
+       ('avatar' not in src and
+        'logo' not in src and
+        'icon' not in src and
+        'placeholder' not in src and
+        'default' not in src and
+        '2-tps-2-2' not in src):  # 排除小占位图
+        return src
+
+    return ''
+
+
+def pick_seller_credit(candidates, title):
+    """从候选文本中挑选卖家信用，规则与逐元素提取保持一致"""
+    credit = ''
+    for text in candidates:
+        credit = text
+        if credit not in title and len(credit) < 20:
+            break
+    return credit
+
+
+def extract_product_id(product_link):
+    """从商品链接中提取商品ID"""
+    if product_link:
+        match = re.search(r'item\?id=([^&]+)', product_link)
+        if match:
+            return match.group(1)
+    return ''
+
+
+# 搜索结果页URL及参数（排序参数与 set_sort_by_url 保持一致）
+SEARCH_PAGE_URL = 'https://www.goofish.com/search'
+SEARCH_SORT_LATEST_PARAMS = {'sort': 'createTime'}
+SEARCH_PAGE_PARAM = 'pageNumber'
+
+
+def build_search_url(keyword, page_number=1, sort_by_latest=True):
+    """构建搜索结果页URL：关键词、最新发布排序和页码"""
+    params = {'q': keyword}
+    if sort_by_latest:
+        params.update(SEARCH_SORT_LATEST_PARAMS)
+    if page_number and page_number > 1:
+        params[SEARCH_PAGE_PARAM] = page_number
+    return f"{SEARCH_PAGE_URL}?{urlencode(params)}"
+
+
+# 闲鱼搜索页请求的mtop搜索接口
+SEARCH_API_NAME = 'mtop.taobao.idlemtopsearch.pc.search'
+
+# 表示登录态失效的接口返回码，以及登录页地址特征
+SESSION_INVALID_CODES = ('FAIL_SYS_SESSION_EXPIRED', 'FAIL_SYS_LOGIN_EXPIRED')
+# 表示触发滑块/人机验证的接口返回码
+CAPTCHA_CODES = ('RGV587_ERROR', 'FAIL_SYS_USER_VALIDATE')
+LOGIN_URL_MARKERS = ('passport.goofish.com', 'login.taobao.com', '/login')
+
+# 按账号保存的浏览器存储状态（Cookie + localStorage）目录
+STORAGE_STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'storage_state')
+
+
+def cookie_fingerprint(cookie_string):
+    """Cookie字符串的短指纹，用于区分不同账号"""
+    return hashlib.md5((cookie_string or '').encode('utf-8')).hexdigest()[:12]
+
+
+def storage_state_path(cookie_string):
+    """账号对应的存储状态文件路径"""
+    return os.path.join(STORAGE_STATE_DIR, f'{cookie_fingerprint(cookie_string)}.json')
+
+
+def _format_api_price(ex_content, click_args):
+    """从接口数据中解析价格，返回不带货币符号的数字字符串"""
+    price_parts = ex_content.get('price')
+    if isinstance(price_parts, list):
+        text = ''.join(str(part.get('text', '')) for part in price_parts if isinstance(part, dict))
+        number = re.sub(r'[^\d.]', '', text)
+        if number:
+            return number
+
+    for value in ((ex_content.get('detailParams') or {}).get('soldPrice'), click_args.get('price')):
+        if value not in (None, ''):
+            number = re.sub(r'[^\d.]', '', str(value))
+            if number:
+                return number
+
+    return ''
+
+
+def _format_api_credit(ex_content):
+    """从接口数据的标签中提取卖家信用文本"""
+    fish_tags = ex_content.get('fishTags') or {}
+    for tag_group in fish_tags.values() if isinstance(fish_tags, dict) else []:
+        for tag in (tag_group or {}).get('tagList', []) if isinstance(tag_group, dict) else []:
+            content = ((tag or {}).get('data') or {}).get('content', '')
+            if content and '信用' in content:
+                return content.strip()
+    return ex_content.get('userNickName', '') or ''
+
+
+def parse_search_payload(payload, keyword, source='Playwright+搜索接口'):
+    """将mtop搜索接口的JSON响应解析为与DOM提取一致的商品字典列表"""
+    result_list = ((payload or {}).get('data') or {}).get('resultList') or []
+    search_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    products = []
+
+    for entry in result_list:
+        try:
+            item = ((entry or {}).get('data') or {}).get('item') or {}
+            main = item.get('main') or {}
+            ex_content = main.get('exContent') or {}
+            click_args = (main.get('clickParam') or {}).get('args') or {}
+
+            product_id = str(ex_content.get('itemId') or click_args.get('item_id') or click_args.get('id') or '')
+            title = (ex_content.get('title') or (ex_content.get('detailParams') or {}).get('title') or '').strip()
+            if not product_id or not title:
+                continue
+
+            price = _format_api_price(ex_content, click_args)
+
+            publish_time = ''
+            publish_ts = click_args.get('publishTime')
+            if publish_ts and str(publish_ts).isdigit():
+                publish_time = datetime.fromtimestamp(int(publish_ts) / 1000).strftime("%Y-%m-%d %H:%M:%S")
+
+            products.append({
+                '序号': len(products) + 1,
+                '商品标题': title,
+                '价格': f"¥{price}" if price else '',
+                '地区': ex_content.get('area', '') or '',
+                '卖家信用': _format_api_credit(ex_content),
+                '商品链接': f"https://www.goofish.com/item?id={product_id}",
+                '商品ID': product_id,
+                '商品图片': normalize_image_url(ex_content.get('picUrl', '')),
+                '发布时间': publish_time,
+                '搜索时间': search_time,
+                '关键词': keyword,
+                '数据来源': source
+            })
+        except Exception as e:
+            print(f"[接口解析] 解析商品失败: {str(e)}")
+            continue
+
+    return products
+
+
 class AutoXianyuScraper:
-    def __init__(self, cookie_string=None, headless=True):
+    def __init__(self, cookie_string=None, headless=True, extract_mode='evaluate', capture_api=True,
+                 resource_policy=None, navigation_mode='url', pacing_policy=None, selector_profile=None,
+                 persist_state=True, pacer=None, max_scrolls=20):
         self.playwright = None
         self.browser = None
         self.context = None
         self.page = None
         self.results = []
         self.headless = headless  # 保存显示模式设置
+        # 提取模式：evaluate=整页一次性提取，element=逐元素提取（旧模式）
+        self.extract_mode = extract_mode
+        # 反爬节奏延迟策略（页面加载等待使用条件等待，不再依赖固定延迟）
+        self.pacing_policy = dict(DEFAULT_PACING_POLICY)
+        self.pacing_policy.update(pacing_policy or {})
+        # 导航模式：url=直接跳转搜索结果URL，searchbox=输入搜索框并点击排序菜单（旧模式）
+        self.navigation_mode = navigation_mode
+        # 是否从搜索接口响应中直接获取商品数据（未捕获到时回退到DOM提取）
+        self.capture_api = capture_api
+        self._api_payloads = []
+        self._api_consumed = 0
+        self._api_event = None
+        # 资源拦截器：resource_policy=False 时不拦截任何资源
+        self.resource_filter = ResourceFilter(resource_policy) if resource_policy is not False else None
+        # 本次爬取实际加载的结果页数（浏览器池据此回收上下文）
+        self.pages_loaded = 0
+        # 本次爬取是否因到达水位线（整页已知商品）而提前停止
+        self.watermark_reached = False
+        # 整页提取时最多向下滚动的次数（收集懒加载/虚拟列表中的全部卡片）
+        self.max_scrolls = max_scrolls
+        # 每页提取指标：{page, source, cards, visible_max, scrolls}
+        self.page_metrics = []
+        # 每提取完一页调用的协程函数 page_sink(商品列表)，用于边爬边入库
+        self.page_sink = None
+        # 选择器画像：可传入共享的SelectorProfile实例或持久化的画像字典
+        if isinstance(selector_profile, SelectorProfile):
+            self.selector_profile = selector_profile
+        else:
+            self.selector_profile = SelectorProfile(selector_profile)
+        # 是否使用外部（浏览器池）提供的上下文，此时close不关闭浏览器
+        self.attached = False
 
         # Cookie字符串 - 支持从外部传入
         if cookie_string:
@@ -34,6 +716,20 @@ class AutoXianyuScraper:
             # 默认Cookie（向后兼容）
             self.cookie_string = 'cna=Gj2PIVvfVnUCATytZ6pBVuaC; t=a5122db3552745fae77dcc8bd999c78f; tracknick=xy227407743954; havana_lgc2_77=eyJoaWQiOjIyMjEwNTk1MTk1MDMsInNnIjoiYzYyMTFiYmI1MzJmOTc4MzllNzYyYzVlMWRhZDUzMTciLCJzaXRlIjo3NywidG9rZW4iOiIxVjVFQkNLN2UxRjZLUVpBMTZVMWVxQSJ9; _hvn_lgc_=77; havana_lgc_exp=1764746274257; cookie2=14200db952d961688a60cf14acb2ffb2; mtop_partitioned_detect=1; _m_h5_tk=baac0bed28387029452647868b393313_1762608074777; _m_h5_tk_enc=9566c16833cd791ce48c9fb9dae04e6c; xlly_s=1; _samesite_flag_=true; sdkSilent=1762684756836; _tb_token_=e3e53eb565e; sgcookie=E100ISMaftFoirZTZm4%2BnVITm9pRarQlQg5i%2By4fQHQfufeaOs%2BaihilB0wuO0uGeoUkWGY0o6rM2QQXIYvatAXVZ%2F%2F9lcEFE791QN5mQNWs7rY%3D; csg=9b38caf0; unb=2221059519503; tfstk=gEBnQADA86RQkekItuvQtaO3HNVOdp9WTaHJyLLz_F8sJ2Hd44bl7ZIKpTIyrab95aA7AULyraIP9leYHMsBFLkuk-eAje-FMwmezBryQ3K8XH8UqSDeFLzYWfHyO-v5-eVoYQSaj3K-TH7rUdkw53cETa8e_V-DcL8Pza8Z7ntrL38rLRow53JyYaJzjd862L8PzLrGbAgIUEXPCOz5ve24kOphIHAHuGVjEYlvvqLcYkDSeOfMtEykSYkPIHjy7n1sn7LVGedvkNytKLjwqwLOu-kMQIff23b3KvJd_16BpOUmcBbkJIW9sSoGopbkg9Ri4YIhvUJMbtr-GFBMJaWH_oHDwdWvgp5T1ydJKnbPdwmoUZSOD9O1Er0wP6KXQnIQKAvVY3SzNflqiCDWbuBZNbOefhYvJIZhodfcCOZgjjNBThtLklqiNbOefhYYjlcjPB-6vrC..'
 
+        # 存储状态持久化：有已保存的状态时直接加载，跳过Cookie引导流程
+        self.persist_state = persist_state
+        self.storage_state_file = storage_state_path(self.cookie_string) if persist_state else None
+        self.state_loaded = False
+        # 网站返回登录态失效（接口返回码或跳转登录页）
+        self.session_invalid = False
+        # 搜索接口返回了验证码类错误
+        self.captcha_detected = False
+        # 检测到的拦截原因（login/captcha/warning:xxx），非空时本次爬取立即失败
+        self.block_reason = ''
+        # 自适应翻页节奏：可传入共享的AdaptivePacer，按账号区分状态
+        self.pacer = pacer if pacer is not None else AdaptivePacer()
+        self.pacer_key = cookie_fingerprint(self.cookie_string)
+
     def smart_delay(self, base_delay=2):
         """
         智能延迟函数
@@ -52,6 +748,71 @@ class AutoXianyuScraper:
 
         return asyncio.sleep(total_delay)
 
+    async def pace(self, action, delay=None):
+        """按节奏策略执行刻意的反爬延迟，action为 DEFAULT_PACING_POLICY 中的键
+
+        翻页延迟（next_page 未单独配置时）由自适应节奏控制器决定，delay 仅作为初始值。
+        """
+        if action == 'next_page' and self.pacing_policy.get(action) is None:
+            await self.pacer.wait(self.pacer_key, delay)
+            return
+
+        base_delay = self.pacing_policy.get(action)
+        if base_delay is None:
+            base_delay = delay
+        if action == 'first_load' and delay is not None:
+            base_delay = max(delay, base_delay or 0)
+        if base_delay:
+            await self.smart_delay(base_delay)
+
+    async def results_signature(self):
+        """获取当前结果列表签名，失败时返回空字符串"""
+        try:
+            return await self.page.evaluate(RESULTS_SIGNATURE_FUNCTION, PRODUCT_SELECTORS)
+        except Exception:
+            return ''
+
+    async def wait_for_results_change(self, previous_signature, timeout=15):
+        """等待结果列表刷新（签名变化），超时返回False"""
+        try:
+            await self.page.wait_for_function(
+                RESULTS_CHANGED_SCRIPT,
+                arg={'selectors': PRODUCT_SELECTORS, 'previous': previous_signature},
+                timeout=timeout * 1000
+            )
+            return True
+        except Exception:
+            print(f"[条件等待] {timeout}秒内结果列表未刷新")
+            return False
+
+    async def wait_for_card_count(self, min_count=1, timeout=15):
+        """等待商品卡片数量达到min_count，超时返回False"""
+        try:
+            await self.page.wait_for_function(
+                CARD_COUNT_SCRIPT,
+                arg={'selectors': PRODUCT_SELECTORS, 'minCount': min_count},
+                timeout=timeout * 1000
+            )
+            return True
+        except Exception:
+            print(f"[条件等待] {timeout}秒内商品卡片未达到 {min_count} 个")
+            return False
+
+    async def wait_for_search_response(self, timeout=15):
+        """等待一次搜索接口响应，超时返回False"""
+        if self.capture_api and self._api_event:
+            return await self.wait_for_api_payload(timeout)
+        try:
+            await self.page.wait_for_event(
+                'response',
+                predicate=lambda response: SEARCH_API_NAME in response.url,
+                timeout=timeout * 1000
+            )
+            return True
+        except Exception:
+            print(f"[条件等待] {timeout}秒内未收到搜索接口响应")
+            return False
+
     async def setup_browser(self, headless=None):
         """设置Playwright浏览器"""
         # 使用传入的headless参数，如果没有则使用实例变量
@@ -64,24 +825,7 @@ class AutoXianyuScraper:
             self.playwright = await async_playwright().start()
 
             # Chromium浏览器配置
-            browser_args = [
-                '--no-sandbox',
-                '--disable-blink-features=AutomationControlled',
-                '--disable-dev-shm-usage',
-                '--disable-gpu',
-                '--disable-web-security',
-                '--allow-running-insecure-content',
-                '--disable-features=VizDisplayCompositor',
-                '--proxy-server="direct://"',
-                '--proxy-bypass-list=*',
-                '--disable-extensions',
-                '--no-first-run',
-                '--disable-default-apps',
-                '--disable-sync',
-                '--disable-background-timer-throttling',
-                '--disable-backgrounding-occluded-windows',
-                '--disable-renderer-backgrounding'
-            ]
+            browser_args = list(BROWSER_ARGS)
 
             # 根据显示模式调整配置
             if not headless:
@@ -99,26 +843,24 @@ class AutoXianyuScraper:
                 slow_mo=1000 if not headless else 0  # 有头模式下减慢操作速度便于观察
             )
 
-            # 创建浏览器上下文（移动端模拟）
-            self.context = await self.browser.new_context(
-                user_agent='Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Mobile/15E148 Safari/604.1',
-                viewport={'width': 375, 'height': 667},
-                device_scale_factor=2,
-                is_mobile=True,
-                has_touch=True
-            )
+            # 创建浏览器上下文（移动端模拟），有已保存的存储状态时直接加载
+            context_options = dict(MOBILE_CONTEXT_OPTIONS)
+            if self.storage_state_file and os.path.exists(self.storage_state_file):
+                context_options['storage_state'] = self.storage_state_file
+                self.state_loaded = True
+                print(f"[存储状态] 加载已保存的登录状态: {self.storage_state_file}")
+            self.context = await self.browser.new_context(**context_options)
+            if self.resource_filter:
+                await self.resource_filter.install(self.context)
 
             # 创建页面
             self.page = await self.context.new_page()
 
             # 添加反检测脚本
-            await self.page.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-                window.chrome = {runtime: {}, loadTimes: function() {}, csi: function() {}};
-                Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]});
-                Object.defineProperty(navigator, 'languages', {get: () => ['zh-CN', 'zh', 'en']});
-                Object.defineProperty(navigator, 'automation', {get: () => undefined});
-            """)
+            await self.page.add_init_script(STEALTH_INIT_SCRIPT)
+
+            if self.capture_api:
+                self.enable_api_capture()
 
             print("Browser setup successful")
             return True
@@ -127,6 +869,88 @@ class AutoXianyuScraper:
             print(f"Browser setup failed: {str(e)}")
             return False
 
+    def attach(self, context, page):
+        """使用浏览器池提供的现成上下文和页面，跳过浏览器启动"""
+        self.context = context
+        self.page = page
+        self.attached = True
+        if self.capture_api:
+            self.enable_api_capture()
+
+    def detach(self):
+        """与浏览器池的页面解除绑定，移除本实例注册的事件回调"""
+        if self.page and self._api_event:
+            try:
+                self.page.remove_listener('response', self._on_response)
+            except Exception:
+                pass
+        self.context = None
+        self.page = None
+
+    def enable_api_capture(self):
+        """订阅页面响应，收集搜索接口返回的结构化数据"""
+        self._api_event = asyncio.Event()
+        self.page.on('response', self._on_response)
+
+    async def _on_response(self, response):
+        """响应回调：只处理mtop搜索接口"""
+        if SEARCH_API_NAME not in response.url:
+            return
+
+        try:
+            payload = await response.json()
+        except Exception as e:
+            print(f"[接口捕获] 解析响应失败: {str(e)}")
+            return
+
+        ret = payload.get('ret') or []
+        if not any(str(r).startswith('SUCCESS') for r in ret):
+            print(f"[接口捕获] 接口返回异常: {ret}")
+            if any(str(r).startswith(SESSION_INVALID_CODES) for r in ret):
+                self.session_invalid = True
+            if any(str(r).startswith(CAPTCHA_CODES) for r in ret):
+                self.captcha_detected = True
+            if self.session_invalid or self.captcha_detected:
+                # 唤醒正在等待接口响应的流程，由拦截检测立即结束爬取
+                self._api_event.set()
+            return
+
+        self._api_payloads.append(payload)
+        self._api_event.set()
+        print(f"[接口捕获] 捕获到搜索接口响应，累计 {len(self._api_payloads)} 个")
+
+    async def wait_for_api_payload(self, timeout=15):
+        """等待一个尚未使用的搜索接口响应，超时返回False"""
+        if not self._api_event:
+            return False
+        if len(self._api_payloads) > self._api_consumed:
+            return True
+
+        try:
+            await asyncio.wait_for(self._api_event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return len(self._api_payloads) > self._api_consumed
+
+    async def extract_products_from_api(self, page_num, keyword, timeout=15):
+        """使用已捕获的搜索接口响应生成商品数据，未捕获到时返回空列表"""
+        # 搜索阶段一个响应都没有捕获到，说明接口不可用，直接走DOM提取
+        if not self._api_payloads:
+            return []
+
+        if not await self.wait_for_api_payload(timeout):
+            print(f"[接口捕获] 第 {page_num} 页未捕获到搜索接口响应")
+            return []
+
+        # 取最新的一次响应（排序切换后前面的响应已过期），并标记全部已使用
+        payload = self._api_payloads[-1]
+        self._api_consumed = len(self._api_payloads)
+        self._api_event.clear()
+
+        products = parse_search_payload(payload, keyword)
+        print(f"[接口捕获] 第 {page_num} 页从搜索接口获得 {len(products)} 个商品")
+        return products
+
     async def apply_cookies(self):
         """应用Cookie到Playwright页面"""
         print("Applying cookies...")
@@ -155,7 +979,6 @@ class AutoXianyuScraper:
                     else:
                         raise e
 
-            await asyncio.sleep(3)
             print(f"[页面访问] 主页加载完成")
 
             # 解析并设置Cookie
@@ -177,11 +1000,12 @@ class AutoXianyuScraper:
             await self.context.add_cookies(cookies)
             print(f"[Cookie设置] Cookie添加到上下文成功")
 
-            # 刷新页面使Cookie生效
-            await self.page.reload()
-            await asyncio.sleep(2)
+            # 刷新页面使Cookie生效（等待DOM就绪即可，无需固定等待）
+            await self.page.reload(wait_until='domcontentloaded')
 
             print(f"[Cookie设置] 成功应用 {len(cookies)} 个Cookie")
+            self.session_invalid = False
+            await self.save_storage_state()
             return True
 
         except Exception as e:
@@ -198,75 +1022,155 @@ class AutoXianyuScraper:
 
             return False
 
-    async def search_products(self, keyword="手机", max_pages=3, delay=2, sort_by_latest=True):
-        """搜索闲鱼商品，支持按时间排序"""
+    async def ensure_session(self):
+        """确保页面处于登录状态：已加载保存的存储状态时直接返回，否则执行Cookie引导"""
+        if self.state_loaded and not self.session_invalid:
+            print("[存储状态] 使用已保存的登录状态，跳过Cookie引导")
+            return True
+        return await self.apply_cookies()
+
+    async def save_storage_state(self):
+        """保存当前上下文的存储状态（Cookie + localStorage）"""
+        if not self.storage_state_file or not self.context:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.storage_state_file), exist_ok=True)
+            await self.context.storage_state(path=self.storage_state_file)
+            print(f"[存储状态] 登录状态已保存: {self.storage_state_file}")
+        except Exception as e:
+            print(f"[存储状态] 保存登录状态失败: {str(e)}")
+
+    def is_login_page(self):
+        """当前页面是否被重定向到登录页"""
+        url = self.page.url if self.page else ''
+        return any(marker in url for marker in LOGIN_URL_MARKERS)
+
+    async def rebootstrap_session(self):
+        """登录态失效：删除已保存的存储状态，重新执行Cookie引导"""
+        print("[存储状态] 登录状态已失效，重新应用Cookie")
+        self.state_loaded = False
+        if self.storage_state_file and os.path.exists(self.storage_state_file):
+            try:
+                os.remove(self.storage_state_file)
+            except OSError as e:
+                print(f"[存储状态] 删除失效状态文件失败: {str(e)}")
+        try:
+            await self.context.clear_cookies()
+        except Exception:
+            pass
+        return await self.apply_cookies()
+
+    async def detect_block(self):
+        """检测当前页面是否被拦截，返回拦截原因（login/captcha/warning:xxx），未拦截返回空字符串"""
+        if self.captcha_detected:
+            return 'captcha'
+        if self.session_invalid or self.is_login_page():
+            return 'login'
+        try:
+            result = await self.page.evaluate(BLOCK_DETECT_SCRIPT, {
+                'captchaSelectors': CAPTCHA_SELECTORS,
+                'productSelectors': PRODUCT_SELECTORS,
+                'warningTexts': BLOCK_WARNING_TEXTS
+            })
+        except Exception:
+            return ''
+        if result.get('captcha'):
+            return 'captcha'
+        if result.get('warning'):
+            return f"warning:{result['warning']}"
+        return ''
+
+    async def check_blocked(self):
+        """检测拦截，被拦截时记录原因并通知节奏控制器，返回是否被拦截"""
+        reason = await self.detect_block()
+        if not reason:
+            return False
+        self.block_reason = reason
+        self.pacer.record(self.pacer_key, 'login' if reason == 'login' else 'captcha')
+        print(f"[拦截检测] 检测到拦截: {reason}，立即结束本次爬取")
+        return True
+
+    def page_signal(self, page_products):
+        """根据本页结果判断网站状态信号：captcha/login/ok/empty"""
+        if self.captcha_detected:
+            return 'captcha'
+        if self.session_invalid or self.is_login_page():
+            return 'login'
+        return 'ok' if page_products else 'empty'
+
+    async def search_products(self, keyword="手机", max_pages=3, delay=2, sort_by_latest=True, known_ids=None):
+        """搜索闲鱼商品，支持按时间排序
+
+        known_ids 为该关键词上次爬取时记录的最新商品ID（水位线）。按最新发布排序时，
+        一旦某一页的商品全部是已知商品，说明后面都是旧数据，立即停止翻页。
+        """
         sort_mode = "最新发布" if sort_by_latest else "默认排序"
         print(f"[搜索开始] 关键词: {keyword}, 目标页数: {max_pages}, 排序方式: {sort_mode}")
         print(f"[进度状态] 正在初始化浏览器并应用Cookie...")
 
-        try:
-            # 查找搜索框
-            search_selectors = [
-                'input[placeholder*="搜索"]',
-                'input[type="search"]',
-                '[class*="search"] input',
-                '.search-input',
-                'input.search-input'
-            ]
+        # 水位线只在按最新发布排序时有意义
+        known_ids = set(known_ids or []) if sort_by_latest else set()
+        self.watermark_reached = False
+        if known_ids:
+            print(f"[水位线] 已知最新商品 {len(known_ids)} 个，遇到整页已知商品时停止翻页")
 
-            search_input = None
-            print(f"[搜索框定位] 正在寻找搜索框...")
-            for selector in search_selectors:
-                try:
-                    search_input = await self.page.wait_for_selector(selector, timeout=10000)
-                    print(f"[搜索框定位] 成功找到搜索框: {selector}")
+        try:
+            # 页面耗时 = 导航耗时 + 提取耗时，供自适应节奏控制器判断网站状态
+            nav_started = time.time()
+            for attempt in range(2):
+                if self.navigation_mode == 'url':
+                    # 直接跳转到带关键词、排序和页码的搜索结果URL
+                    if not await self.goto_search_page(keyword, 1, sort_by_latest):
+                        return False
+                elif not await self.submit_search_box(keyword, delay, sort_by_latest):
+                    return False
+
+                # 网站提示登录态失效时重新引导一次
+                if not (self.session_invalid or self.is_login_page()):
                     break
-                except:
-                    continue
-
-            if not search_input:
-                print(f"[搜索框定位] 错误: 未找到搜索框")
+                if attempt == 1 or not await self.rebootstrap_session():
+                    print("[搜索错误] 登录状态无效，请更新Cookie")
+                    self.block_reason = 'login'
+                    self.pacer.record(self.pacer_key, 'login')
+                    return False
+            nav_elapsed = time.time() - nav_started
+
+            if await self.check_blocked():
                 return False
 
-            # 执行搜索
-            print(f"[搜索执行] 正在输入关键词: {keyword}")
-            await search_input.click()
-            await search_input.fill("")  # 清空
-            await search_input.type(keyword, delay=100)
-            await asyncio.sleep(2)
-            await search_input.press('Enter')
-            print(f"[搜索执行] 已提交搜索，等待结果加载...")
-
-            # 等待搜索结果加载
-            print(f"[结果加载] 正在等待搜索结果页面加载...")
-            await self.page.wait_for_load_state('networkidle', timeout=30000)
-            print(f"[结果加载] 页面加载完成，开始智能延迟...")
-            # 首次加载使用较长的智能延迟
-            await self.smart_delay(max(delay, 3))
-
-            # 设置排序方式为最新发布
-            if sort_by_latest:
-                print(f"[排序设置] 正在设置排序方式为最新发布...")
-                sort_success = await self.set_sort_to_latest()
-                if sort_success:
-                    print(f"[排序设置] 排序设置成功，优先显示最新发布的商品")
-                else:
-                    print(f"[排序设置] 排序设置失败，使用默认排序")
-
             # 检查页面是否加载成功
             current_url = self.page.url
             print(f"[页面状态] 当前页面: {current_url}")
 
             # 提取多页数据
+            seen_ids = set()
             print(f"[数据提取] 开始提取商品数据，目标页数: {max_pages}")
             for page in range(1, max_pages + 1):
                 print(f"[数据提取] ===== 正在提取第 {page} 页数据 =====")
+                extract_started = time.time()
                 page_products = await self.extract_products_from_page(page, keyword)
+                self.pacer.record(self.pacer_key, self.page_signal(page_products),
+                                  latency=nav_elapsed + time.time() - extract_started)
 
+                self.pages_loaded += 1
                 if page_products:
+                    page_ids = {p.get('商品ID') for p in page_products if p.get('商品ID')}
+                    if self.navigation_mode == 'url' and page > 1 and page_ids and page_ids <= seen_ids:
+                        print(f"[数据提取] 第 {page} 页与之前页面完全重复，页码参数可能未生效，结束爬取")
+                        break
+                    seen_ids |= page_ids
+
+                    if known_ids and page_ids and not (page_ids - known_ids):
+                        print(f"[水位线] 第 {page} 页商品均为上次已爬取的商品，停止翻页")
+                        self.watermark_reached = True
+                        break
+
                     self.results.extend(page_products)
                     print(f"[数据提取] 第 {page} 页成功提取 {len(page_products)} 个商品")
                     print(f"[数据提取] 当前总计: {len(self.results)} 个商品")
+                    if self.page_sink:
+                        # 交给入库流程（队列满时在此等待）
+                        await self.page_sink(page_products)
                 else:
                     print(f"[数据提取] 第 {page} 页未提取到商品，结束爬取")
                     break
@@ -274,44 +1178,283 @@ class AutoXianyuScraper:
                 # 尝试翻页
                 if page < max_pages:
                     print(f"[翻页操作] 准备翻转到第 {page+1} 页...")
-                    next_success = await self.go_to_next_page()
+                    if self.navigation_mode == 'url':
+                        # URL模式：先执行翻页节奏延迟，再直接跳转到下一页URL
+                        await self.pace('next_page', delay)
+                        nav_started = time.time()
+                        next_success = await self.goto_search_page(keyword, page + 1, sort_by_latest)
+                    else:
+                        nav_started = time.time()
+                        next_success = await self.go_to_next_page()
+                    nav_elapsed = time.time() - nav_started
+                    if await self.check_blocked():
+                        break
                     if not next_success:
+                        self.pacer.record(self.pacer_key, 'error')
                         print(f"[翻页操作] 翻页失败，结束爬取")
                         break
-                    print(f"[翻页操作] 翻页成功，开始智能延迟...")
-                    # 使用智能延迟替代固定延迟
-                    await self.smart_delay(delay)
+                    if self.navigation_mode != 'url':
+                        print(f"[翻页操作] 翻页成功，开始节奏延迟...")
+                        await self.pace('next_page', delay)
 
             print(f"[爬取完成] ===== 爬取结束 =====")
             print(f"[爬取完成] 总计提取 {len(self.results)} 个商品")
-            return len(self.results) > 0
+            # 保存最新的存储状态（令牌类Cookie会在浏览过程中刷新）
+            if self.results:
+                await self.save_storage_state()
+            # 到达水位线时即使没有新商品也视为成功
+            return len(self.results) > 0 or self.watermark_reached
 
         except Exception as e:
+            self.pacer.record(self.pacer_key, 'error')
             print(f"[搜索错误] 搜索过程中发生异常: {str(e)}")
             print(f"[搜索错误] 爬取失败，请检查网络连接和Cookie状态")
             return False
 
+    async def goto_search_page(self, keyword, page_number=1, sort_by_latest=True):
+        """直接跳转到搜索结果页URL，并等待结果出现"""
+        url = build_search_url(keyword, page_number, sort_by_latest)
+        print(f"[页面跳转] 正在打开第 {page_number} 页: {url}")
+
+        try:
+            response = await self.page.goto(url, timeout=30000, wait_until='domcontentloaded')
+        except Exception as e:
+            print(f"[页面跳转] 打开搜索页失败: {str(e)}")
+            return False
+
+        if response and response.status >= 400:
+            print(f"[页面跳转] 搜索页返回状态码: {response.status}")
+            return False
+
+        # 登录页或接口已提示拦截时无需等待结果
+        if self.is_login_page() or self.captcha_detected or self.session_invalid:
+            return True
+
+        # 等待搜索结果：优先等待搜索接口响应，否则等待商品卡片或验证码出现
+        if not (self.capture_api and await self.wait_for_api_payload(timeout=15)) and \
+                not (self.captcha_detected or self.session_invalid):
+            try:
+                await self.page.wait_for_function(
+                    RESULTS_OR_BLOCK_SCRIPT,
+                    arg={'productSelectors': PRODUCT_SELECTORS, 'captchaSelectors': CAPTCHA_SELECTORS},
+                    timeout=15000
+                )
+            except Exception:
+                print(f"[页面跳转] 第 {page_number} 页未等到商品列表")
+
+        return True
+
+    async def submit_search_box(self, keyword, delay=2, sort_by_latest=True):
+        """在搜索框中输入关键词提交搜索，并通过排序菜单切换到最新发布（旧模式）"""
+        # 查找搜索框
+        search_selectors = [
+            'input[placeholder*="搜索"]',
+            'input[type="search"]',
+            '[class*="search"] input',
+            '.search-input',
+            'input.search-input'
+        ]
+
+        search_input = None
+        print(f"[搜索框定位] 正在寻找搜索框...")
+        for selector in search_selectors:
+            try:
+                search_input = await self.page.wait_for_selector(selector, timeout=10000)
+                print(f"[搜索框定位] 成功找到搜索框: {selector}")
+                break
+            except:
+                continue
+
+        if not search_input:
+            print(f"[搜索框定位] 错误: 未找到搜索框")
+            return False
+
+        # 执行搜索
+        print(f"[搜索执行] 正在输入关键词: {keyword}")
+        await search_input.click()
+        await search_input.fill("")  # 清空
+        await search_input.type(keyword, delay=100)
+        await self.pace('search_submit')
+        await search_input.press('Enter')
+        print(f"[搜索执行] 已提交搜索，等待结果加载...")
+
+        # 等待搜索结果加载：等待搜索接口响应或商品卡片出现，无需等待图片等资源全部加载
+        print(f"[结果加载] 正在等待搜索结果页面加载...")
+        if not await self.wait_for_search_response(timeout=30):
+            await self.wait_for_card_count(1, timeout=15)
+        print(f"[结果加载] 页面加载完成，开始节奏延迟...")
+        # 首次加载使用较长的节奏延迟
+        await self.pace('first_load', delay)
+
+        # 设置排序方式为最新发布
+        if sort_by_latest:
+            print(f"[排序设置] 正在设置排序方式为最新发布...")
+            sort_success = await self.set_sort_to_latest()
+            if sort_success:
+                print(f"[排序设置] 排序设置成功，优先显示最新发布的商品")
+            else:
+                print(f"[排序设置] 排序设置失败，使用默认排序")
+
+        return True
+
+    def record_page_metric(self, page_num, source, cards, visible_max=None, scrolls=0):
+        """记录一页的商品卡片数量，供浏览器池统计每页平均收获"""
+        self.page_metrics.append({
+            'page': page_num,
+            'source': source,
+            'cards': cards,
+            'visible_max': cards if visible_max is None else visible_max,
+            'scrolls': scrolls
+        })
+
     async def extract_products_from_page(self, page_num, keyword):
         """从当前页面提取商品信息"""
-        products = []
+        if self.capture_api:
+            products = await self.extract_products_from_api(page_num, keyword)
+            if products:
+                self.record_page_metric(page_num, 'api', len(products))
+                return products
+
+        if self.extract_mode == 'evaluate':
+            try:
+                return await self.extract_products_by_evaluate(page_num, keyword)
+            except Exception as e:
+                print(f"[数据提取] 整页提取失败，回退到逐元素提取: {str(e)}")
 
+        products = await self.extract_products_by_elements(page_num, keyword)
+        self.record_page_metric(page_num, 'element', len(products))
+        return products
+
+    async def scroll_results(self, settle_timeout=1.5):
+        """结果列表向下滚动一屏并等待新卡片渲染，已滚到底时返回False"""
+        previous_signature = await self.results_signature()
+        scroll = await self.page.evaluate(SCROLL_RESULTS_SCRIPT, {'productSelectors': PRODUCT_SELECTORS})
+        if not scroll.get('moved'):
+            return False
         try:
-            # 优化的商品选择器
-            product_selectors = [
-                '.feeds-item-wrap--rGdH_KoF',  # 主要商品包装元素
-                '[class*="feeds-item"]',
-                '[class*="item-wrap"]',
-                'a[href*="item?id"]',
-                '.search-item'
-            ]
+            await self.page.wait_for_function(
+                RESULTS_CHANGED_SCRIPT,
+                arg={'selectors': PRODUCT_SELECTORS, 'previous': previous_signature},
+                timeout=settle_timeout * 1000
+            )
+        except Exception:
+            pass
+        return True
+
+    async def extract_products_by_evaluate(self, page_num, keyword, max_scrolls=None):
+        """整页提取：每一屏一次page.evaluate解析所有卡片，逐屏向下滚动直到没有新商品
+
+        懒加载/虚拟列表只渲染可见区域的卡片，滚动后按商品ID合并去重。
+        """
+        start_time = time.time()
+        profile = self.selector_profile
+        max_scrolls = self.max_scrolls if max_scrolls is None else max_scrolls
+        script_args = {
+            'productSelectors': profile.ordered('card'),
+            'titleSelectors': profile.ordered('title'),
+            'priceSelectors': profile.ordered('price'),
+            'locationSelectors': profile.ordered('location'),
+            'creditSelectors': profile.ordered('credit'),
+            'imageSelectors': profile.ordered('image')
+        }
+
+        search_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        products = []
+        seen_keys = set()
+        visible_max = 0
+        scrolls = 0
+        while True:
+            page_data = await self.page.evaluate(EXTRACT_PAGE_SCRIPT, script_args)
+            total = page_data.get('total', 0)
+            if scrolls == 0:
+                card_selector = page_data.get('cardSelector')
+                print(f"Using selector '{card_selector}' found {total} elements")
+                profile.record('card', card_selector if total else '')
+            visible_max = max(visible_max, total)
+
+            new_count = 0
+            for raw in page_data.get('items', []):
+                product = self.build_evaluated_product(raw, keyword, search_time, seen_keys)
+                if product:
+                    product['序号'] = len(products) + 1
+                    products.append(product)
+                    new_count += 1
+
+            # 没有新卡片或滚动次数用完时结束
+            if scrolls >= max_scrolls or (scrolls > 0 and new_count == 0):
+                break
+            if not await self.scroll_results():
+                break
+            scrolls += 1
+
+        profile.end_page()
+        self.record_page_metric(page_num, 'evaluate', len(products), visible_max, scrolls)
+        print(f"[数据提取] 第 {page_num} 页共收集 {len(products)} 个商品（单屏最多 {visible_max} 个，滚动 {scrolls} 次），"
+              f"耗时 {time.time() - start_time:.2f}秒")
+        return products
+
+    def build_evaluated_product(self, raw, keyword, search_time, seen_keys):
+        """把整页脚本返回的一张卡片转换为商品字典；无标题或已收集过的卡片返回None"""
+        profile = self.selector_profile
+        title = raw['title']['text']
+        if not title:
+            # 未渲染完成的占位卡片，滚动后的下一轮可能拿到完整内容
+            profile.record('title', raw['title']['selector'])
+            return None
 
+        product_link = raw.get('link', '')
+        product_id = extract_product_id(product_link)
+        key = product_id or product_link or title
+        if key in seen_keys:
+            return None
+        seen_keys.add(key)
+
+        profile.record('title', raw['title']['selector'])
+        profile.record('price', raw['price']['selector'])
+        profile.record('location', raw['location']['selector'])
+
+        credits = raw.get('credits', [])
+        credit = pick_seller_credit([c['text'] for c in credits], title)
+        profile.record('credit', next((c['selector'] for c in credits if c['text'] == credit), ''))
+
+        product_image = ''
+        image_selector = ''
+        for image in raw.get('images', []):
+            product_image = normalize_image_url(image['src'])
+            if product_image:
+                image_selector = image['selector']
+                break
+        profile.record('image', image_selector)
+        if not product_image:
+            print(f"[图片警告] 商品 {title[:20]}... 未找到有效图片")
+
+        price = raw['price']['text']
+        return {
+            '商品标题': title,
+            '价格': f"¥{price}" if price else '',
+            '地区': raw['location']['text'],
+            '卖家信用': credit,
+            '商品链接': product_link,
+            '商品ID': product_id,
+            '商品图片': product_image,
+            '搜索时间': search_time,
+            '关键词': keyword,
+            '数据来源': 'Playwright+真实Cookie'
+        }
+
+    async def extract_products_by_elements(self, page_num, keyword):
+        """逐元素提取商品信息（旧模式，作为整页提取的回退）"""
+        products = []
+
+        try:
             elements = []
-            for selector in product_selectors:
+            for selector in self.selector_profile.ordered('card'):
                 try:
                     found_elements = await self.page.query_selector_all(selector)
                     if found_elements:
                         print(f"Using selector '{selector}' found {len(found_elements)} elements")
                         elements = found_elements
+                        self.selector_profile.record('card', selector)
                         break
                 except:
                     continue
@@ -322,14 +1465,18 @@ class AutoXianyuScraper:
                 print(f"Using backup selector found {len(all_links)} product links")
                 elements = all_links
 
-            # 限制处理数量
-            max_items = min(len(elements), 30)
-            print(f"Processing {max_items} out of {len(elements)} products")
+            print(f"Processing {len(elements)} products")
 
-            for i, element in enumerate(elements[:max_items]):
+            seen_keys = set()
+            for i, element in enumerate(elements):
                 try:
                     product_info = await self.extract_single_product(element, i + 1)
                     if product_info and product_info.get('商品标题', '').strip():
+                        # 按商品ID去重（同一商品可能同时匹配卡片和链接）
+                        key = product_info.get('商品ID') or product_info.get('商品链接') or product_info['商品标题']
+                        if key in seen_keys:
+                            continue
+                        seen_keys.add(key)
                         products.append(product_info)
                 except Exception as e:
                     print(f"Failed to extract product {i+1}: {str(e)}")
@@ -338,6 +1485,7 @@ class AutoXianyuScraper:
         except Exception as e:
             print(f"Failed to extract page products: {str(e)}")
 
+        self.selector_profile.end_page()
         return products
 
     async def extract_single_product(self, element, index):
@@ -355,148 +1503,95 @@ class AutoXianyuScraper:
                     pass
 
             # 提取商品ID
-            product_id = ''
-            if product_link:
-                match = re.search(r'item\?id=([^&]+)', product_link)
-                if match:
-                    product_id = match.group(1)
+            product_id = extract_product_id(product_link)
 
-            # 提取商品标题
-            title = ''
-            title_selectors = [
-                '.main-title--sMrtWSJa',
-                '[class*="title"]',
-                '.row1-wrap-title--qIlOySTh',
-                'h1', 'h2', 'h3'
-            ]
+            profile = self.selector_profile
 
-            for selector in title_selectors:
+            # 提取商品标题（上次命中的选择器优先）
+            title = ''
+            title_selector = ''
+            for selector in profile.ordered('title'):
                 try:
                     title_elem = await element.query_selector(selector)
                     if title_elem:
                         title = await title_elem.text_content()
                         if title and title.strip():
                             title = title.strip()
+                            title_selector = selector
                             break
                 except:
                     continue
+            profile.record('title', title_selector)
 
             # 提取价格
             price = ''
-            price_selectors = [
-                '.number--NKh1vXWM',
-                '[class*="price"]',
-                '.price-wrap',
-                '.row3-wrap-price--IZmX7M0K'
-            ]
-
-            for selector in price_selectors:
+            price_selector = ''
+            for selector in profile.ordered('price'):
                 try:
                     price_elem = await element.query_selector(selector)
                     if price_elem:
                         price_text = await price_elem.text_content()
                         if price_text and price_text.strip():
                             price = f"¥{price_text.strip()}"
+                            price_selector = selector
                             break
                 except:
                     continue
+            profile.record('price', price_selector)
 
             # 提取地区/卖家信息
             location = ''
-            location_selectors = [
-                '.seller-text--Rr2Y3EbB',
-                '[class*="location"]',
-                '.seller-left--OBwJil87 p'
-            ]
-
-            for selector in location_selectors:
+            location_selector = ''
+            for selector in profile.ordered('location'):
                 try:
                     location_elem = await element.query_selector(selector)
                     if location_elem:
                         location_text = await location_elem.text_content()
                         if location_text and location_text.strip():
                             location = location_text.strip()
+                            location_selector = selector
                             break
                 except:
                     continue
+            profile.record('location', location_selector)
 
             # 提取卖家信用
-            credit = ''
-            credit_selectors = [
-                '.gradient-image-text--YUZj27iZ',
-                '[class*="credit"]',
-                '[class*="seller"] span'
-            ]
-
-            for selector in credit_selectors:
+            credit_candidates = []
+            credit_selector = ''
+            for selector in profile.ordered('credit'):
                 try:
                     credit_elem = await element.query_selector(selector)
                     if credit_elem:
                         credit_text = await credit_elem.text_content()
                         if credit_text and credit_text.strip():
-                            credit = credit_text.strip()
-                            if credit not in title and len(credit) < 20:
+                            credit_candidates.append(credit_text.strip())
+                            credit_selector = selector
+                            if credit_text.strip() not in title and len(credit_text.strip()) < 20:
                                 break
                 except:
                     continue
+            credit = pick_seller_credit(credit_candidates, title)
+            profile.record('credit', credit_selector)
 
             # 提取商品图片
             product_image = ''
             try:
-                # 更精确的图片选择器，优先获取商品主图
-                image_selectors = [
-                    # 闲鱼/咸鱼商品图选择器 - 优先级最高
-                    '.feeds-image--TDRC4fV1 img',
-                    '.mainPic img',
-                    '.picR img',
-                    '.pic img',
-                    '.goods-pic img',
-                    '.item-pic img',
-                    '.cover img',
-                    # 通用商品图选择器 - 中等优先级
-                    '[class*="pic"] img:not([class*="avatar"]):not([class*="logo"])',
-                    '[class*="image"] img:not([class*="avatar"]):not([class*="logo"])',
-                    '[class*="photo"] img:not([class*="avatar"]):not([class*="logo"])',
-                    '.product-image img',
-                    '.product-pic img',
-                    '.thumbnail img',
-                    '.gallery img',
-                    # 备用选择器（最后使用，但要更严格过滤）
-                    'img[src*="alicdn.com"]:not([src*="avatar"]):not([src*="logo"]):not([src*="icon"])',
-                    'img[src*="taobao.com"]:not([src*="avatar"]):not([src*="logo"]):not([src*="icon"])',
-                    'img[src*="tbcdn.cn"]:not([src*="avatar"]):not([src*="logo"]):not([src*="icon"])'
-                ]
-
-                for selector in image_selectors:
+                image_selector = ''
+                for selector in profile.ordered('image'):
                     try:
                         img_elem = await element.query_selector(selector)
                         if img_elem:
-                            product_image = await img_elem.get_attribute('src')
+                            product_image = normalize_image_url(await img_elem.get_attribute('src'))
                             if product_image:
-                                # 添加https前缀（如果是//开头）
-                                if product_image.startswith('//'):
-                                    product_image = 'https:' + product_image
-
-                                # 严格的图片验证条件
-                                if ('alicdn.com' in product_image or
-                                    'taobao.com' in product_image or
-                                    'tbcdn.cn' in product_image) and \
-                                   ('avatar' not in product_image and
-                                    'logo' not in product_image and
-                                    'icon' not in product_image and
-                                    'placeholder' not in product_image and
-                                    'default' not in product_image and
-                                    '2-tps-2-2' not in product_image):  # 排除小占位图
-                                    break
-                                else:
-                                    product_image = ''  # 重置，继续下一个选择器
+                                image_selector = selector
+                                break
                     except:
                         continue
+                profile.record('image', image_selector)
 
                 # 如果没有找到有效图片，设置为空字符串而不是占位符
-                if not product_image or '2-tps-2-2' in product_image:
-                    print(f"[图片警告] 商品 {title[:20]}... 未找到有效图片 product_image:{product_image}")
-                    product_image = ''
+                if not product_image:
+                    print(f"[图片警告] 商品 {title[:20]}... 未找到有效图片")
 
             except Exception as e:
                 print(f"图片提取失败: {e}")
@@ -539,10 +1634,10 @@ class AutoXianyuScraper:
                     next_button = await self.page.query_selector(selector)
                     if next_button:
                         print(f"[翻页操作] 找到翻页按钮，正在点击: {selector}")
+                        previous_signature = await self.results_signature()
                         await next_button.click()
-                        print(f"[翻页操作] 点击成功，等待页面稳定...")
-                        # 翻页后使用固定短延迟，避免页面跳动
-                        await asyncio.sleep(2)
+                        print(f"[翻页操作] 点击成功，等待结果列表刷新...")
+                        await self.wait_for_results_change(previous_signature)
                         return True
                 except:
                     continue
@@ -628,8 +1723,8 @@ class AutoXianyuScraper:
         try:
             print("[排序设置] 正在设置最新发布排序（集成鼠标悬停功能）...")
 
-            # 等待页面完全加载
-            await asyncio.sleep(3)
+            # 等待结果列表出现
+            await self.wait_for_card_count(1, timeout=10)
 
             # 步骤1: 优先尝试鼠标悬停在"新发布"状态栏
             print("[排序设置] 步骤1: 尝试鼠标悬停在'新发布'状态栏...")
@@ -673,7 +1768,6 @@ class AutoXianyuScraper:
             if new_publish_element:
                 print("[排序设置] 鼠标悬停在'新发布'状态栏上...")
                 await new_publish_element.hover()
-                await asyncio.sleep(2)  # 等待下拉菜单显示
 
                 print("[排序设置] 寻找悬停后显示的排序选项...")
 
@@ -711,12 +1805,10 @@ class AutoXianyuScraper:
                             text = await option_elem.text_content()
                             print(f"[排序设置] 找到排序选项: '{text}'")
 
-                            # 点击选项
+                            # 点击选项并等待结果列表刷新
+                            previous_signature = await self.results_signature()
                             await option_elem.click()
-                            await asyncio.sleep(5)
-
-                            # 等待页面重新加载
-                            await self.page.wait_for_load_state('networkidle', timeout=15000)
+                            await self.wait_for_results_change(previous_signature)
                             print("[排序设置] 鼠标悬停方式排序设置完成！")
                             return True
                     except:
@@ -725,7 +1817,6 @@ class AutoXianyuScraper:
                 # 如果悬停后没有找到选项，尝试点击"新发布"状态栏
                 print("[排序设置] 悬停后未找到选项，尝试点击'新发布'状态栏...")
                 await new_publish_element.click()
-                await asyncio.sleep(3)
 
                 for selector in sort_option_selectors:
                     try:
@@ -733,10 +1824,9 @@ class AutoXianyuScraper:
                         if option_elem:
                             text = await option_elem.text_content()
                             print(f"[排序设置] 点击后找到选项: '{text}'")
+                            previous_signature = await self.results_signature()
                             await option_elem.click()
-                            await asyncio.sleep(5)
-
-                            await self.page.wait_for_load_state('networkidle', timeout=15000)
+                            await self.wait_for_results_change(previous_signature)
                             print("[排序设置] 点击'新发布'方式排序设置完成！")
                             return True
                     except:
@@ -785,16 +1875,19 @@ class AutoXianyuScraper:
             if sort_area:
                 print("[排序设置] 备用方案 - 点击排序区域...")
                 await sort_area.click()
-                await asyncio.sleep(3)
+                # 等待排序选项出现
+                try:
+                    await self.page.wait_for_selector('text=最新', timeout=3000)
+                except Exception:
+                    pass
 
                 latest_option = await self.find_latest_option()
 
                 if latest_option:
                     print("[排序设置] 备用方案 - 点击最新发布选项...")
+                    previous_signature = await self.results_signature()
                     await latest_option.click()
-                    await asyncio.sleep(5)
-
-                    await self.page.wait_for_load_state('networkidle', timeout=15000)
+                    await self.wait_for_results_change(previous_signature)
                     print("[排序设置] 备用方案排序设置完成！")
                     return True
                 else:
@@ -886,15 +1979,15 @@ class AutoXianyuScraper:
             print(f"[排序设置] 当前URL: {current_url}")
 
             # 添加排序参数到URL
+            sort_query = urlencode(SEARCH_SORT_LATEST_PARAMS)
             if '?' in current_url:
-                new_url = current_url + '&sort=createTime'
+                new_url = current_url + '&' + sort_query
             else:
-                new_url = current_url + '?sort=createTime'
+                new_url = current_url + '?' + sort_query
 
             print(f"[排序设置] 通过URL设置排序: {new_url}")
-            await self.page.goto(new_url, timeout=15000)
-            await self.page.wait_for_load_state('networkidle', timeout=15000)
-            await asyncio.sleep(3)
+            await self.page.goto(new_url, timeout=15000, wait_until='domcontentloaded')
+            await self.wait_for_card_count(1)
             print("[排序设置] URL排序设置完成")
             return True
 
@@ -904,6 +1997,10 @@ class AutoXianyuScraper:
 
     async def close(self):
         """关闭浏览器"""
+        if self.attached:
+            # 上下文归浏览器池所有，由浏览器池负责回收
+            self.detach()
+            return
         if self.page:
             await self.page.close()
         if self.context:
@@ -933,8 +2030,8 @@ async def run_scraper(keyword="手机", max_pages=3, headless=True):
             print("Browser setup failed")
             return False, "Browser setup failed"
 
-        # 应用Cookie
-        if not await scraper.apply_cookies():
+        # 应用Cookie（已保存登录状态时跳过）
+        if not await scraper.ensure_session():
             print("Cookie setup failed")
             return False, "Cookie setup failed"
 